@@ -4,6 +4,7 @@
 import os
 import sys
 import logging
+import functools
 
 dependencies_directory = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '..', 'dependencies')
@@ -15,7 +16,7 @@ sys.path.append(dependencies_directory)
 
 import ftrack_api
 from ftrack_action_handler.action import BaseAction
-from ftrack_user_location import sync
+from ftrack_user_location import registry, sync, timing, worker
 
 
 logger = logging.getLogger(
@@ -33,6 +34,12 @@ class SyncAction(BaseAction):
         super(SyncAction, self).__init__(session)
         self._location_data = {}
         self._sync_data = {}
+        self._queue = None
+        self._locations = registry.get_registry(session)
+        # values derived from the locations, by registry generation.
+        self._cache = {}
+        self._cache_generation = None
+        self._entity_types = {}
         self._ignored_locations = [
             'ftrack.origin',
             'ftrack.server',
@@ -47,10 +54,32 @@ class SyncAction(BaseAction):
 
     @property
     def location(self):
-        return self.session.pick_location()
+        return self._get_cached('location', self.session.pick_location)
+
+    def _get_cached(self, key, build):
+        '''Return value of *key* returned by *build*, until locations change.'''
+        generation = self._locations.get_generation()
+        if generation != self._cache_generation:
+            self._cache = {}
+            self._cache_generation = generation
+
+        if key not in self._cache:
+            self._cache[key] = build()
+
+        return self._cache[key]
+
+    def _get_entity_type(self, entity):
+        '''Return API entity type of *entity*, resolved once per type.'''
+        entity_type = entity.get('entityType')
+        if entity_type not in self._entity_types:
+            self._entity_types[entity_type] = super(
+                SyncAction, self
+            )._get_entity_type(entity)
+
+        return self._entity_types[entity_type]
 
     def get_locations(self, name=False):
-        locations = self.session.query('select name from Location').all()
+        locations = self._locations.get_locations()
         if name:
             locations = [x['name'] for x in locations]
         return locations
@@ -70,11 +99,22 @@ class SyncAction(BaseAction):
             'type': 'enumerator',
             'name': field_id,
             'value': default_value or [],
-            'data': []
+            'data': list(
+                self._get_cached(
+                    ('menu', exclude_self, exclude_inaccessibles),
+                    lambda: self._build_locations_menu_data(
+                        exclude_self, exclude_inaccessibles
+                    )
+                )
+            )
         }
 
+        return location_menu
+
+    def _build_locations_menu_data(self, exclude_self, exclude_inaccessibles):
+        '''Return items of the locations enumerator.'''
+        data = []
         locations = self.get_locations()
-        
 
         if exclude_self:
             locations = [x for x in locations if not x['name'] == self.location['name']]
@@ -96,14 +136,14 @@ class SyncAction(BaseAction):
                 'value': location['name']
             }
 
-            location_menu['data'].append(
+            data.append(
                 item
             )
 
-        return location_menu
+        return data
 
     def location_exists(self, location):
-        return location in self.get_locations(name=True)
+        return self._locations.exists(location)
 
     def build_sync_event(self, event):
         source_location = event['data']['values']['source_location']
@@ -125,7 +165,32 @@ class SyncAction(BaseAction):
 
         return event
 
-    def get_locations_ui(self, event):
+    def get_sync_plan(self, event):
+        '''Return plan of the sync requested by *event*, without syncing.'''
+        values = event['data']['values']
+        try:
+            return sync.on_sync_to_remote(
+                self.session,
+                values['source_location'],
+                values['dest_location'],
+                event['source']['user']['id'],
+                event['data'].get('selection', []),
+                dry_run=True
+            )
+        except Exception as error:
+            self.logger.warning(
+                'Could not plan sync: {}'.format(error)
+            )
+            return None
+
+    def get_locations_ui(self, event, sync_plan=None):
+        '''Return form to pick the locations to sync between.
+
+        If *sync_plan* is given, the form shows the plan of the sync for the
+        locations picked so far, and submitting it again launches the sync.
+
+        '''
+        values = event['data'].get('values', {})
         menu = {
             'type': 'form',
             'items': [],
@@ -151,7 +216,10 @@ class SyncAction(BaseAction):
             self.get_locations_menu(
                 'source_location',
                 label='Source',
-                default_value=self.get_current_location(name=True),
+                default_value=(
+                    values.get('source_location') or
+                    self.get_current_location(name=True)
+                ),
                 # exclude_inaccessibles=True
             )
         )
@@ -160,23 +228,81 @@ class SyncAction(BaseAction):
             self.get_locations_menu(
                 'dest_location',
                 label='Destination',
+                default_value=values.get('dest_location'),
                 #exclude_self=True
             )
         )
 
+        if values:
+            menu['items'].append(
+                {
+                    'value': (
+                        sync_plan.format() if sync_plan
+                        else 'Could not plan the sync, please check the logs'
+                    ),
+                    'type': 'label'
+                }
+            )
+            menu['items'].append(
+                {
+                    'type': 'hidden',
+                    'name': 'planned',
+                    'value': self.get_plan_key(values)
+                }
+            )
+            if sync_plan and not sync_plan.error:
+                # used to schedule the sync once launched.
+                menu['items'].append(
+                    {
+                        'type': 'hidden',
+                        'name': 'size',
+                        'value': sync_plan.size
+                    }
+                )
+        else:
+            menu['submit_button_label'] = 'Preview'
+
         event.update(menu)
         return event
 
+    def get_plan_key(self, values):
+        '''Return key of the sync planned for the form *values*.'''
+        return '{}:{}'.format(
+            values.get('source_location'), values.get('dest_location')
+        )
+
     def sync_here(self, event=None):
 
         try:
-            sync.on_sync_to_destination(
-                self.session,
-                event['data']['locations']['sync'],
-                event['data']['locations']['destination'],
-                event['data']['components'],
-                event['source']['user']
+            manifest_identifier = event['data'].get('manifest')
+            if manifest_identifier:
+                # components are read from the manifest once the sync runs.
+                components = []
+                function = functools.partial(
+                    sync.on_sync_to_destination,
+                    manifest_identifier=manifest_identifier
+                )
+            else:
+                components = event['data']['components']
+                function = sync.on_sync_to_destination
+
+            self._queue.submit(
+                function,
+                (
+                    event['data']['locations']['sync'],
+                    event['data']['locations']['destination'],
+                    components,
+                    event['source']['user']
+                ),
+                user_id=event['source']['user'],
+                size=event['data'].get('size')
             )
+        except worker.QueueFullError as error:
+            self.logger.warning(str(error))
+            return {
+                'success': False,
+                'message': str(error)
+            }
         except Exception:
             import traceback
             self.logger.error(traceback.format_exc())
@@ -189,21 +315,38 @@ class SyncAction(BaseAction):
             }
             raise
 
+        # ftrack.sync is not an action, anything returned would be published
+        # as a reply.
+        return None
+
     def sync_there(self, event):
         try:
             _id = event['source']['id']
             source_location = event['data']['values']['source_location']
             dest_location = event['data']['values']['dest_location']
 
-            sync.on_sync_to_remote(
-                self.session,
-                source_location,
-                dest_location,
-                event['source']['user']['id'],
-                event['data'].get('selection', [])
+            selection = event['data'].get('selection', [])
+            # size planned when previewed, form values may come back as text.
+            size = event['data']['values'].get('size')
+            self._queue.submit(
+                sync.on_sync_to_remote,
+                (
+                    source_location,
+                    dest_location,
+                    event['source']['user']['id'],
+                    selection
+                ),
+                user_id=event['source']['user']['id'],
+                size=float(size) if size not in (None, '') else None
             )
             self._location_data.pop(_id) if _id in self._location_data else None
 
+        except worker.QueueFullError as error:
+            self.logger.warning(str(error))
+            return {
+                'success': False,
+                'message': str(error)
+            }
         except Exception:
             import traceback
             self.logger.error(traceback.format_exc())
@@ -216,6 +359,11 @@ class SyncAction(BaseAction):
             }
             raise
 
+        return {
+            'success': True,
+            'message': 'Sync queued'
+        }
+
     def discover(self, session, entities, event):
         if not entities:
             return False
@@ -226,15 +374,37 @@ class SyncAction(BaseAction):
 
         return True
 
+    @timing.timed('Sync action discover', timing.DISCOVER_BUDGET)
     def _discover(self, event):
-        accepts = super(SyncAction, self)._discover(event)
-        # add location to discovered item.
+        # only the first selected entity is checked, no need to translate the
+        # whole selection.
+        selection = event['data'].get('selection', [])[:1]
+        entities = [
+            (self._get_entity_type(entity), entity.get('entityId'))
+            for entity in selection
+        ]
 
-        if accepts:
-            for item in accepts['items']:
-                item['location'] = self.location['name']
+        if not self.discover(self.session, entities, event):
+            return
 
-        return accepts
+        return {
+            'items': [dict(self._get_cached('discover', self._build_discover_item))]
+        }
+
+    def _build_discover_item(self):
+        '''Return discovered item, with the location added.'''
+        return {
+            'icon': self.icon,
+            'label': self.label,
+            'variant': self.variant,
+            'description': self.description,
+            'actionIdentifier': self.identifier,
+            'location': self.location['name']
+        }
+
+    @timing.timed('Sync action launch', timing.LAUNCH_BUDGET)
+    def _launch(self, event):
+        return super(SyncAction, self)._launch(event)
 
     def launch(self, session, entities, event):
         self.logger.info("Sync action launched from location {}".format(self.location['name']))
@@ -242,6 +412,12 @@ class SyncAction(BaseAction):
         if 'values' not in event['data']:
             event = self.get_locations_ui(event)
             return event
+        elif (
+            event['data']['values'].get('planned') !=
+            self.get_plan_key(event['data']['values'])
+        ):
+            # show what the sync is going to do before running it.
+            return self.get_locations_ui(event, self.get_sync_plan(event))
         else:
             try:
                 event = self.build_sync_event(event)
@@ -267,6 +443,12 @@ class SyncAction(BaseAction):
         )
 
     def _register(self, event):
+        # run syncs in the background, with the locations configured so far.
+        self._queue = worker.SyncQueue(self.session)
+
+        # refresh cached locations when they change on the server.
+        self._locations.subscribe()
+
         # discover action
         self.session.event_hub.subscribe(
             'topic=ftrack.action.discover',
@@ -6,17 +6,18 @@ import sys
 import logging
 import functools
 import platform
-from types import MethodType
+import time
+
+_start = time.time()
 
 dependencies_directory = os.path.abspath(
     os.path.join(os.path.dirname(__file__), '..', 'dependencies')
 )
 sys.path.append(dependencies_directory)
 
-import boto3
 import ftrack_api
 import ftrack_api.structure.standard
-from ftrack_s3_accessor.s3 import S3Accessor
+from ftrack_user_location import lazy, location_ids, timing
 
 # Mandatory environment variables.
 AWS_ACCESS_KEY = os.getenv('FTRACK_USER_SYNC_LOCATION_AWS_ID')
@@ -44,40 +45,58 @@ if not FTRACK_SYNC_BUCKET:
 logging.info('ftrack Sync bucket set to : {}'.format(FTRACK_SYNC_BUCKET))
 
 
+SYNC_LOCATION_NAME = 'ftrack.sync'
+
 SYNC_LOCATION_PRIORITY = os.getenv(
     'FTRACK_USER_SYNC_LOCATION_PRIORITY',
     1000
 )
 
 
-def get_url(self, resource_identifier=None):
-    '''Return url for *resource_identifier*.'''
-    s3_object = self.bucket.Object(resource_identifier)
-    try:
-        location = boto3.client('s3').get_bucket_location(Bucket=self.bucket_name)['LocationConstraint']
-        url = "https://s3-{}.amazonaws.com/{}/{}".format(location, self.bucket_name, s3_object.key)
-    except Exception:
-        url = 'Missing, GetBucketLocation option.... please enable on the bucket to render component path.'
-    return url
+def create_accessor(bucket_name):
+    '''Return accessor of the sync location, storing data in *bucket_name*.
+
+    boto3 is only imported here, when the location data is first accessed.
+
+    '''
+    from ftrack_user_location.accessor import SyncS3Accessor
 
+    return SyncS3Accessor(bucket_name)
 
+
+@timing.timed('Sync location configuration', timing.STARTUP_BUDGET)
 def configure_location(session, event):
     '''Configure locations for *session* and *event*.'''
 
     logging.info('Configuring location....')
 
-    my_location = session.ensure(
-        'Location', {
-            'name': 'ftrack.sync'
-        }
+    location_id = location_ids.get_location_id(
+        session.server_url, SYNC_LOCATION_NAME
     )
+    if location_id:
+        # Inject the known location in the session cache rather than
+        # querying it every time, as the user location does.
+        my_location = session.create(
+            'Location',
+            data=dict(name=SYNC_LOCATION_NAME, id=location_id),
+            reconstructing=True
+        )
+    else:
+        my_location = session.ensure(
+            'Location', {
+                'name': SYNC_LOCATION_NAME
+            }
+        )
+        location_ids.set_location_id(
+            session.server_url, SYNC_LOCATION_NAME, my_location['id']
+        )
 
     # Set new structure in location.
     my_location.structure = ftrack_api.structure.standard.StandardStructure()
 
-    accessor = S3Accessor(FTRACK_SYNC_BUCKET)
-    accessor.get_url = MethodType(get_url, accessor)
-    my_location.accessor = accessor
+    my_location.accessor = lazy.LazyAccessor(
+        functools.partial(create_accessor, FTRACK_SYNC_BUCKET)
+    )
 
     # Set priority.
     my_location.priority = int(SYNC_LOCATION_PRIORITY)
@@ -101,4 +120,11 @@ def register(api_object):
         'topic=ftrack.api.session.configure-location',
         functools.partial(configure_location, api_object),
         priority=0
-    )
\ No newline at end of file
+    )
+
+
+logging.debug(
+    'Sync location plugin imported in {:.1f}ms.'.format(
+        (time.time() - _start) * 1000
+    )
+)
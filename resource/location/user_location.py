@@ -6,9 +6,16 @@ import sys
 import functools
 import logging
 import platform
+
+dependencies_directory = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'dependencies')
+)
+sys.path.append(dependencies_directory)
+
 import ftrack_api
 import ftrack_api.accessor.disk as _disk
 import ftrack_api.structure.standard as _standard
+from ftrack_user_location import location_ids, timing
 
 
 logger = logging.getLogger(
@@ -18,6 +25,7 @@ logger = logging.getLogger(
 
 
 
+@timing.timed('User location configuration', timing.STARTUP_BUDGET)
 def configure_location(session, event):
     '''Listen.'''
 
@@ -61,20 +69,35 @@ def configure_location(session, event):
         DEFAULT_LOCATION_NAME
     )
 
-    location = session.query('Location where name is "{}"'.format(USER_LOCATION_NAME)).first()
-    if not location:
-        location = session.ensure(
-            'Location', 
-            {
-                'name': USER_LOCATION_NAME,
-                'description': 'User location for user '
-                ': {}, on host {}, with path: {}'.format(
-                    session.api_user, 
-                    hostname,
-                    os.path.abspath(USER_DISK_PREFIX)
-                )
-            }
+    location_id = location_ids.get_location_id(session.server_url, USER_LOCATION_NAME)
+    if location_id:
+        # Inject the known location in the session cache, as the session does
+        # for its builtin locations, rather than querying it every time.
+        location = session.create(
+            'Location',
+            data=dict(name=USER_LOCATION_NAME, id=location_id),
+            reconstructing=True
         )
+    else:
+        location = session.query('Location where name is "{}"'.format(USER_LOCATION_NAME)).first()
+        if not location:
+            location = session.ensure(
+                'Location', 
+                {
+                    'name': USER_LOCATION_NAME,
+                    'description': 'User location for user '
+                    ': {}, on host {}, with path: {}'.format(
+                        session.api_user, 
+                        hostname,
+                        os.path.abspath(USER_DISK_PREFIX)
+                    )
+                }
+            )
+
+        location_ids.set_location_id(
+            session.server_url, USER_LOCATION_NAME, location['id']
+        )
+
 
     location.accessor = _disk.DiskAccessor(
         prefix=USER_DISK_PREFIX
@@ -99,6 +99,8 @@ setup(
         'ftrack-s3-accessor'
     ],
     tests_require=[
+        'pytest',
+        'moto >= 5'
     ],
     zip_safe=False,
     cmdclass={
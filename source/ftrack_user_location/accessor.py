@@ -0,0 +1,1170 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import tarfile
+import tempfile
+import threading
+import contextlib
+from concurrent import futures
+
+import boto3
+import boto3.s3.transfer
+import botocore.config
+import botocore.exceptions
+from ftrack_api.data import FileWrapper
+from ftrack_api.exception import (
+    AccessorResourceInvalidError,
+    AccessorOperationFailedError
+)
+from ftrack_s3_accessor.s3 import S3Accessor
+
+from ftrack_user_location import (
+    compression, configure_logging, controller, retry
+)
+from ftrack_user_location.digest import get_digest, get_file_digest, get_cache
+from ftrack_user_location.journal import get_journal
+
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Maximum number of parts of a S3 multipart upload.
+MAX_PARTS = 10000
+
+# Files bigger than this size (in bytes) are transferred in multiple parts.
+MULTIPART_THRESHOLD = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MULTIPART_THRESHOLD', 64 * MB
+))
+
+# Size (in bytes) of each part of a multipart transfer.
+MULTIPART_CHUNKSIZE = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MULTIPART_CHUNKSIZE', 16 * MB
+))
+
+# Number of parts transferred at the same time for a single file.
+MULTIPART_CONCURRENCY = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MULTIPART_CONCURRENCY', 10
+))
+
+# Object metadata key holding the md5 digest of the uploaded content.
+DIGEST_METADATA_KEY = 'md5'
+
+# Object metadata keys holding the codec and original size of compressed
+# objects.
+ENCODING_METADATA_KEY = 'encoding'
+SIZE_METADATA_KEY = 'size'
+
+# Whether uploads of content already in the bucket are replaced by copies.
+DEDUPLICATE = os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_DEDUPLICATE', ''
+).lower() in ('1', 'true', 'yes')
+
+# Prefix of the objects indexing the bucket content by digest.
+DIGEST_INDEX_PREFIX = '.digests/'
+
+# Target size (in bytes) of the archives sequence members are bundled in when
+# staged to the sync bucket, bundling is disabled when 0.
+BUNDLE_SIZE = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_BUNDLE_SIZE', 0
+))
+
+# Optional S3 endpoint, to use S3 compatible storages such as MinIO.
+ENDPOINT_URL = os.getenv('FTRACK_USER_SYNC_LOCATION_ENDPOINT_URL') or None
+
+# Whether urls of components are presigned, and for how many seconds.
+PRESIGNED_URLS = os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_PRESIGNED_URLS', ''
+).lower() in ('1', 'true', 'yes')
+
+URL_EXPIRY = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_URL_EXPIRY', 3600
+))
+
+# Maximum number of connections kept open to S3, shared by all the threads
+# of the process.
+MAX_POOL_CONNECTIONS = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MAX_POOL_CONNECTIONS', 50
+))
+
+# Whether TCP keep-alive is enabled on the connections to S3.
+TCP_KEEPALIVE = os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_TCP_KEEPALIVE', 'true'
+).lower() in ('1', 'true', 'yes')
+
+# Seconds before looking up again the region of a bucket after a failure.
+REGION_RETRY_DELAY = 300
+
+MISSING_REGION_URL = (
+    'Missing, GetBucketLocation option.... please enable on the bucket to '
+    'render component path.'
+)
+
+_lock = threading.Lock()
+_local = threading.local()
+_session = None
+_clients = {}
+_bucket_regions = {}
+_bucket_failures = {}
+
+
+def get_config():
+    '''Return :class:`botocore.config.Config` of the S3 connections.'''
+    return botocore.config.Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=TCP_KEEPALIVE
+    )
+
+
+def get_session():
+    '''Return boto3 session shared by the whole process.
+
+    Sessions are not thread safe, clients and resources must be created from
+    it while holding the module lock.
+
+    '''
+    global _session
+
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+
+    return _session
+
+
+def get_client(endpoint_url=None):
+    '''Return S3 client shared by the whole process for *endpoint_url*.
+
+    Clients are thread safe, so a single one is created and reused for
+    each endpoint, along with its pool of connections.
+
+    '''
+    session = get_session()
+    with _lock:
+        client = _clients.get(endpoint_url)
+        if client is None:
+            client = session.client(
+                's3', endpoint_url=endpoint_url, config=get_config()
+            )
+            _clients[endpoint_url] = client
+
+    return client
+
+
+def get_resource(endpoint_url=None):
+    '''Return S3 resource of the current thread for *endpoint_url*.
+
+    Resources are not thread safe, so one is created and reused by each
+    thread. They all send their requests through the client shared by the
+    process, and its pool of connections.
+
+    '''
+    resources = getattr(_local, 'resources', None)
+    if resources is None:
+        resources = _local.resources = {}
+
+    resource = resources.get(endpoint_url)
+    if resource is None:
+        session = get_session()
+        with _lock:
+            resource = session.resource(
+                's3', endpoint_url=endpoint_url, config=get_config()
+            )
+        resource.meta.client = get_client(endpoint_url)
+        resources[endpoint_url] = resource
+
+    return resource
+
+
+def get_bucket_region(bucket_name, endpoint_url=None):
+    '''Return region of *bucket_name*, looked up once per bucket.
+
+    Return None if the region can not be retrieved, e.g. when the
+    GetBucketLocation permission is missing. Failures are remembered for
+    REGION_RETRY_DELAY seconds only, so the region is looked up again once
+    the permission or the connection is restored.
+
+    '''
+    key = (endpoint_url, bucket_name)
+    region = _bucket_regions.get(key)
+    if region is not None:
+        return region
+
+    if _bucket_failures.get(key, 0) > time.time() - REGION_RETRY_DELAY:
+        return None
+
+    try:
+        location = get_client(endpoint_url).get_bucket_location(
+            Bucket=bucket_name
+        )['LocationConstraint']
+    except Exception as error:
+        logger.warning(
+            'Could not get region of bucket {}: {}'.format(
+                bucket_name, error
+            )
+        )
+        _bucket_failures[key] = time.time()
+        return None
+
+    # Buckets in us-east-1 have no location constraint.
+    region = _bucket_regions[key] = location or 'us-east-1'
+    _bucket_failures.pop(key, None)
+    return region
+
+
+def get_transfer_config(
+    multipart_threshold=None, multipart_chunksize=None, max_concurrency=None
+):
+    '''Return :class:`boto3.s3.transfer.TransferConfig` for managed transfers.
+
+    Values not provided default to the FTRACK_USER_SYNC_LOCATION_MULTIPART_*
+    environment variables.
+
+    '''
+    return boto3.s3.transfer.TransferConfig(
+        multipart_threshold=multipart_threshold or MULTIPART_THRESHOLD,
+        multipart_chunksize=multipart_chunksize or MULTIPART_CHUNKSIZE,
+        max_concurrency=max_concurrency or MULTIPART_CONCURRENCY,
+        use_threads=True
+    )
+
+
+def get_object_digest(response):
+    '''Return md5 hex digest of an object content, if known.
+
+    *response* is the response of a HEAD request on the object. The digest
+    is read from the object metadata, or from the ETag for objects not
+    uploaded in multiple parts. Return None if it can not be determined.
+
+    '''
+    digest = response.get('Metadata', {}).get(DIGEST_METADATA_KEY)
+    if digest:
+        return digest
+
+    etag = response.get('ETag', '').strip('"')
+    if etag and '-' not in etag:
+        return etag
+
+    return None
+
+
+def get_object_size(response):
+    '''Return size in bytes of an object content once decompressed.
+
+    *response* is the response of a HEAD request on the object. The size of
+    compressed objects is read from the object metadata, falling back to the
+    size of the object itself.
+
+    '''
+    size = response.get('Metadata', {}).get(SIZE_METADATA_KEY)
+    if size:
+        return int(size)
+
+    return response['ContentLength']
+
+
+def get_object_encoding(response):
+    '''Return codec an object is compressed with, or None.
+
+    *response* is the response of a HEAD request on the object.
+
+    '''
+    return response.get('Metadata', {}).get(ENCODING_METADATA_KEY)
+
+
+def get_callback():
+    '''Return progress callback of managed transfers, or None.
+
+    The callback waits for the bandwidth limiter, if any, so managed
+    transfers stay within the bandwidth limit.
+
+    '''
+    limiter = controller.get_limiter()
+    if limiter is None:
+        return None
+
+    return limiter.consume
+
+
+def get_part_size(size, chunksize):
+    '''Return size of the parts used to transfer *size* bytes.
+
+    Parts are *chunksize* bytes, unless more are needed to stay within the
+    maximum number of parts of a multipart upload.
+
+    '''
+    return max(chunksize, int(math.ceil(float(size) / MAX_PARTS)))
+
+
+class SyncS3File(FileWrapper):
+    '''S3 file transferred with managed multipart transfers.
+
+    Content is buffered in a temporary file, kept in memory up to the
+    multipart threshold, downloaded on open when reading and uploaded on
+    close when writing, along with the md5 digest of the content.
+    Compressed objects are decompressed when downloaded.
+
+    '''
+
+    def __init__(self, client, bucket_name, key, mode='rb', config=None):
+        '''Initialise file for object *key* of *bucket_name* with *mode*.
+
+        The object is transferred with *client* and transfer *config*.
+
+        '''
+        self.client = client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.mode = mode
+        self.config = config or get_transfer_config()
+        super(SyncS3File, self).__init__(
+            tempfile.SpooledTemporaryFile(
+                max_size=self.config.multipart_threshold
+            )
+        )
+
+        if 'w' not in mode:
+            response = self.client.head_object(Bucket=bucket_name, Key=key)
+            self.client.download_fileobj(
+                bucket_name, key, self.wrapped_file, Config=self.config,
+                Callback=get_callback()
+            )
+            self.wrapped_file.seek(0)
+
+            encoding = get_object_encoding(response)
+            if encoding:
+                compressed = self.wrapped_file
+                self.wrapped_file = tempfile.SpooledTemporaryFile(
+                    max_size=self.config.multipart_threshold
+                )
+                compression.decompress(compressed, self.wrapped_file, encoding)
+                compressed.close()
+                self.wrapped_file.seek(0)
+
+            if 'a' in mode:
+                self.wrapped_file.seek(0, os.SEEK_END)
+
+    @property
+    def writable(self):
+        '''Return whether content is uploaded on close.'''
+        return any(flag in self.mode for flag in ('w', 'a', '+'))
+
+    def close(self):
+        '''Upload content if writable and close.'''
+        if self.closed:
+            return
+
+        if self.writable:
+            self.wrapped_file.flush()
+            self.wrapped_file.seek(0)
+            digest = get_digest(self.wrapped_file)
+            self.wrapped_file.seek(0)
+            self.client.upload_fileobj(
+                self.wrapped_file, self.bucket_name, self.key,
+                ExtraArgs={'Metadata': {DIGEST_METADATA_KEY: digest}},
+                Config=self.config, Callback=get_callback()
+            )
+
+        # the managed upload closes the file once done, so it can not be
+        # flushed again.
+        self.closed = True
+        self.wrapped_file.close()
+
+
+class SyncS3Accessor(S3Accessor):
+    '''S3 accessor using managed multipart transfers.
+
+    Unless disabled, the number of parts of big files transferred at the same
+    time is adjusted to the throughput achieved, and all transfers are kept
+    within the optional bandwidth limit. Parts failing with throttling or
+    network errors are retried on their own.
+
+    '''
+
+    # Transfers are kept within the bandwidth limit by the accessor itself.
+    limits_bandwidth = True
+
+    def __init__(
+        self, bucket_name, config=None, endpoint_url=None, deduplicate=None,
+        bundle_size=None, compression_codec=None
+    ):
+        '''Initialise accessor for *bucket_name*.
+
+        *config* is the :class:`boto3.s3.transfer.TransferConfig` used for
+        uploads and downloads, default to :func:`get_transfer_config`.
+
+        *endpoint_url* can be set to use a S3 compatible storage, default to
+        FTRACK_USER_SYNC_LOCATION_ENDPOINT_URL.
+
+        If *deduplicate* is True, uploaded files whose content is already in
+        the bucket are copied server side instead, default to
+        FTRACK_USER_SYNC_LOCATION_DEDUPLICATE.
+
+        *bundle_size* is the target size in bytes of the archives members of
+        sequences are bundled in, default to
+        FTRACK_USER_SYNC_LOCATION_BUNDLE_SIZE. Bundling is disabled when 0.
+
+        *compression_codec* is the codec uploaded files are compressed with,
+        default to FTRACK_USER_SYNC_LOCATION_COMPRESSION. Files are uploaded
+        as they are when False.
+
+        '''
+        super(SyncS3Accessor, self).__init__(bucket_name)
+        self.config = config or get_transfer_config()
+        self.endpoint_url = endpoint_url or ENDPOINT_URL
+        self.deduplicate = DEDUPLICATE if deduplicate is None else deduplicate
+        self.bundle_size = BUNDLE_SIZE if bundle_size is None else bundle_size
+        self.compression_codec = (
+            compression.get_codec() if compression_codec is None
+            else compression_codec
+        )
+        # Members of the bundle indexes read, by key, along with their etag.
+        self._bundle_indexes = {}
+
+    def __deepcopy__(self, memo):
+        '''Return a new instance sharing the same configuration.'''
+        return self.__class__(
+            self.bucket_name, config=self.config,
+            endpoint_url=self.endpoint_url, deduplicate=self.deduplicate,
+            bundle_size=self.bundle_size,
+            compression_codec=self.compression_codec
+        )
+
+    @property
+    def s3(self):
+        '''Return S3 resource of the current thread.'''
+        return get_resource(self.endpoint_url)
+
+    @property
+    def client(self):
+        '''Return S3 client shared by the whole process.'''
+        return get_client(self.endpoint_url)
+
+    def get_url(self, resource_identifier=None):
+        '''Return url for *resource_identifier*.'''
+        return self.get_urls([resource_identifier])[0]
+
+    def get_urls(self, resource_identifiers, presigned=None, expires_in=None):
+        '''Return urls for *resource_identifiers*.
+
+        If *presigned* is True, return urls signed for *expires_in* seconds.
+        They default to FTRACK_USER_SYNC_LOCATION_PRESIGNED_URLS and
+        FTRACK_USER_SYNC_LOCATION_URL_EXPIRY.
+
+        '''
+        presigned = PRESIGNED_URLS if presigned is None else presigned
+        expires_in = expires_in or URL_EXPIRY
+
+        if presigned:
+            client = get_client(self.endpoint_url)
+            return [
+                client.generate_presigned_url(
+                    'get_object',
+                    Params={
+                        'Bucket': self.bucket_name,
+                        'Key': resource_identifier
+                    },
+                    ExpiresIn=expires_in
+                )
+                for resource_identifier in resource_identifiers
+            ]
+
+        if self.endpoint_url:
+            template = '{}/{}/{{}}'.format(
+                self.endpoint_url.rstrip('/'), self.bucket_name
+            )
+        else:
+            region = get_bucket_region(self.bucket_name)
+            if region is None:
+                return [MISSING_REGION_URL for _ in resource_identifiers]
+
+            template = 'https://s3-{}.amazonaws.com/{}/{{}}'.format(
+                region, self.bucket_name
+            )
+
+        return [
+            template.format(resource_identifier)
+            for resource_identifier in resource_identifiers
+        ]
+
+    def open(self, resource_identifier, mode='rb'):
+        '''Return :class:`SyncS3File` for *resource_identifier*.
+
+        Unlike :meth:`S3Accessor.open`, nothing is written to the bucket until
+        the file is closed.
+
+        '''
+        if self.is_container(resource_identifier):
+            raise AccessorResourceInvalidError(
+                resource_identifier,
+                message='Cannot open a directory: {resource_identifier}'
+            )
+
+        return SyncS3File(
+            self.client, self.bucket_name, resource_identifier,
+            mode=mode, config=self.config
+        )
+
+    def remove(self, resource_identifier):
+        '''Remove *resource_identifier*.
+
+        Unlike :meth:`S3Accessor.remove`, files are looked up with a HEAD
+        request, as the base accessor never loads the objects it checks.
+
+        The digest index entry of the removed content is dropped, so it is
+        not copied from the removed object anymore. Bundled members of
+        sequences are dropped from their bundle, which is removed once empty.
+
+        '''
+        try:
+            response = self.client.head_object(
+                Bucket=self.bucket_name, Key=resource_identifier
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                raise
+
+            if self._remove_bundled(resource_identifier):
+                return
+
+            return super(SyncS3Accessor, self).remove(resource_identifier)
+
+        self.client.delete_object(
+            Bucket=self.bucket_name, Key=resource_identifier
+        )
+
+        digest = response['Metadata'].get(DIGEST_METADATA_KEY)
+        if digest:
+            self._drop_digest(digest, resource_identifier)
+
+    def download(self, resource_identifier, path):
+        '''Download *resource_identifier* to the local file *path*.
+
+        Objects bigger than the multipart threshold are fetched with
+        concurrent ranged requests into a temporary file, which is then moved
+        to *path*. Compressed objects are downloaded next to *path* and
+        decompressed. The content is checked against the size and digest of
+        the object.
+
+        Raise :exc:`ftrack_api.exception.AccessorOperationFailedError` if the
+        downloaded content does not match the size or the digest.
+
+        '''
+        response = self.client.head_object(
+            Bucket=self.bucket_name, Key=resource_identifier
+        )
+        expected_digest = get_object_digest(response)
+        encoding = get_object_encoding(response)
+
+        if encoding:
+            compressed_path = '{}.{}'.format(path, encoding)
+            self._download_file(resource_identifier, response, compressed_path)
+            try:
+                with open(compressed_path, 'rb') as source, \
+                        open(path, 'wb') as target:
+                    compression.decompress(source, target, encoding)
+            finally:
+                os.remove(compressed_path)
+        else:
+            self._download_file(resource_identifier, response, path)
+
+        expected_size = get_object_size(response)
+        size = os.path.getsize(path)
+        if size != expected_size:
+            os.remove(path)
+            raise AccessorOperationFailedError(
+                operation='download',
+                resource_identifier=resource_identifier,
+                error='size mismatch, expected {} got {}'.format(
+                    expected_size, size
+                )
+            )
+
+        if expected_digest is None:
+            logger.debug(
+                'No digest available to check {}.'.format(resource_identifier)
+            )
+            return
+
+        digest = get_file_digest(path)
+        if digest != expected_digest:
+            os.remove(path)
+            raise AccessorOperationFailedError(
+                operation='download',
+                resource_identifier=resource_identifier,
+                error='checksum mismatch, expected {} got {}'.format(
+                    expected_digest, digest
+                )
+            )
+
+    def _head(self, key):
+        '''Return metadata of object *key*, or None if it does not exist.'''
+        try:
+            response = self.client.head_object(
+                Bucket=self.bucket_name, Key=key
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+
+        return response['Metadata']
+
+    def _find_digest(self, digest):
+        '''Return key of an object in the bucket matching *digest*, if any.
+
+        The object the index points to is checked to still hold content with
+        *digest*, as it may have been removed or replaced since. Stale index
+        entries are dropped.
+
+        '''
+        index = self._head(DIGEST_INDEX_PREFIX + digest)
+        if index is None:
+            return None
+
+        key = index.get('key')
+        metadata = self._head(key) if key else None
+        if metadata is not None and (
+            metadata.get(DIGEST_METADATA_KEY) == digest
+        ):
+            return key
+
+        logger.debug(
+            'Dropping stale digest index entry of {} to {}.'.format(
+                digest, key
+            )
+        )
+        self.client.delete_object(
+            Bucket=self.bucket_name, Key=DIGEST_INDEX_PREFIX + digest
+        )
+        return None
+
+    def _drop_digest(self, digest, resource_identifier):
+        '''Drop index entry of *digest* if it points to *resource_identifier*.'''
+        index = self._head(DIGEST_INDEX_PREFIX + digest)
+        if index is not None and index.get('key') == resource_identifier:
+            self.client.delete_object(
+                Bucket=self.bucket_name, Key=DIGEST_INDEX_PREFIX + digest
+            )
+
+    def upload(self, path, resource_identifier):
+        '''Upload the local file *path* to *resource_identifier*.
+
+        Files bigger than the multipart threshold are uploaded in multiple
+        parts at the same time.
+
+        When deduplicating, the upload is skipped if the object already holds
+        the same content, or replaced by a server side copy of an object with
+        the same digest.
+
+        Files matching the compression settings are compressed in the staging
+        directory first, the digest and size of the original content being
+        kept in the object metadata.
+
+        The digest of *path* is kept in the digest cache, so it can be listed
+        in sync manifests without hashing the file again.
+
+        '''
+        digest = get_cache().get(path)
+
+        extra_args = {'Metadata': {DIGEST_METADATA_KEY: digest}}
+
+        if self.deduplicate:
+            existing = self._find_digest(digest)
+            if existing == resource_identifier:
+                logger.debug(
+                    'Skipping upload of {}, content already in {}.'.format(
+                        path, resource_identifier
+                    )
+                )
+                return
+
+            if existing:
+                try:
+                    # Metadata of the copied object, including its encoding,
+                    # is kept as is.
+                    self.client.copy(
+                        {'Bucket': self.bucket_name, 'Key': existing},
+                        self.bucket_name, resource_identifier,
+                        Config=self.config
+                    )
+                except botocore.exceptions.ClientError as error:
+                    logger.debug(
+                        'Could not copy {} to {}: {}'.format(
+                            existing, resource_identifier, error
+                        )
+                    )
+                else:
+                    logger.debug(
+                        'Copied {} to {} instead of uploading {}.'.format(
+                            existing, resource_identifier, path
+                        )
+                    )
+                    return
+
+        if self.deduplicate:
+            # the content replaced is not available from this object anymore.
+            metadata = self._head(resource_identifier)
+            previous_digest = (metadata or {}).get(DIGEST_METADATA_KEY)
+            if previous_digest and previous_digest != digest:
+                self._drop_digest(previous_digest, resource_identifier)
+
+        if self.compression_codec and compression.should_compress(path):
+            compressed_path = self._compress(path, digest)
+            extra_args['Metadata'].update({
+                ENCODING_METADATA_KEY: self.compression_codec,
+                SIZE_METADATA_KEY: str(os.path.getsize(path))
+            })
+            self._upload_file(compressed_path, resource_identifier, extra_args)
+            os.remove(compressed_path)
+        else:
+            self._upload_file(path, resource_identifier, extra_args)
+
+        if self.deduplicate:
+            self.client.put_object(
+                Bucket=self.bucket_name, Key=DIGEST_INDEX_PREFIX + digest,
+                Body=b'', Metadata={'key': resource_identifier}
+            )
+
+    def _compress(self, path, digest):
+        '''Return path of *path* compressed in the staging directory.
+
+        The compressed file is named after the *digest* of *path*, so an
+        interrupted upload of the same content is resumed from it.
+
+        '''
+        directory = os.path.join(
+            configure_logging.get_data_directory(), 'staging'
+        )
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        compressed_path = os.path.join(
+            directory, '{}.{}'.format(digest, self.compression_codec)
+        )
+        if os.path.exists(compressed_path):
+            return compressed_path
+
+        temporary_path = '{}.{}'.format(compressed_path, uuid.uuid4().hex)
+        with open(path, 'rb') as source, open(temporary_path, 'wb') as target:
+            compression.compress(source, target, self.compression_codec)
+        os.replace(temporary_path, compressed_path)
+
+        logger.debug(
+            'Compressed {} from {} to {} bytes.'.format(
+                path, os.path.getsize(path), os.path.getsize(compressed_path)
+            )
+        )
+        return compressed_path
+
+    def _upload_file(self, path, resource_identifier, extra_args):
+        '''Upload *path* to *resource_identifier* with *extra_args*.
+
+        Big files are uploaded in parts recorded in the transfer journal, so
+        an interrupted upload of the same file resumes from the parts already
+        uploaded.
+
+        '''
+        journal = get_journal()
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        if journal is None or stat.st_size <= self.config.multipart_threshold:
+            self.client.upload_file(
+                path, self.bucket_name, resource_identifier,
+                ExtraArgs=extra_args, Config=self.config,
+                Callback=get_callback()
+            )
+            return
+
+        client = self.client
+        upload = journal.get_upload(
+            self.bucket_name, resource_identifier, path,
+            stat.st_size, stat.st_mtime
+        )
+
+        if upload:
+            upload_id, part_size = upload
+            parts = journal.get_parts(upload_id)
+            logger.info(
+                'Resuming upload of {} to {}, {} parts already uploaded.'.format(
+                    path, resource_identifier, len(parts)
+                )
+            )
+        else:
+            self._abort_upload(journal, resource_identifier)
+            part_size = get_part_size(
+                stat.st_size, self.config.multipart_chunksize
+            )
+            upload_id = client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=resource_identifier, **extra_args
+            )['UploadId']
+            journal.set_upload(
+                self.bucket_name, resource_identifier, path,
+                stat.st_size, stat.st_mtime, part_size, upload_id
+            )
+            parts = {}
+
+        def _upload_part(part_number):
+            with open(path, 'rb') as file_object:
+                file_object.seek((part_number - 1) * part_size)
+                body = file_object.read(part_size)
+
+            def _attempt():
+                with self._part_slot():
+                    self._consume(len(body))
+                    etag = client.upload_part(
+                        Bucket=self.bucket_name, Key=resource_identifier,
+                        UploadId=upload_id, PartNumber=part_number, Body=body
+                    )['ETag']
+                    self._record(len(body))
+                    return etag
+
+            etag = retry.call(_attempt)
+            journal.add_part(upload_id, part_number, etag)
+            return part_number, etag
+
+        part_count = max(1, int(math.ceil(float(stat.st_size) / part_size)))
+        missing = [
+            part_number for part_number in range(1, part_count + 1)
+            if part_number not in parts
+        ]
+
+        try:
+            with futures.ThreadPoolExecutor(
+                max_workers=self._get_part_workers()
+            ) as executor:
+                parts.update(executor.map(_upload_part, missing))
+
+            client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=resource_identifier,
+                UploadId=upload_id,
+                MultipartUpload={
+                    'Parts': [
+                        {'ETag': parts[part_number], 'PartNumber': part_number}
+                        for part_number in sorted(parts)
+                    ]
+                }
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] != 'NoSuchUpload':
+                raise
+
+            # The upload expired or was aborted, start it again.
+            journal.clear_upload(self.bucket_name, resource_identifier)
+            if not upload:
+                raise
+
+            return self._upload_file(path, resource_identifier, extra_args)
+
+        journal.clear_upload(self.bucket_name, resource_identifier)
+
+    def _abort_upload(self, journal, resource_identifier):
+        '''Abort upload in progress to *resource_identifier* of another file.
+
+        Parts already uploaded are deleted from the bucket and forgotten by
+        *journal*.
+
+        '''
+        upload_id = journal.find_upload(self.bucket_name, resource_identifier)
+        if upload_id is None:
+            return
+
+        logger.debug(
+            'Aborting upload {} to {}, its file changed.'.format(
+                upload_id, resource_identifier
+            )
+        )
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=resource_identifier,
+                UploadId=upload_id
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] != 'NoSuchUpload':
+                raise
+
+        journal.clear_upload(self.bucket_name, resource_identifier)
+
+    def _get_part_controller(self):
+        '''Return controller of the number of parts transferred, or None.
+
+        It is shared by the accessors transferring the same number of parts
+        at the same time.
+
+        '''
+        return controller.get_controller(
+            'parts', self.config.max_concurrency
+        )
+
+    def _get_part_workers(self):
+        '''Return number of threads transferring parts.'''
+        part_controller = self._get_part_controller()
+        if part_controller is None:
+            return self.config.max_concurrency
+
+        return part_controller.maximum
+
+    def _part_slot(self):
+        '''Return context holding a part transfer slot of the controller.'''
+        part_controller = self._get_part_controller()
+        if part_controller is None:
+            return contextlib.nullcontext()
+
+        return part_controller.slot()
+
+    def _record(self, size):
+        '''Record *size* bytes of parts transferred with the controller.'''
+        part_controller = self._get_part_controller()
+        if part_controller is not None:
+            part_controller.record(size)
+
+    def _consume(self, size):
+        '''Wait until *size* bytes can be transferred within the limit.'''
+        limiter = controller.get_limiter()
+        if limiter is not None:
+            limiter.consume(size)
+
+    def _download_file(self, resource_identifier, response, path):
+        '''Download *resource_identifier* to *path*.
+
+        *response* is the response of a HEAD request on the object.
+
+        Big files are downloaded in parts into a temporary file next to
+        *path*, recorded in the transfer journal, so an interrupted download
+        resumes from the parts already downloaded.
+
+        '''
+        journal = get_journal()
+        size = response['ContentLength']
+        etag = response['ETag']
+
+        if journal is None or size <= self.config.multipart_threshold:
+            self.client.download_file(
+                self.bucket_name, resource_identifier, path,
+                Config=self.config, Callback=get_callback()
+            )
+            return
+
+        client = self.client
+        part_size = self.config.multipart_chunksize
+        part_path = path + '.part'
+        prefix = 'download:{}/{}:{}:'.format(
+            self.bucket_name, resource_identifier, os.path.abspath(path)
+        )
+        transfer_id = '{}{}:{}'.format(prefix, part_size, etag)
+
+        parts = {}
+        if os.path.exists(part_path):
+            parts = journal.get_parts(transfer_id)
+
+        if parts:
+            logger.info(
+                'Resuming download of {} to {}, {} parts already downloaded.'.format(
+                    resource_identifier, path, len(parts)
+                )
+            )
+        else:
+            # Data left, if any, is of another version of the object.
+            journal.clear_transfers(prefix)
+            with open(part_path, 'wb') as file_object:
+                file_object.truncate(size)
+
+        def _download_part(part_number):
+            start = (part_number - 1) * part_size
+            end = min(start + part_size, size) - 1
+            def _attempt():
+                with self._part_slot():
+                    body = client.get_object(
+                        Bucket=self.bucket_name, Key=resource_identifier,
+                        Range='bytes={}-{}'.format(start, end),
+                        IfMatch=etag
+                    )['Body'].read()
+                    self._record(len(body))
+                    self._consume(len(body))
+                    return body
+
+            body = retry.call(_attempt)
+
+            with open(part_path, 'r+b') as file_object:
+                file_object.seek(start)
+                file_object.write(body)
+
+            journal.add_part(transfer_id, part_number)
+
+        part_count = max(1, int(math.ceil(float(size) / part_size)))
+        missing = [
+            part_number for part_number in range(1, part_count + 1)
+            if part_number not in parts
+        ]
+
+        with futures.ThreadPoolExecutor(
+            max_workers=self._get_part_workers()
+        ) as executor:
+            list(executor.map(_download_part, missing))
+
+        os.replace(part_path, path)
+        journal.clear_parts(transfer_id)
+
+    def _get_bundle_prefix(self, resource_identifier):
+        '''Return prefix of the bundles of sequence *resource_identifier*.'''
+        directory, name = os.path.split(resource_identifier)
+        return '/'.join(
+            part for part in (directory, '.bundles', name) if part
+        ) + '/'
+
+    def upload_bundle(self, resource_identifier, files):
+        '''Upload *files* of sequence *resource_identifier* as one archive.
+
+        *files* is a list of (path, member resource identifier) tuples. The
+        archive is streamed to a temporary file and uploaded as a single
+        object, next to the other bundles of the sequence. The list of its
+        members is stored next to it, so only the bundles holding the members
+        needed are downloaded.
+
+        '''
+        name = '{}{}'.format(
+            self._get_bundle_prefix(resource_identifier), uuid.uuid4().hex
+        )
+        key = name + '.tar'
+
+        with tempfile.SpooledTemporaryFile(
+            max_size=self.config.multipart_threshold
+        ) as archive:
+            with tarfile.open(fileobj=archive, mode='w') as bundle:
+                for path, member_identifier in files:
+                    bundle.add(path, arcname=member_identifier)
+
+            archive.seek(0)
+            self.client.upload_fileobj(
+                archive, self.bucket_name, key, Config=self.config,
+                Callback=get_callback()
+            )
+
+        self.client.put_object(
+            Bucket=self.bucket_name, Key=name + '.json',
+            Body=json.dumps(
+                [member_identifier for _, member_identifier in files]
+            ).encode('utf-8')
+        )
+
+        logger.debug(
+            'Bundled {} members of {} in {}.'.format(
+                len(files), resource_identifier, key
+            )
+        )
+
+    def get_sequence_objects(self, resource_identifier):
+        '''Return objects holding the members of sequence *resource_identifier*.
+
+        Return a tuple of (bundle keys, member keys), members stored in their
+        own object being listed in the latter.
+
+        '''
+        directory = os.path.dirname(resource_identifier)
+        bundle_prefix = self._get_bundle_prefix(resource_identifier)
+
+        bundles = []
+        members = []
+        for entry in self.bucket.objects.filter(
+            Prefix=directory + '/' if directory else ''
+        ):
+            if not entry.key.startswith(bundle_prefix):
+                members.append(entry.key)
+            elif entry.key.endswith('.tar'):
+                bundles.append(entry.key)
+
+        return bundles, members
+
+    def get_bundle_members(self, key):
+        '''Return member resource identifiers of bundle *key*.
+
+        Return None if the members of the bundle were not recorded.
+
+        '''
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket_name,
+                Key=os.path.splitext(key)[0] + '.json'
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+
+        return json.loads(response['Body'].read().decode('utf-8'))
+
+    def _remove_bundled(self, resource_identifier):
+        '''Remove bundled *resource_identifier* and return whether it was found.
+
+        The member is dropped from the index of its bundle, and the bundle is
+        deleted along with its index once it holds no other member. Indexes
+        are only read again once changed, so removing all the members of a
+        sequence lists the bundles of its directory once per member.
+
+        '''
+        directory = os.path.dirname(resource_identifier)
+        prefix = '/'.join(part for part in (directory, '.bundles') if part)
+
+        for entry in self.bucket.objects.filter(Prefix=prefix + '/'):
+            if not entry.key.endswith('.json'):
+                continue
+
+            etag, members = self._bundle_indexes.get(entry.key, (None, None))
+            if etag != entry.e_tag:
+                members = json.loads(
+                    entry.get()['Body'].read().decode('utf-8')
+                )
+                self._bundle_indexes[entry.key] = (entry.e_tag, members)
+
+            if resource_identifier not in members:
+                continue
+
+            members = [
+                member for member in members if member != resource_identifier
+            ]
+            if members:
+                response = self.client.put_object(
+                    Bucket=self.bucket_name, Key=entry.key,
+                    Body=json.dumps(members).encode('utf-8')
+                )
+                self._bundle_indexes[entry.key] = (response['ETag'], members)
+            else:
+                logger.debug(
+                    'Removing bundle {}, all its members are removed.'.format(
+                        entry.key
+                    )
+                )
+                self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [
+                        {'Key': os.path.splitext(entry.key)[0] + '.tar'},
+                        {'Key': entry.key}
+                    ]}
+                )
+                self._bundle_indexes.pop(entry.key, None)
+
+            return True
+
+        return False
+
+    def iter_bundle(self, key):
+        '''Yield (member resource identifier, file object) of bundle *key*.
+
+        The bundle is streamed, so each file object must be consumed before
+        moving to the next one.
+
+        '''
+        body = self.client.get_object(
+            Bucket=self.bucket_name, Key=key
+        )['Body']
+        with tarfile.open(fileobj=body, mode='r|') as bundle:
+            for member in bundle:
+                if member.isfile():
+                    yield member.name, bundle.extractfile(member)
@@ -0,0 +1,120 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import zlib
+import logging
+import functools
+
+ZSTD_AVAILABLE = False
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+ZLIB = 'zlib'
+ZSTD = 'zstd'
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _get_extensions(name, default):
+    '''Return list of extensions set in environment variable *name*.'''
+    value = os.getenv(name, default)
+    return [
+        extension.strip().lower() for extension in value.split(',')
+        if extension.strip()
+    ]
+
+
+# Codec used to compress files staged to the sync bucket, disabled if empty.
+COMPRESSION = os.getenv('FTRACK_USER_SYNC_LOCATION_COMPRESSION', '').lower()
+
+COMPRESSION_LEVEL = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_COMPRESSION_LEVEL', 3
+))
+
+# Extensions of the files to compress, all files if empty.
+COMPRESSION_INCLUDE = _get_extensions(
+    'FTRACK_USER_SYNC_LOCATION_COMPRESSION_INCLUDE',
+    '.abc,.usda,.exr,.json'
+)
+
+# Extensions of the files never to compress.
+COMPRESSION_EXCLUDE = _get_extensions(
+    'FTRACK_USER_SYNC_LOCATION_COMPRESSION_EXCLUDE',
+    '.mov,.mp4,.jpg,.jpeg,.png,.zip,.gz,.zst'
+)
+
+
+def get_codec():
+    '''Return codec used to compress files, or None if disabled.'''
+    if not COMPRESSION or COMPRESSION in ('0', 'false', 'no'):
+        return None
+
+    if COMPRESSION == ZSTD and not ZSTD_AVAILABLE:
+        logger.warning(
+            'zstandard package not available, falling back to zlib compression.'
+        )
+        return ZLIB
+
+    if COMPRESSION not in (ZLIB, ZSTD):
+        return ZSTD if ZSTD_AVAILABLE else ZLIB
+
+    return COMPRESSION
+
+
+def should_compress(path):
+    '''Return whether file at *path* should be compressed.'''
+    extension = os.path.splitext(path)[-1].lower()
+    if extension in COMPRESSION_EXCLUDE:
+        return False
+
+    if COMPRESSION_INCLUDE and extension not in COMPRESSION_INCLUDE:
+        return False
+
+    return True
+
+
+def compress(source, target, codec, level=None):
+    '''Compress *source* file object into *target* file object with *codec*.'''
+    level = COMPRESSION_LEVEL if level is None else level
+
+    if codec == ZSTD:
+        zstandard.ZstdCompressor(level=level).copy_stream(source, target)
+
+    elif codec == ZLIB:
+        chunked_read = functools.partial(source.read, CHUNK_SIZE)
+        compressor = zlib.compressobj(max(0, min(level, 9)))
+        for chunk in iter(chunked_read, b''):
+            target.write(compressor.compress(chunk))
+        target.write(compressor.flush())
+
+    else:
+        raise ValueError('Unsupported compression codec {}.'.format(codec))
+
+
+def decompress(source, target, codec):
+    '''Decompress *source* file object into *target* file object with *codec*.'''
+    if codec == ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError(
+                'zstandard package is required to decompress this file.'
+            )
+        zstandard.ZstdDecompressor().copy_stream(source, target)
+
+    elif codec == ZLIB:
+        chunked_read = functools.partial(source.read, CHUNK_SIZE)
+        decompressor = zlib.decompressobj()
+        for chunk in iter(chunked_read, b''):
+            target.write(decompressor.decompress(chunk))
+        target.write(decompressor.flush())
+
+    else:
+        raise ValueError('Unsupported compression codec {}.'.format(codec))
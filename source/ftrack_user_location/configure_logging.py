@@ -29,6 +29,28 @@ def get_log_directory():
     return log_directory
 
 
+def get_data_directory():
+    '''Get data directory used to store local state of the sync.
+
+    Will create the directory (recursively) if it does not exist.
+
+    Raise if the directory can not be created.
+    '''
+    user_data_dir = appdirs.user_data_dir('ftrack-connect', 'ftrack')
+    data_directory = os.path.join(user_data_dir, 'ftrack_user_location')
+
+    if not os.path.exists(data_directory):
+        try:
+            os.makedirs(data_directory)
+        except OSError as error:
+            if error.errno == errno.EEXIST and os.path.isdir(data_directory):
+                pass
+            else:
+                raise
+
+    return data_directory
+
+
 def configure_logging(logger_name, level=None, format=None, extra_modules=None):
     '''Configure `loggerName` loggers with console and file handler.
 
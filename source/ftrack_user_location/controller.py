@@ -0,0 +1,257 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import logging
+import threading
+import contextlib
+
+import boto3.exceptions
+import botocore.exceptions
+import s3transfer.exceptions
+
+
+logger = logging.getLogger(__name__)
+
+# Whether the number of files and parts transferred at the same time is
+# adjusted to the throughput achieved.
+ADAPTIVE = os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_ADAPTIVE', 'true'
+).lower() in ('1', 'true', 'yes')
+
+# Maximum number of bytes per second transferred, no limit when 0.
+BANDWIDTH_LIMIT = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_BANDWIDTH_LIMIT', 0
+))
+
+# Number of seconds between two adjustments of the concurrency.
+ADJUST_INTERVAL = 5
+
+# Relative change of throughput considered significant.
+TOLERANCE = 0.05
+
+# Factor applied to the configured concurrency to get its upper bound.
+MAXIMUM_FACTOR = 2
+
+# Error codes returned by S3 when requests are throttled.
+THROTTLING_ERROR_CODES = (
+    'SlowDown', 'Throttling', 'ThrottlingException', 'RequestTimeout',
+    'RequestLimitExceeded', 'ServiceUnavailable', '503'
+)
+
+_lock = threading.Lock()
+_controllers = {}
+_limiter = None
+
+
+def is_throttling_error(error):
+    '''Return whether *error* is caused by throttling or network issues.
+
+    Errors of managed transfers are wrapped by boto3, uploads raising
+    :exc:`boto3.exceptions.S3UploadFailedError` from the client error and
+    downloads raising :exc:`boto3.exceptions.RetriesExceededError` once their
+    retries of network errors are exhausted.
+
+    '''
+    if isinstance(error, botocore.exceptions.ClientError):
+        return error.response['Error']['Code'] in THROTTLING_ERROR_CODES
+
+    if isinstance(error, (
+        boto3.exceptions.RetriesExceededError,
+        s3transfer.exceptions.RetriesExceededError
+    )):
+        return True
+
+    if isinstance(error, boto3.exceptions.S3UploadFailedError):
+        cause = error.__cause__ or error.__context__
+        if cause is not None:
+            return is_throttling_error(cause)
+
+        message = str(error)
+        return any(
+            '({})'.format(code) in message for code in THROTTLING_ERROR_CODES
+        )
+
+    return isinstance(error, (
+        botocore.exceptions.ConnectionError,
+        botocore.exceptions.HTTPClientError,
+        ConnectionError
+    ))
+
+
+class BandwidthLimiter(object):
+    '''Limit the number of bytes transferred per second.
+
+    Transfers call :meth:`consume` with the number of bytes they send or
+    receive, which blocks as long as needed to stay under the limit.
+
+    '''
+
+    def __init__(self, limit):
+        '''Initialise limiter allowing *limit* bytes per second.'''
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._available = float(limit)
+        self._last = time.time()
+
+    def consume(self, amount):
+        '''Wait until *amount* bytes can be transferred.'''
+        with self._lock:
+            now = time.time()
+            self._available = min(
+                self.limit, self._available + (now - self._last) * self.limit
+            )
+            self._last = now
+            self._available -= amount
+            delay = -self._available / self.limit
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ConcurrencyController(object):
+    '''Adjust the number of transfers running at the same time.
+
+    Transfers run within :meth:`slot` and report the bytes they moved and
+    the errors they hit. At regular intervals, the limit is halved if
+    transfers were throttled, increased while the throughput improves and
+    decreased when it degrades.
+
+    '''
+
+    def __init__(self, name, initial, minimum=1, maximum=None):
+        '''Initialise controller *name* starting at *initial* transfers.
+
+        The limit stays between *minimum* and *maximum*, which default to
+        twice *initial*.
+
+        '''
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(
+            self.minimum, maximum or initial * MAXIMUM_FACTOR
+        )
+        self.limit = min(max(self.minimum, initial), self.maximum)
+
+        self._condition = threading.Condition()
+        self._running = 0
+        self._saturated = False
+        self._bytes = 0
+        self._errors = 0
+        self._previous = None
+        self._last = time.time()
+
+    @contextlib.contextmanager
+    def slot(self):
+        '''Wait until a transfer is allowed and hold its slot.'''
+        with self._condition:
+            while self._running >= self.limit:
+                self._saturated = True
+                self._condition.wait()
+
+            self._running += 1
+            if self._running >= self.limit:
+                self._saturated = True
+
+        try:
+            yield
+        except Exception as error:
+            if is_throttling_error(error):
+                self.record_error()
+            raise
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify()
+
+    def record(self, amount):
+        '''Record *amount* bytes transferred.'''
+        with self._condition:
+            self._bytes += amount
+            self._adjust()
+
+    def record_error(self):
+        '''Record a throttled transfer.'''
+        with self._condition:
+            self._errors += 1
+            self._adjust()
+
+    def _adjust(self):
+        '''Adjust limit if the interval elapsed, the lock being held.'''
+        now = time.time()
+        elapsed = now - self._last
+        if elapsed < ADJUST_INTERVAL:
+            return
+
+        throughput = self._bytes / elapsed
+        limit = self.limit
+
+        if self._errors:
+            limit = max(self.minimum, limit // 2)
+        elif self._previous is not None and (
+            throughput < self._previous * (1 - TOLERANCE)
+        ):
+            limit = max(self.minimum, limit - 1)
+        elif self._saturated and (
+            self._previous is None
+            or throughput > self._previous * (1 + TOLERANCE)
+        ):
+            # Only probe further when all slots are in use.
+            limit = min(self.maximum, limit + 1)
+
+        if limit != self.limit:
+            logger.debug(
+                'Adjusting {} concurrency from {} to {} '
+                '({:.0f} bytes/s, {} errors).'.format(
+                    self.name, self.limit, limit, throughput, self._errors
+                )
+            )
+            self.limit = limit
+            self._condition.notify_all()
+
+        self._previous = throughput
+        self._bytes = 0
+        self._errors = 0
+        self._saturated = self._running >= self.limit
+        self._last = now
+
+
+def get_controller(name, initial):
+    '''Return :class:`ConcurrencyController` *name* shared by the process.
+
+    A controller is shared by the transfers configured with the same
+    *initial* number of transfers, and created starting from it on first use,
+    so transfers configured differently keep their own bounds. Return None if
+    the concurrency is not adaptive.
+
+    '''
+    if not ADAPTIVE:
+        return None
+
+    key = (name, initial)
+    with _lock:
+        controller = _controllers.get(key)
+        if controller is None:
+            controller = ConcurrencyController(name, initial)
+            _controllers[key] = controller
+
+    return controller
+
+
+def get_limiter():
+    '''Return :class:`BandwidthLimiter` shared by the process.
+
+    Return None if the bandwidth is not limited.
+
+    '''
+    global _limiter
+
+    if not BANDWIDTH_LIMIT:
+        return None
+
+    with _lock:
+        if _limiter is None:
+            _limiter = BandwidthLimiter(BANDWIDTH_LIMIT)
+
+    return _limiter
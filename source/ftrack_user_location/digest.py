@@ -0,0 +1,108 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import hashlib
+import logging
+import sqlite3
+import functools
+import threading
+
+from ftrack_user_location import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_digest(file_object, chunk_size=CHUNK_SIZE):
+    '''Return md5 hex digest of *file_object* content from its current position.'''
+    digest = hashlib.md5()
+    for chunk in iter(functools.partial(file_object.read, chunk_size), b''):
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def get_file_digest(path):
+    '''Return md5 hex digest of file at *path*.'''
+    with open(path, 'rb') as file_object:
+        return get_digest(file_object)
+
+
+class DigestCache(object):
+    '''Persistent cache of file digests.
+
+    Entries are keyed on the path, size and modification time of the files,
+    so unchanged files are not hashed again.
+
+    '''
+
+    def __init__(self, path=None):
+        '''Initialise cache stored in the sqlite database at *path*.
+
+        *path* default to digests.db in the sync data directory.
+
+        '''
+        self.path = path or os.path.join(
+            configure_logging.get_data_directory(), 'digests.db'
+        )
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            self._connection.execute(
+                'create table if not exists digest ('
+                'path text primary key, size integer, mtime real, digest text)'
+            )
+
+    def find(self, path):
+        '''Return cached md5 hex digest of file at *path*, or None.'''
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            row = self._connection.execute(
+                'select digest from digest '
+                'where path = ? and size = ? and mtime = ?',
+                (path, stat.st_size, stat.st_mtime)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def get(self, path):
+        '''Return md5 hex digest of file at *path*, hashing it if needed.'''
+        digest = self.find(path)
+        if digest:
+            return digest
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = get_file_digest(path)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                'insert or replace into digest values (?, ?, ?, ?)',
+                (path, stat.st_size, stat.st_mtime, digest)
+            )
+
+        return digest
+
+
+def get_cache():
+    '''Return :class:`DigestCache` shared by the whole process.'''
+    global _cache
+
+    with _lock:
+        if _cache is None:
+            _cache = DigestCache()
+
+    return _cache
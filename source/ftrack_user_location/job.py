@@ -0,0 +1,186 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import json
+import time
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between two updates of the job on the server.
+JOB_UPDATE_INTERVAL = float(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_JOB_UPDATE_INTERVAL', 5
+))
+
+# Status of jobs killed by the user, which cancels the sync.
+KILLED = 'killed'
+
+
+def format_size(size):
+    '''Return human readable representation of *size* in bytes.'''
+    size = float(size)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024.0:
+            return '{0:.1f} {1}'.format(size, unit)
+        size /= 1024.0
+
+    return '{0:.1f} TB'.format(size)
+
+
+class JobReporter(object):
+    '''Report the progress of a sync on a ftrack Job.
+
+    Progress is accumulated in counters and written to the job at most once
+    every *interval* seconds, or when the job reaches a terminal state, to
+    avoid committing to the server for every single component.
+
+    The sync can be cancelled by killing the job, see :meth:`is_cancelled`.
+
+    '''
+
+    def __init__(self, session, user, description, interval=None):
+        '''Create a running job for *user* with *description*.
+
+        *interval* is the minimum number of seconds between two updates,
+        default to FTRACK_USER_SYNC_LOCATION_JOB_UPDATE_INTERVAL.
+
+        '''
+        self.session = session
+        self.description = description
+        self.interval = JOB_UPDATE_INTERVAL if interval is None else interval
+        self.message = None
+        self.cancelled = False
+        self.counters = {
+            'total': 0,
+            'done': 0,
+            'skipped': 0,
+            'failed': 0,
+            'bytes': 0
+        }
+
+        self.job = session.create('Job', {
+            'data': self._data(),
+            'user': user,
+            'status': 'running'
+        })
+        session.commit()
+
+        self._dirty = False
+        self._last_update = time.time()
+        self._last_check = time.time()
+
+    @property
+    def failed(self):
+        '''Return whether any component failed.'''
+        return bool(self.counters['failed'])
+
+    def _data(self):
+        '''Return job data as a json string.'''
+        if self.counters['total']:
+            description = '{}: {}/{} done, {} skipped, {} failed ({})'.format(
+                self.description,
+                self.counters['done'],
+                self.counters['total'],
+                self.counters['skipped'],
+                self.counters['failed'],
+                format_size(self.counters['bytes'])
+            )
+        else:
+            description = self.description
+
+        if self.message:
+            description = '{} - {}'.format(description, self.message)
+
+        data = {'description': description}
+        data.update(self.counters)
+        return json.dumps(data)
+
+    def set_total(self, total):
+        '''Set *total* number of components to process.'''
+        self.counters['total'] = total
+        self._dirty = True
+        self.flush()
+
+    def update(self, message=None, **counters):
+        '''Set latest *message* and increment *counters*.
+
+        Counters are given as keyword arguments, e.g. ``done=1, bytes=1024``.
+
+        '''
+        if message is not None:
+            self.message = message
+
+        for name, amount in counters.items():
+            self.counters[name] += amount
+
+        self._dirty = True
+        self.flush()
+
+    def add_result(self, result):
+        '''Account for transfer *result*.'''
+        counters = {result.status: 1}
+        if result.size:
+            counters['bytes'] = result.size
+
+        self.update(result.message, **counters)
+
+    def flush(self, force=False):
+        '''Write pending progress to the server if the interval elapsed.
+
+        Always write if *force* is True.
+
+        '''
+        if not self._dirty:
+            return
+
+        if not force and time.time() - self._last_update < self.interval:
+            return
+
+        self.job['data'] = self._data()
+        self.session.commit()
+
+        self._dirty = False
+        self._last_update = time.time()
+
+    def is_cancelled(self):
+        '''Return whether the job was killed.
+
+        The job status is checked on the server at most once every interval.
+
+        '''
+        if self.cancelled or time.time() - self._last_check < self.interval:
+            return self.cancelled
+
+        self._last_check = time.time()
+        status = self.session.query(
+            'select status from Job where id is "{}"'.format(self.job['id'])
+        ).one()['status']
+        if status == KILLED:
+            logger.info('{} cancelled.'.format(self.description))
+            self.cancelled = True
+
+        return self.cancelled
+
+    def finish(self, message=None):
+        '''Mark the job as done, or failed if any component failed.
+
+        Killed jobs are left as they are.
+
+        '''
+        self.message = message
+        if self.cancelled:
+            self.message = message or 'Cancelled'
+        else:
+            self.job['status'] = 'failed' if self.failed else 'done'
+        self._dirty = True
+        self.flush(force=True)
+
+    def fail(self, message):
+        '''Mark the job as failed with *message*.'''
+        logger.error(message)
+        self.message = message
+        self.job['status'] = 'failed'
+        self._dirty = True
+        self.flush(force=True)
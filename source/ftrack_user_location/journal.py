@@ -0,0 +1,187 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import logging
+import sqlite3
+import threading
+
+from ftrack_user_location import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+# Whether transfers are journaled so they can be resumed.
+RESUMABLE = os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_RESUMABLE', 'true'
+).lower() in ('1', 'true', 'yes')
+
+# File states.
+STARTED = 'started'
+DONE = 'done'
+
+_lock = threading.Lock()
+_journal = None
+
+
+class Journal(object):
+    '''Persistent journal of the transfers in progress.
+
+    It records the state of the files being copied to a location, as well as
+    the multipart uploads and the parts of each file already transferred, so
+    an interrupted sync can carry on where it stopped.
+
+    '''
+
+    def __init__(self, path=None):
+        '''Initialise journal stored in the sqlite database at *path*.
+
+        *path* default to journal.db in the sync data directory.
+
+        '''
+        self.path = path or os.path.join(
+            configure_logging.get_data_directory(), 'journal.db'
+        )
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            self._connection.executescript(
+                'create table if not exists file ('
+                '    location_id text, resource_identifier text, state text,'
+                '    updated real,'
+                '    primary key (location_id, resource_identifier));'
+                'create table if not exists upload ('
+                '    bucket text, key text, path text, size integer,'
+                '    mtime real, part_size integer, upload_id text,'
+                '    primary key (bucket, key));'
+                'create table if not exists part ('
+                '    transfer_id text, part_number integer, etag text,'
+                '    primary key (transfer_id, part_number));'
+            )
+
+    def _execute(self, statement, parameters=()):
+        '''Execute *statement* with *parameters* and return all rows.'''
+        with self._lock, self._connection:
+            return self._connection.execute(statement, parameters).fetchall()
+
+    def get_file_state(self, location_id, resource_identifier):
+        '''Return state of *resource_identifier* transfer to *location_id*.'''
+        rows = self._execute(
+            'select state from file '
+            'where location_id = ? and resource_identifier = ?',
+            (location_id, resource_identifier)
+        )
+        return rows[0][0] if rows else None
+
+    def set_file_state(self, location_id, resource_identifier, state):
+        '''Set *state* of *resource_identifier* transfer to *location_id*.'''
+        self._execute(
+            'insert or replace into file values (?, ?, ?, ?)',
+            (location_id, resource_identifier, state, time.time())
+        )
+
+    def clear_files(self, location_id, resource_identifiers):
+        '''Forget about *resource_identifiers* transfers to *location_id*.
+
+        Called once the component they belong to is finished, whether it was
+        registered in *location_id* or failed.
+
+        '''
+        for resource_identifier in resource_identifiers:
+            self._execute(
+                'delete from file '
+                'where location_id = ? and resource_identifier = ?',
+                (location_id, resource_identifier)
+            )
+
+    def get_upload(self, bucket, key, path, size, mtime):
+        '''Return (upload_id, part_size) of upload of *path* to *key*.
+
+        Return None if there is no upload in progress for the same file.
+
+        '''
+        rows = self._execute(
+            'select upload_id, part_size from upload where bucket = ? and '
+            'key = ? and path = ? and size = ? and mtime = ?',
+            (bucket, key, path, size, mtime)
+        )
+        return tuple(rows[0]) if rows else None
+
+    def find_upload(self, bucket, key):
+        '''Return id of the upload in progress to *key* in *bucket*, or None.
+
+        Unlike :meth:`get_upload`, the upload may be of any file.
+
+        '''
+        rows = self._execute(
+            'select upload_id from upload where bucket = ? and key = ?',
+            (bucket, key)
+        )
+        return rows[0][0] if rows else None
+
+    def set_upload(self, bucket, key, path, size, mtime, part_size, upload_id):
+        '''Record *upload_id* of *path* to *key* in *bucket*.'''
+        self._execute(
+            'insert or replace into upload values (?, ?, ?, ?, ?, ?, ?)',
+            (bucket, key, path, size, mtime, part_size, upload_id)
+        )
+
+    def clear_upload(self, bucket, key):
+        '''Forget about the upload to *key* in *bucket* and its parts.'''
+        for (upload_id,) in self._execute(
+            'select upload_id from upload where bucket = ? and key = ?',
+            (bucket, key)
+        ):
+            self.clear_parts(upload_id)
+
+        self._execute(
+            'delete from upload where bucket = ? and key = ?', (bucket, key)
+        )
+
+    def get_parts(self, transfer_id):
+        '''Return {part_number: etag} of parts of *transfer_id* done.'''
+        return dict(self._execute(
+            'select part_number, etag from part where transfer_id = ?',
+            (transfer_id,)
+        ))
+
+    def add_part(self, transfer_id, part_number, etag=None):
+        '''Record *part_number* of *transfer_id* as done.'''
+        self._execute(
+            'insert or replace into part values (?, ?, ?)',
+            (transfer_id, part_number, etag)
+        )
+
+    def clear_parts(self, transfer_id):
+        '''Forget about the parts of *transfer_id*.'''
+        self._execute(
+            'delete from part where transfer_id = ?', (transfer_id,)
+        )
+
+    def clear_transfers(self, prefix):
+        '''Forget about the parts of the transfers whose id starts with *prefix*.'''
+        self._execute(
+            'delete from part where substr(transfer_id, 1, ?) = ?',
+            (len(prefix), prefix)
+        )
+
+
+def get_journal():
+    '''Return :class:`Journal` shared by the whole process.
+
+    Return None if transfers are not resumable.
+
+    '''
+    global _journal
+
+    if not RESUMABLE:
+        return None
+
+    with _lock:
+        if _journal is None:
+            _journal = Journal()
+
+    return _journal
@@ -0,0 +1,53 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import copy
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class LazyAccessor(object):
+    '''Accessor created on first use.
+
+    Attributes are looked up on the accessor returned by *factory*, which is
+    only called when the location data is accessed for the first time, so
+    sessions which never do so do not pay for it.
+
+    '''
+
+    def __init__(self, factory):
+        '''Initialise accessor created by calling *factory*.'''
+        self._factory = factory
+        self._accessor = None
+        self._lock = threading.Lock()
+
+    def get_accessor(self):
+        '''Return accessor, creating it if needed.'''
+        with self._lock:
+            if self._accessor is None:
+                self._accessor = self._factory()
+
+        return self._accessor
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in (
+            '_factory', '_accessor', '_lock'
+        ):
+            raise AttributeError(name)
+
+        return getattr(self.get_accessor(), name)
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __deepcopy__(self, memo):
+        '''Return copy of the accessor, or a new lazy one if not created.'''
+        if self._accessor is None:
+            return self.__class__(self._factory)
+
+        return copy.deepcopy(self._accessor, memo)
@@ -0,0 +1,111 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import json
+import time
+import logging
+import threading
+
+from ftrack_user_location import configure_logging
+
+
+logger = logging.getLogger(__name__)
+
+# Number of seconds a cached location id is used for before being checked
+# against the server again.
+LOCATION_ID_TTL = 24 * 3600
+
+_lock = threading.Lock()
+
+
+def _get_location_cache_path():
+    '''Return path of the file caching the location ids.'''
+    return os.path.join(
+        configure_logging.get_data_directory(), 'locations.json'
+    )
+
+
+def _read_location_cache():
+    '''Return cached location ids, by server url and location name.'''
+    try:
+        with open(_get_location_cache_path()) as file_object:
+            return json.load(file_object)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _write_location_cache(cache):
+    '''Write location ids *cache*, while holding the module lock.'''
+    path = _get_location_cache_path()
+    temporary_path = '{}.{}'.format(path, os.getpid())
+    try:
+        with open(temporary_path, 'w') as file_object:
+            json.dump(cache, file_object)
+        os.replace(temporary_path, path)
+    except (IOError, OSError) as error:
+        logger.warning('Could not cache location ids: {}'.format(error))
+
+
+def get_location_id(server_url, name):
+    '''Return cached id of location *name* on *server_url*, or None.
+
+    None is returned as well once the id was cached for more than
+    :data:`LOCATION_ID_TTL` seconds, so it is checked again.
+
+    '''
+    entry = _read_location_cache().get('{}|{}'.format(server_url, name))
+    if not isinstance(entry, dict):
+        return None
+
+    if time.time() - entry.get('validated', 0) > LOCATION_ID_TTL:
+        return None
+
+    return entry.get('id')
+
+
+def set_location_id(server_url, name, location_id):
+    '''Cache *location_id* of location *name* on *server_url*.'''
+    with _lock:
+        cache = _read_location_cache()
+        cache['{}|{}'.format(server_url, name)] = {
+            'id': location_id, 'validated': time.time()
+        }
+        _write_location_cache(cache)
+
+
+def check_location_ids(server_url, location_ids):
+    '''Update cached ids of the locations on *server_url*.
+
+    *location_ids* maps the names of all the locations on the server to
+    their ids. Cached locations deleted since are forgotten, and the ids of
+    the ones recreated since are updated. The cache is only written if any
+    of them changed.
+
+    '''
+    prefix = '{}|'.format(server_url)
+    with _lock:
+        cache = _read_location_cache()
+        changed = False
+        for key, entry in list(cache.items()):
+            if not key.startswith(prefix):
+                continue
+
+            name = key[len(prefix):]
+            location_id = location_ids.get(name)
+            cached_id = entry.get('id') if isinstance(entry, dict) else None
+            if location_id is not None and location_id == cached_id:
+                continue
+
+            logger.warning(
+                'Cached location {} changed on the server, new sessions will '
+                'use the current one.'.format(name)
+            )
+            if location_id is None:
+                del cache[key]
+            else:
+                cache[key] = {'id': location_id, 'validated': time.time()}
+            changed = True
+
+        if changed:
+            _write_location_cache(cache)
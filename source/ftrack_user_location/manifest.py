@@ -0,0 +1,108 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import gzip
+import json
+import uuid
+import logging
+
+import ftrack_api
+
+
+logger = logging.getLogger(__name__)
+
+# Number of components from which the components of a sync are listed in a
+# manifest stored in the sync location, rather than in the ftrack.sync event
+# itself. Manifests are disabled when 0.
+MANIFEST_THRESHOLD = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MANIFEST_THRESHOLD', 0
+))
+
+# Prefix of the manifests in the sync location.
+MANIFEST_PREFIX = '.manifests/'
+
+# Number of components read from a manifest at once.
+CHUNK_SIZE = 500
+
+
+def use_manifest(count):
+    '''Return whether *count* components should be listed in a manifest.'''
+    return bool(MANIFEST_THRESHOLD) and count >= MANIFEST_THRESHOLD
+
+
+def write(location, components):
+    '''Write manifest of *components* to *location* and return its identifier.
+
+    *components* is a list of dictionaries with the id, name, size and digest
+    of each component. They are stored as compressed json lines, so the
+    manifest can be read back in chunks.
+
+    '''
+    accessor = location.accessor
+    resource_identifier = '{}{}.jsonl.gz'.format(
+        MANIFEST_PREFIX, uuid.uuid4().hex
+    )
+
+    try:
+        container = accessor.get_container(resource_identifier)
+    except ftrack_api.exception.AccessorParentResourceNotFoundError:
+        pass
+    else:
+        try:
+            accessor.make_container(container)
+        except ftrack_api.exception.AccessorContainerExistsError:
+            pass
+
+    data = accessor.open(resource_identifier, 'wb')
+    try:
+        with gzip.GzipFile(fileobj=data, mode='wb') as file_object:
+            for component in components:
+                file_object.write(
+                    json.dumps(component, separators=(',', ':')).encode(
+                        'utf-8'
+                    ) + b'\n'
+                )
+    finally:
+        data.close()
+
+    logger.debug(
+        'Wrote manifest {} of {} components to {}.'.format(
+            resource_identifier, len(components), location['name']
+        )
+    )
+    return resource_identifier
+
+
+def read(location, resource_identifier, chunk_size=CHUNK_SIZE):
+    '''Yield lists of at most *chunk_size* components from a manifest.
+
+    The manifest is read from *resource_identifier* in *location*.
+
+    '''
+    data = location.accessor.open(resource_identifier, 'rb')
+    try:
+        with gzip.GzipFile(fileobj=data, mode='rb') as file_object:
+            chunk = []
+            for line in file_object:
+                chunk.append(json.loads(line.decode('utf-8')))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+
+            if chunk:
+                yield chunk
+    finally:
+        data.close()
+
+
+def remove(location, resource_identifier):
+    '''Remove manifest *resource_identifier* from *location*.'''
+    try:
+        location.accessor.remove(resource_identifier)
+    except Exception as error:
+        logger.warning(
+            'Could not remove manifest {}: {}'.format(
+                resource_identifier, error
+            )
+        )
@@ -0,0 +1,138 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import logging
+
+from ftrack_user_location.job import format_size
+
+
+logger = logging.getLogger(__name__)
+
+# Actions planned for a component.
+TRANSFER = 'transfer'
+TOP_UP = 'top-up'
+SKIP = 'skip'
+UNAVAILABLE = 'unavailable'
+
+# Number of component names listed for each action in the summary.
+MAX_LISTED = 10
+
+# Number of components planned at most when previewing a sync, as the
+# preview is worked out while the sync tool responds to the user.
+PREVIEW_MAX_COMPONENTS = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_PREVIEW_MAX_COMPONENTS', 500
+))
+
+
+def format_duration(seconds):
+    '''Return human readable representation of *seconds*.'''
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return '{}s'.format(seconds)
+
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return '{}m {:02d}s'.format(minutes, seconds)
+
+    hours, minutes = divmod(minutes, 60)
+    return '{}h {:02d}m'.format(hours, minutes)
+
+
+def get_label(component):
+    '''Return label of *component* including its asset and version.'''
+    version = component.get('version')
+    if not version:
+        return component['name']
+
+    return '{} v{:03d} {}'.format(
+        version['asset']['name'], version['version'], component['name']
+    )
+
+
+class SyncPlan(object):
+    '''What a sync is going to do, worked out without moving any data.'''
+
+    def __init__(self, source_name, target_name, throughput=None):
+        '''Initialise plan of a sync from *source_name* to *target_name*.
+
+        *throughput* is the number of bytes per second recently achieved,
+        used to estimate the duration of the sync.
+
+        '''
+        self.source_name = source_name
+        self.target_name = target_name
+        self.throughput = throughput
+        self.error = None
+        # List of (component, action, size, message).
+        self.entries = []
+
+    def add(self, component, action, size=0, message=None):
+        '''Plan *action* for *component*, moving *size* bytes.'''
+        self.entries.append((component, action, size or 0, message))
+
+    def get_components(self, *actions):
+        '''Return components planned for any of *actions*.'''
+        return [
+            component for component, action, _, _ in self.entries
+            if action in actions
+        ]
+
+    @property
+    def pending(self):
+        '''Return components to transfer, fully or partially.'''
+        return self.get_components(TRANSFER, TOP_UP)
+
+    @property
+    def size(self):
+        '''Return number of bytes to transfer.'''
+        return sum(
+            size for _, action, size, _ in self.entries
+            if action in (TRANSFER, TOP_UP)
+        )
+
+    @property
+    def eta(self):
+        '''Return estimated number of seconds to transfer, or None.'''
+        if not self.throughput:
+            return None
+
+        return self.size / float(self.throughput)
+
+    def format(self):
+        '''Return summary of the plan as markdown.'''
+        if self.error:
+            return '**{}**'.format(self.error)
+
+        if self.eta is None:
+            eta = 'unknown duration'
+        else:
+            eta = 'about {}'.format(format_duration(self.eta))
+
+        lines = [
+            '**{} to {}**: {} ({}).'.format(
+                self.source_name, self.target_name,
+                format_size(self.size), eta
+            )
+        ]
+
+        for action, label in (
+            (TRANSFER, 'To transfer'),
+            (TOP_UP, 'To top up'),
+            (SKIP, 'Skipped'),
+            (UNAVAILABLE, 'Unavailable')
+        ):
+            names = [
+                get_label(component)
+                for component in self.get_components(action)
+            ]
+            if not names:
+                continue
+
+            listed = ', '.join(names[:MAX_LISTED])
+            if len(names) > MAX_LISTED:
+                listed += ' and {} more'.format(len(names) - MAX_LISTED)
+
+            lines.append('{} ({}): {}'.format(label, len(names), listed))
+
+        return '<br/>'.join(lines)
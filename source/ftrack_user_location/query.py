@@ -0,0 +1,247 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import logging
+
+import ftrack_api
+import ftrack_api.symbol
+
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of ids put in a single `in (...)` query expression.
+QUERY_CHUNK_SIZE = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_QUERY_CHUNK_SIZE', 100
+))
+
+
+def chunked(items, size=None):
+    '''Yield successive lists of at most *size* elements from *items*.'''
+    items = list(items)
+    size = max(1, int(size or QUERY_CHUNK_SIZE))
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+# Attributes used by the sync and by the location structure to resolve the
+# resource identifiers of components and of their members.
+COMPONENT_PROJECTIONS = (
+    'name', 'file_type', 'size', 'container', 'version_id',
+    'version.version', 'version.link', 'version.asset.name'
+)
+
+CONTAINER_PROJECTIONS = (
+    'members', 'members.name', 'members.file_type', 'members.size',
+    'members.container'
+)
+
+SEQUENCE_PROJECTIONS = (
+    'padding',
+)
+
+
+def get_components(session, component_ids):
+    '''Return components matching *component_ids*, ready to be synced.
+
+    Components, their members and the attributes needed to sync them are
+    loaded with a fixed number of queries per chunk of ids, so accessing them
+    afterwards does not trigger any further lazy loading.
+
+    Ids which do not match any component are ignored.
+
+    '''
+    component_ids = list(component_ids)
+    components = {}
+    containers = []
+    sequences = []
+
+    for chunk in chunked(component_ids):
+        for component in session.query(
+            'select {0} from Component where id in ({1})'.format(
+                ', '.join(COMPONENT_PROJECTIONS), ', '.join(chunk)
+            )
+        ):
+            components[component['id']] = component
+            if component.entity_type == 'SequenceComponent':
+                sequences.append(component['id'])
+            if is_container(component):
+                containers.append(component['id'])
+
+    for chunk in chunked(containers):
+        session.query(
+            'select {0} from ContainerComponent where id in ({1})'.format(
+                ', '.join(CONTAINER_PROJECTIONS), ', '.join(chunk)
+            )
+        ).all()
+
+    for chunk in chunked(sequences):
+        session.query(
+            'select {0} from SequenceComponent where id in ({1})'.format(
+                ', '.join(SEQUENCE_PROJECTIONS), ', '.join(chunk)
+            )
+        ).all()
+
+    # Projects are looked up by id from the version link by the structure.
+    project_ids = set()
+    for component in components.values():
+        version = component['version']
+        if version and version['link']:
+            project_ids.add(version['link'][0]['id'])
+
+    for chunk in chunked(project_ids):
+        session.query(
+            'select name from Project where id in ({0})'.format(
+                ', '.join(chunk)
+            )
+        ).all()
+
+    missing = [
+        component_id for component_id in component_ids
+        if component_id not in components
+    ]
+    if missing:
+        logger.warning(
+            'Could not find components with ids : {}'.format(
+                ', '.join(missing)
+            )
+        )
+
+    return [
+        components[component_id] for component_id in component_ids
+        if component_id in components
+    ]
+
+
+def get_version_components(session, version_ids):
+    '''Return flat list of the components of versions matching *version_ids*.
+
+    Components are returned in the order of *version_ids*, loaded as
+    described in :func:`get_components`.
+
+    '''
+    version_ids = list(version_ids)
+    version_components = {}
+
+    for chunk in chunked(version_ids):
+        for version in session.query(
+            'select id, components.id from AssetVersion where id in ({0})'.format(
+                ', '.join(chunk)
+            )
+        ):
+            version_components[version['id']] = [
+                component['id'] for component in version['components']
+            ]
+
+    component_ids = []
+    for version_id in version_ids:
+        component_ids.extend(version_components.get(version_id, []))
+
+    return get_components(session, component_ids)
+
+
+def is_container(component):
+    '''Return whether *component* is a container component.'''
+    return 'members' in list(component.keys())
+
+
+def get_availabilities(
+    session, components, locations, resource_identifiers=None
+):
+    '''Return availability map of *components* in *locations*.
+
+    The result is a dictionary of
+    {component_id: {location_id: percentage_availability}}, including an
+    entry for every member of the container components. Availability of a
+    container is the average availability of its members.
+
+    Members and component locations are resolved with a fixed number of
+    queries per chunk of components, regardless of the size of the
+    containers.
+
+    If *resource_identifiers* is a dictionary, it is filled with the resource
+    identifiers of the components and members found, keyed by
+    (component_id, location_id), so transferring them does not query them
+    again.
+
+    '''
+    location_ids = [location['id'] for location in locations]
+
+    containers = []
+    with session.auto_populating(False):
+        for component in components:
+            if (
+                is_container(component) and
+                component['members'] is ftrack_api.symbol.NOT_SET
+            ):
+                containers.append(component)
+
+    for chunk in chunked(containers):
+        session.populate(chunk, 'members')
+
+    component_ids = set()
+    for component in components:
+        component_ids.add(component['id'])
+        if is_container(component):
+            component_ids.update(
+                member['id'] for member in component['members']
+            )
+
+    present = set()
+    if component_ids and location_ids:
+        for chunk in chunked(component_ids):
+            component_locations = session.query(
+                'select component_id, location_id, resource_identifier '
+                'from ComponentLocation '
+                'where component_id in ({0}) and location_id in ({1})'.format(
+                    ', '.join(chunk), ', '.join(location_ids)
+                )
+            )
+            for component_location in component_locations:
+                key = (
+                    component_location['component_id'],
+                    component_location['location_id']
+                )
+                present.add(key)
+                if resource_identifiers is not None:
+                    resource_identifiers[key] = (
+                        component_location['resource_identifier']
+                    )
+
+    def _availability(component_id):
+        return dict(
+            (
+                location_id,
+                100.0 if (component_id, location_id) in present else 0.0
+            )
+            for location_id in location_ids
+        )
+
+    availabilities = {}
+    for component in components:
+        members = component['members'] if is_container(component) else []
+        if not members:
+            availabilities[component['id']] = _availability(component['id'])
+            continue
+
+        availability = dict((location_id, 0.0) for location_id in location_ids)
+        multiplier = 1.0 / len(members)
+        for member in members:
+            member_availability = _availability(member['id'])
+            availabilities[member['id']] = member_availability
+            for location_id, percentage in member_availability.items():
+                availability[location_id] += percentage * multiplier
+
+        # Same rounding and clamping as Session.get_component_availabilities.
+        for location_id, percentage in availability.items():
+            availability[location_id] = max(0.0, min(round(percentage, 9), 100.0))
+
+        availabilities[component['id']] = availability
+
+    logger.debug(
+        'Resolved availability of {} components in {} locations.'.format(
+            len(component_ids), len(location_ids)
+        )
+    )
+
+    return availabilities
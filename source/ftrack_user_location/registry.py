@@ -0,0 +1,198 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import logging
+import weakref
+import threading
+
+from ftrack_user_location import location_ids
+
+
+logger = logging.getLogger(__name__)
+
+# Number of seconds locations are cached for.
+LOCATION_CACHE_TTL = float(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_LOCATION_CACHE_TTL', 300
+))
+
+_lock = threading.Lock()
+_registries = weakref.WeakKeyDictionary()
+
+
+def is_accessible(location):
+    '''Return whether the data of *location* can be accessed from here.'''
+    accessor = location.accessor
+    if not accessor:
+        return False
+
+    try:
+        return bool(accessor.exists(''))
+    except Exception as error:
+        logger.debug(
+            'Location {} is not accessible: {}'.format(location['name'], error)
+        )
+        return False
+
+
+class LocationRegistry(object):
+    '''Locations of a session, cached by name and id.
+
+    Locations are queried at once and kept for *ttl* seconds, or until
+    :meth:`invalidate` is called, for example when a location is created or
+    updated on the server. The generation of the registry changes each time
+    the locations are queried, so anything derived from them can be cached
+    until then.
+
+    '''
+
+    def __init__(self, session, ttl=None):
+        '''Initialise registry of the locations of *session*.
+
+        *ttl* default to FTRACK_USER_SYNC_LOCATION_LOCATION_CACHE_TTL.
+
+        The registry only keeps a weak reference to *session*, so it is
+        forgotten along with the session.
+
+        '''
+        self._session = weakref.ref(session)
+        self.ttl = LOCATION_CACHE_TTL if ttl is None else ttl
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_name = {}
+        self._accessible = {}
+        self._expires = 0
+        self._generation = 0
+        # Location ids by name the location id cache was last checked with.
+        self._location_ids = None
+
+    @property
+    def session(self):
+        '''Return session of the locations.'''
+        session = self._session()
+        if session is None:
+            raise ReferenceError('Session of the registry was destroyed.')
+
+        return session
+
+    def invalidate(self):
+        '''Forget about the cached locations.'''
+        with self._lock:
+            self._expires = 0
+            self._accessible.clear()
+
+    def refresh(self):
+        '''Query the locations again.'''
+        with self._lock:
+            locations = self.session.query('select name from Location').all()
+            self._by_id = dict(
+                (location['id'], location) for location in locations
+            )
+            self._by_name = dict(
+                (location['name'], location) for location in locations
+            )
+            self._accessible.clear()
+            self._expires = time.time() + self.ttl
+            self._generation += 1
+
+            ids = dict(
+                (location['name'], location['id']) for location in locations
+            )
+            changed = ids != self._location_ids
+            self._location_ids = ids
+
+        if changed:
+            # locations cached by the location plugins may have changed since.
+            location_ids.check_location_ids(self.session.server_url, ids)
+
+        logger.debug('Cached {} locations.'.format(len(locations)))
+
+    def _ensure(self):
+        '''Refresh locations if they expired.'''
+        with self._lock:
+            if time.time() >= self._expires:
+                self.refresh()
+
+    def get_generation(self):
+        '''Return generation of the cached locations.'''
+        self._ensure()
+        return self._generation
+
+    def get_locations(self):
+        '''Return all the locations, sorted by name.'''
+        self._ensure()
+        with self._lock:
+            return [
+                self._by_name[name] for name in sorted(self._by_name)
+            ]
+
+    def get_by_name(self, name):
+        '''Return location named *name*, or None.
+
+        Locations are queried again if no location matches, in case it was
+        just created.
+
+        '''
+        self._ensure()
+        with self._lock:
+            if name not in self._by_name:
+                self.refresh()
+
+            return self._by_name.get(name)
+
+    def get_by_id(self, location_id):
+        '''Return location with *location_id*, or None.'''
+        self._ensure()
+        with self._lock:
+            if location_id not in self._by_id:
+                self.refresh()
+
+            return self._by_id.get(location_id)
+
+    def exists(self, name):
+        '''Return whether a location named *name* exists.'''
+        return self.get_by_name(name) is not None
+
+    def is_accessible(self, location):
+        '''Return whether the data of *location* can be accessed from here.
+
+        The result of :func:`is_accessible` is cached along with the
+        locations.
+
+        '''
+        self._ensure()
+        with self._lock:
+            accessible = self._accessible.get(location['id'])
+
+        if accessible is None:
+            accessible = is_accessible(location)
+            with self._lock:
+                self._accessible[location['id']] = accessible
+
+        return accessible
+
+    def subscribe(self):
+        '''Invalidate the registry when locations change on the server.'''
+        self.session.event_hub.subscribe(
+            'topic=ftrack.update', self._on_update
+        )
+
+    def _on_update(self, event):
+        '''Invalidate the registry if *event* is about a location.'''
+        for entity in event['data'].get('entities', []):
+            if entity.get('entityType') == 'location':
+                logger.debug('Locations changed, invalidating cache.')
+                self.invalidate()
+                return
+
+
+def get_registry(session):
+    '''Return :class:`LocationRegistry` of *session*.'''
+    with _lock:
+        registry = _registries.get(session)
+        if registry is None:
+            registry = LocationRegistry(session)
+            _registries[session] = registry
+
+    return registry
@@ -0,0 +1,63 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import random
+import logging
+
+from ftrack_user_location.controller import is_throttling_error
+
+
+logger = logging.getLogger(__name__)
+
+# Number of times a file or part transfer is retried after a throttling or
+# network error.
+RETRIES = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_RETRIES', 5
+))
+
+# Base and maximum number of seconds to wait before retrying.
+RETRY_DELAY = float(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_RETRY_DELAY', 1
+))
+
+MAX_RETRY_DELAY = 60
+
+
+def get_delay(attempt, delay=None):
+    '''Return number of seconds to wait before retry *attempt*.
+
+    The delay grows exponentially from *delay* with each attempt, default
+    to FTRACK_USER_SYNC_LOCATION_RETRY_DELAY, with a random jitter so
+    transfers throttled at the same time do not retry at the same time.
+
+    '''
+    delay = RETRY_DELAY if delay is None else delay
+    return random.uniform(0, min(MAX_RETRY_DELAY, delay * 2 ** attempt))
+
+
+def call(function, *args, **kwargs):
+    '''Return result of *function* called with *args* and *kwargs*.
+
+    The call is retried up to FTRACK_USER_SYNC_LOCATION_RETRIES times when
+    it fails with a throttling or network error, waiting in the calling
+    thread only. Other errors are raised straight away.
+
+    '''
+    attempt = 0
+    while True:
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            if attempt >= RETRIES or not is_throttling_error(error):
+                raise
+
+            delay = get_delay(attempt)
+            logger.warning(
+                'Transfer attempt {} failed: {}, retrying in {:.1f}s.'.format(
+                    attempt + 1, error, delay
+                )
+            )
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,141 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import heapq
+import logging
+import itertools
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# Number of syncs of a single user running at the same time, no limit other
+# than the number of syncs when 0.
+MAX_USER_SYNCS = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MAX_USER_SYNCS', 0
+))
+
+
+class QueueFullError(Exception):
+    '''Raise when too many syncs are waiting to run.'''
+
+
+class FairScheduler(object):
+    '''Order queued syncs fairly between users.
+
+    The next sync goes to the user with the fewest syncs running, the one
+    served the least recently in case of a tie, so a user queuing many syncs
+    does not hold back the others. The syncs of a user are run smallest
+    first, so short ones are not stuck behind big deliveries.
+
+    '''
+
+    def __init__(self, max_queued, max_user_running=None):
+        '''Initialise scheduler holding up to *max_queued* syncs.
+
+        *max_user_running* is the number of syncs of a single user running at
+        the same time, default to FTRACK_USER_SYNC_LOCATION_MAX_USER_SYNCS.
+
+        '''
+        self.max_queued = max_queued
+        self.max_user_running = int(
+            MAX_USER_SYNCS if max_user_running is None else max_user_running
+        )
+
+        self._condition = threading.Condition()
+        self._counter = itertools.count()
+        # Heaps of (size, order, item) by user.
+        self._pending = {}
+        self._running = {}
+        # Order in which each user was last served.
+        self._served = {}
+        self._queued = 0
+
+    def put(self, item, user_id=None, size=None):
+        '''Queue *item* for *user_id* with an estimated *size* in bytes.
+
+        Items of unknown size are run after the others of the same user.
+
+        Raise :exc:`QueueFullError` if too many items are already waiting.
+
+        '''
+        with self._condition:
+            if self._queued >= self.max_queued:
+                raise QueueFullError(
+                    'Too many syncs queued ({}), please try again later.'.format(
+                        self.max_queued
+                    )
+                )
+
+            heapq.heappush(
+                self._pending.setdefault(user_id, []),
+                (
+                    float('inf') if size is None else size,
+                    next(self._counter), item
+                )
+            )
+            self._queued += 1
+            self._condition.notify()
+
+    def _select(self):
+        '''Return user whose next item should run, or None.'''
+        selected = None
+        selected_key = None
+
+        for user_id, pending in self._pending.items():
+            if not pending:
+                continue
+
+            running = self._running.get(user_id, 0)
+            if self.max_user_running and running >= self.max_user_running:
+                continue
+
+            # Fewest running first, then least recently served, then oldest
+            # item waiting.
+            key = (
+                running, self._served.get(user_id, -1),
+                min(order for _, order, _ in pending)
+            )
+            if selected_key is None or key < selected_key:
+                selected = user_id
+                selected_key = key
+
+        return selected
+
+    def get(self):
+        '''Return (user_id, item) to run next, waiting until one is allowed.
+
+        :meth:`done` must be called with the user id once the item is run.
+
+        '''
+        with self._condition:
+            while True:
+                user_id = self._select()
+                if user_id is not None:
+                    break
+                self._condition.wait()
+
+            size, _, item = heapq.heappop(self._pending[user_id])
+            if not self._pending[user_id]:
+                del self._pending[user_id]
+
+            self._queued -= 1
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            self._served[user_id] = next(self._counter)
+
+        logger.debug(
+            'Running sync of user {} ({} bytes), {} syncs queued.'.format(
+                user_id, size, self._queued
+            )
+        )
+        return user_id, item
+
+    def done(self, user_id):
+        '''Record end of an item of *user_id*.'''
+        with self._condition:
+            self._running[user_id] -= 1
+            if not self._running[user_id]:
+                del self._running[user_id]
+
+            self._condition.notify_all()
@@ -3,104 +3,114 @@
 
 import ftrack_api
 import logging
-import json
+
+from ftrack_user_location import (
+    job, manifest, plan, query, registry, transfer
+)
 
 
 logger = logging.getLogger(__name__)
 
 
-def on_sync_to_destination(session, source_id, destination_id, components, user_id):
-    ''' Callback for when files are copied from the cloud location into the
-    destination one.
+def get_route(source_location, destination_location, sync_location):
+    '''Return location components should be copied to from *source_location*.
 
-        *source_id* : The id if the source location.
-        *destination_id* : The id if the source location.
-        *components* : a list of ids of all the component to be copied over.
-        *userId* : the id of the user who requested the sync.
+    Return *destination_location* when it is directly accessible from this
+    process, for example a studio storage mounted over VPN, otherwise the
+    *sync_location* to stage the data through. Whether the destination is
+    accessible is cached in the location registry.
 
     '''
-    components = [session.get('Component', cid['id']) for cid in components]
+    if destination_location['id'] in (
+        source_location['id'], sync_location['id']
+    ):
+        return sync_location
 
-    # get location objects
-    source_location = session.get('Location', source_id)
-    destination_location = session.get('Location', destination_id)
+    if registry.get_registry(destination_location.session).is_accessible(
+        destination_location
+    ):
+        return destination_location
 
-    # get location accessors
-    source_accessor = source_location.accessor
-    destination_accessor = destination_location.accessor
+    return sync_location
 
-    # get the location names
-    source_name = source_location['name']
-    destination_name = destination_location['name']
 
-    logger.info(
-        "Syncing from {} to {}".format(
-            source_name,
-            destination_name,
+def get_missing_size(component, availabilities, location_id):
+    '''Return number of bytes of *component* missing in *location_id*.
+
+    *availabilities* is the availability map returned by
+    :func:`~ftrack_user_location.query.get_availabilities`, so only the
+    members of containers missing in the location are accounted for.
+
+    '''
+    if query.is_container(component) and component['members']:
+        return sum(
+            member['size'] or 0 for member in component['members']
+            if availabilities[member['id']][location_id] < 100.0
         )
+
+    return component['size'] or 0
+
+
+def plan_component(sync_plan, component, availabilities, location_id):
+    '''Plan transfer of *component* to *location_id* in *sync_plan*.'''
+    if availabilities[component['id']][location_id] > 0.0:
+        action = plan.TOP_UP
+    else:
+        action = plan.TRANSFER
+
+    sync_plan.add(
+        component, action,
+        get_missing_size(component, availabilities, location_id)
     )
 
-    # start the job
-    job = session.create('Job', {
-        'description': "Sync from {} to {} ".format(
-            source_name,
-            destination_name
-        ),
-        'user': session.get('User', user_id),
-        'status': 'running'
-    })
-    session.commit()
 
-    # sanity checks for the transfer
-    if not all([source_accessor, destination_accessor]):
-        message = 'Locations are not accessible : {}, {}'.format(
-            destination_name,
-            source_name
-        )
-        job['data'] = json.dumps({
-            'description': message
-        })
-        job['status'] = 'failed'
-        logger.error(message)
-        session.commit()
-        return
+def report_plan(reporter, sync_plan):
+    '''Account for components of *sync_plan* not transferred in *reporter*.'''
+    for _, action, _, message in sync_plan.entries:
+        if action == plan.UNAVAILABLE:
+            reporter.update(message, total=1, failed=1)
+        elif action == plan.SKIP:
+            reporter.update(total=1, skipped=1)
+
 
-    # now try to do the sync for each component
+def plan_destination(
+    sync_plan, components, source_location, destination_location,
+    resource_identifiers=None
+):
+    '''Plan copy of *components* to *destination_location* in *sync_plan*.
+
+    *resource_identifiers* is filled as described in
+    :func:`~ftrack_user_location.query.get_availabilities`.
+
+    '''
+    source_name = source_location['name']
+    destination_name = destination_location['name']
+
+    # resolve the availability of all the components at once
+    availabilities = query.get_availabilities(
+        source_location.session, components,
+        [source_location, destination_location], resource_identifiers
+    )
+
+    # now check which component needs to be synced
     for component in components:
-        component_id = component['id']
         component_name = component['name']
 
         # exclude ftrack-review component names ?
         if 'ftrackreview' in component_name:
             continue
 
-        destination_available = destination_location.get_component_availability(
-            component
-        )
-
-        source_available = source_location.get_component_availability(
-            component
-        )
+        availability = availabilities[component['id']]
+        destination_available = availability[destination_location['id']]
+        source_available = availability[source_location['id']]
 
         if source_available == 0.0:
             status = 'Component "{}" is not available in {}'.format(
                 component_name, source_name
             )
             logger.warning(status)
-            job['data'] = json.dumps({
-                'description': status
-            })
-            job['status'] = 'failed'
-            session.commit()
+            sync_plan.add(component, plan.UNAVAILABLE, message=status)
             continue
-        else:
-            status = 'component "{}" is available in {}'.format(
-                component_name, source_name
-            )
-            job['data'] = json.dumps({
-                'description': status
-            })
-            session.commit()
 
         logger.debug(
             '"{}" availability in {} is {}'.format(
@@ -119,63 +129,151 @@ def on_sync_to_destination(session, source_id, destination_id, components, user_
                 source_name,
                 destination_name
             )
-            job['data'] = json.dumps({
-                'description': status
-            })
             logger.debug(status)
-            session.commit()
+            sync_plan.add(component, plan.SKIP, message=status)
             continue
 
-        message = 'Copying Component "{}" from {} to {}'.format(
-                component_name,
-                source_name,
-                destination_name
+        plan_component(
+            sync_plan, component, availabilities, destination_location['id']
         )
 
-        logger.debug(message)
-        job['data'] = json.dumps({
-            'description': message
-        })
-        session.commit()
 
-        try:
-            destination_location.add_component(
-                component,
-                source_location
-            )
+def on_sync_to_destination(
+    session, source_id, destination_id, components, user_id, max_workers=None,
+    dry_run=False, manifest_identifier=None
+):
+    ''' Callback for when files are copied from the cloud location into the
+    destination one.
 
-        except ftrack_api.exception.ComponentInLocationError as error:
-            logger.warning(error)
-            continue
+        *source_id* : The id if the source location.
+        *destination_id* : The id if the source location.
+        *components* : a list of ids of all the component to be copied over.
+        *userId* : the id of the user who requested the sync.
+        *max_workers* : number of components copied at the same time.
+        *dry_run* : if True, return the
+            :class:`~ftrack_user_location.plan.SyncPlan` of the sync without
+            copying anything.
+        *manifest_identifier* : the manifest listing the components in the
+            source location, read in chunks instead of *components*.
 
-        except Exception as error:
-            logger.error('Component "{}" with ID {} failed: {}'.format(
-                component_name,
-                component_id,
-                error
-            ))
-            import traceback
-            logger.error(traceback.format_exc())
-            job['status'] = 'failed'
-            session.commit()
+    '''
+    # get location objects
+    locations = registry.get_registry(session)
+    source_location = locations.get_by_id(source_id)
+    destination_location = locations.get_by_id(destination_id)
 
-    job['status'] = 'done'
-    session.commit()
+    # get location accessors
+    source_accessor = source_location.accessor
+    destination_accessor = destination_location.accessor
 
-    logger.info('Finished processing {} components.'.format(len(components)))
+    # get the location names
+    source_name = source_location['name']
+    destination_name = destination_location['name']
 
+    logger.info(
+        "Syncing from {} to {}".format(
+            source_name,
+            destination_name,
+        )
+    )
+
+    sync_plan = plan.SyncPlan(
+        source_name, destination_name, transfer.get_throughput()
+    )
+    description = "Sync from {} to {}".format(
+        source_name,
+        destination_name
+    )
+
+    # sanity checks for the transfer
+    if not all([source_accessor, destination_accessor]):
+        message = 'Locations are not accessible : {}, {}'.format(
+            destination_name,
+            source_name
+        )
+        if dry_run:
+            sync_plan.error = message
+            return sync_plan
+
+        job.JobReporter(
+            session, session.get('User', user_id), description
+        ).fail(message)
+        return
 
-def on_sync_to_remote(session, source, destination, user_id, selection):
+    if manifest_identifier:
+        chunks = manifest.read(source_location, manifest_identifier)
+    else:
+        chunks = [components]
+
+    count = 0
+    resource_identifiers = {}
+    for chunk in chunks:
+        components = query.get_components(
+            session, [cid['id'] for cid in chunk]
+        )
+        count += len(components)
+        plan_destination(
+            sync_plan, components, source_location, destination_location,
+            resource_identifiers
+        )
+
+    if dry_run:
+        return sync_plan
+
+    # start the job
+    reporter = job.JobReporter(
+        session, session.get('User', user_id), description
+    )
+    report_plan(reporter, sync_plan)
+
+    pending = sync_plan.pending
+    message = 'Copying {} components from {} to {}'.format(
+        len(pending),
+        source_name,
+        destination_name
+    )
+    logger.debug(message)
+    reporter.update(message, total=len(pending))
+
+    # now copy the components
+    transfer.Transfer(
+        session, source_location, destination_location,
+        max_workers=max_workers
+    ).run(
+        pending, callback=reporter.add_result,
+        cancelled=reporter.is_cancelled,
+        resource_identifiers=resource_identifiers
+    )
+
+    reporter.finish()
+
+    if manifest_identifier and not reporter.cancelled:
+        manifest.remove(source_location, manifest_identifier)
+
+    logger.info('Finished processing {} components.'.format(count))
+
+
+def on_sync_to_remote(
+    session, source, destination, user_id, selection, max_workers=None,
+    dry_run=False
+):
     ''' Callback for when files are copied from the local location to the cloud
         one.
 
         *buttonId* : The name of the callback defined in the ftrack interface.
         *userId* : the id of the user who requested the sync.
         *selection* : a list of the ids of the selected entity in ftrack.
+        *max_workers* : number of components uploaded at the same time.
+        *dry_run* : if True, return the
+            :class:`~ftrack_user_location.plan.SyncPlan` of the sync without
+            uploading anything.
 
         once the copy to the cloud location is completed, an event
         `available_on_amazon` will then be emitted to sync the data to the
         destination.
+
+        If the destination location is accessible from this process, the
+        components are copied there directly instead.
     '''
     store_mapping = {
         'sync': 'ftrack.sync',
@@ -191,137 +289,172 @@ def on_sync_to_remote(session, source, destination, user_id, selection):
             source, destination)
     )
 
+    locations = registry.get_registry(session)
     results = {}
-    for location in session.query('select name from Location').all():
-        location_name = location['name']
-        for store_type, store_name in list(store_mapping.items()):
-            if store_name == location_name:
-                logger.debug(
-                    "Syncing to remote, found location {} in {} of type = {}".format(
-                        location_name, store_name, store_type)
-                    )
-                results[store_type] = location
+    for store_type, store_name in list(store_mapping.items()):
+        location = locations.get_by_name(store_name)
+        if location is None:
+            raise ValueError('Location {} does not exist'.format(store_name))
+
+        logger.debug(
+            "Syncing to remote, found location {} of type = {}".format(
+                store_name, store_type)
+            )
+        results[store_type] = location
+
+    # copy straight to the destination when possible
+    target = get_route(results['input'], results['output'], results['sync'])
+    staged = target['id'] == results['sync']['id']
 
     source_name = results['input']['name']
-    sync_name = results['sync']['name']
+    target_name = target['name']
 
-    # create a job to inform the user that something is going on
-    message = " Sync from {} to {}".format(source_name, sync_name)
+    message = "Sync from {} to {}".format(source_name, target_name)
     logger.info(message)
 
-    job = session.create('Job', {
-        'data': json.dumps({
-            'description': message
-        }),
-        'user': user,
-        'status': 'running'
-    })
-    session.commit()
-
-    components = []
-    for s in selection:
-        version = session.get('AssetVersion', s['entityId'])
-
-        # get all the asset components
-        for component in version['components']:
-            component_name = component['name']
-            component_id = component['id']
-            components.append(
-                {
-                    'id': component_id,
-                    'name': component_name
-                }
-            )
+    sync_plan = plan.SyncPlan(
+        source_name, target_name, transfer.get_throughput()
+    )
+
+    # get all the asset components
+    selected = query.get_version_components(
+        session, [s['entityId'] for s in selection]
+    )
 
-            status = 'Syncing {} from {} to {}'.format(
+    if dry_run and len(selected) > plan.PREVIEW_MAX_COMPONENTS:
+        # checking the availability of that many components would hold the
+        # sync tool for too long.
+        sync_plan.error = (
+            'Too many components to preview ({}), submit again to sync '
+            'them.'.format(len(selected))
+        )
+        return sync_plan
+
+    components = [
+        {
+            'id': component['id'],
+            'name': component['name'],
+            'size': component['size'] or 0
+        }
+        for component in selected
+    ]
+
+    # resolve the availability of all the components at once
+    resource_identifiers = {}
+    availabilities = query.get_availabilities(
+        session, selected, [results['input'], target], resource_identifiers
+    )
+
+    for component in selected:
+        component_name = component['name']
+        availability = availabilities[component['id']]
+
+        source_component = availability[results['input']['id']]
+        if source_component != 100.0:
+            status = 'Component {} not available in {} : {}'.format(
                 component_name,
                 source_name,
-                sync_name
+                source_component
             )
-
-            job['data'] = json.dumps(
-                {
-                    'description': status
-                }
-            )
-            session.commit()
             logger.debug(status)
+            sync_plan.add(component, plan.SKIP, message=status)
+            continue
 
-            source_component = results['input'].get_component_availability(
-                component
-            )
-            if source_component != 100.0:
-                status = 'Component {} not available in {} : {}'.format(
-                    component_name,
-                    source_name,
-                    source_component
-                )
-                logger.debug(status)
-                job['data'] = json.dumps(
-                    {
-                        'description': status
-                    }
-                )
-                session.commit()
-                continue
-
-            # check whether the component is already available
-            # in the sync location
-            synced_component = results['sync'].get_component_availability(
-                component
-            )
+        # check whether the component is already available
+        # in the target location
+        synced_component = availability[target['id']]
 
-            if synced_component == 100.0:
-                status = 'Component {} already synced to {}'.format(
-                    component_name,
-                    sync_name
-                )
-                logger.debug(status)
-                job['data'] = json.dumps(
-                    {
-                        'description': status
-                    }
-                )
-                continue
-
-            logger.debug('copying {} from {} to {}'.format(
-                    component['name'],
-                    source_name,
-                    sync_name
-                )
+        if synced_component == 100.0:
+            status = 'Component {} already synced to {}'.format(
+                component_name,
+                target_name
             )
+            logger.debug(status)
+            sync_plan.add(component, plan.SKIP, message=status)
+            continue
 
-            try:
-                results['sync'].add_component(
-                    component, results['input']
-                )
+        plan_component(sync_plan, component, availabilities, target['id'])
 
-            except ftrack_api.exception.ComponentInLocationError as error:
-                logger.error(error)
-                continue
+    if dry_run:
+        return sync_plan
 
-            except Exception:
-                import traceback
-                logger.error(traceback.format_exc())
-                job['status'] = 'failed'
-                session.commit()
+    # create a job to inform the user that something is going on
+    reporter = job.JobReporter(session, user, message)
+    report_plan(reporter, sync_plan)
 
-    job['status'] = 'done'
-    session.commit()
+    pending = sync_plan.pending
+
+    status = 'Syncing {} components from {} to {}'.format(
+        len(pending),
+        source_name,
+        target_name
+    )
+    logger.debug(status)
+    reporter.update(status, total=len(pending))
+
+    # copy the components, this returns once all of them are processed.
+    failed = []
+    digests = {}
+    for result in transfer.Transfer(
+        session, results['input'], target,
+        max_workers=max_workers
+    ).run(
+        pending, callback=reporter.add_result,
+        cancelled=reporter.is_cancelled,
+        resource_identifiers=resource_identifiers
+    ):
+        if result.status == transfer.FAILED:
+            failed.append(result.component['id'])
+        elif result.digest:
+            digests[result.component['id']] = result.digest
+
+    # do not request failed components on the other end.
+    components = [
+        component for component in components
+        if component['id'] not in failed
+    ]
+
+    reporter.finish()
 
     logger.info('Finished processing {} components.'.format(len(components)))
 
+    if reporter.cancelled:
+        return
+
+    if not staged:
+        # data already in the destination, nothing left to do on the other end.
+        return
+
+    data = {
+        'actionIdentifier': 'ftrack-to-{}'.format(results['output']['name']),
+        'locations': {
+            'sync': results['sync']['id'],
+            'source': results['input']['id'],
+            'destination': results['output']['id']
+        }
+    }
+
+    if manifest.use_manifest(len(components)):
+        # list the components in the sync location, to keep the event small.
+        for component in components:
+            component['digest'] = digests.get(component['id'])
+
+        data['manifest'] = manifest.write(results['sync'], components)
+    else:
+        data['components'] = [
+            {
+                'id': component['id'],
+                'name': component['name']
+            }
+            for component in components
+        ]
+
+    # used by the destination to schedule the sync.
+    data['size'] = sum(component['size'] for component in components)
+
     event = ftrack_api.event.base.Event(
         topic='ftrack.sync',
-        data={
-            'actionIdentifier': 'ftrack-to-{}'.format(results['output']['name']),
-            'components': components,
-            'locations': {
-                'sync': results['sync']['id'],
-                'source': results['input']['id'],
-                'destination': results['output']['id']
-            }
-        },
+        data=data,
         source={'user': user_id}
     )
 
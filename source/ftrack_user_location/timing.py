@@ -0,0 +1,59 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import logging
+import functools
+import contextlib
+
+
+logger = logging.getLogger(__name__)
+
+# Time budgets in milliseconds, checked by the benchmarks in test/benchmark.
+DISCOVER_BUDGET = float(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_DISCOVER_BUDGET', 50
+))
+
+LAUNCH_BUDGET = float(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_LAUNCH_BUDGET', 1000
+))
+
+STARTUP_BUDGET = float(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_STARTUP_BUDGET', 100
+))
+
+
+@contextlib.contextmanager
+def measure(name, budget=None):
+    '''Log time spent in the context as *name*.
+
+    Whether it took longer than *budget* milliseconds is logged along.
+
+    '''
+    start = time.time()
+    try:
+        yield
+    finally:
+        elapsed = (time.time() - start) * 1000
+        if budget and elapsed > budget:
+            logger.debug(
+                '{} took {:.1f}ms, over its {:.0f}ms budget.'.format(
+                    name, elapsed, budget
+                )
+            )
+        else:
+            logger.debug('{} took {:.1f}ms.'.format(name, elapsed))
+
+
+def timed(name, budget=None):
+    '''Return decorator measuring calls of a function as *name*.'''
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with measure(name, budget):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
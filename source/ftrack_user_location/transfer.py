@@ -0,0 +1,828 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import copy
+import time
+import logging
+import threading
+import functools
+import contextlib
+import traceback
+from concurrent import futures
+
+import ftrack_api
+import ftrack_api.symbol
+
+from ftrack_user_location import controller, digest, journal, query, retry
+
+
+logger = logging.getLogger(__name__)
+
+# Number of components transferred at the same time.
+MAX_WORKERS = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MAX_WORKERS', 4
+))
+
+# Number of seconds between two checks of the cancellation of a transfer.
+POLL_INTERVAL = 1
+
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# Weight of the latest transfer in the throughput estimate.
+THROUGHPUT_WEIGHT = 0.5
+
+_lock = threading.Lock()
+_throughput = None
+
+
+def get_throughput():
+    '''Return bytes per second recently achieved by transfers, or None.'''
+    return _throughput
+
+
+def record_throughput(size, seconds):
+    '''Account for *size* bytes transferred in *seconds* in the estimate.'''
+    global _throughput
+
+    if not size or seconds <= 0:
+        return
+
+    with _lock:
+        throughput = size / float(seconds)
+        if _throughput is None:
+            _throughput = throughput
+        else:
+            _throughput = (
+                THROUGHPUT_WEIGHT * throughput
+                + (1 - THROUGHPUT_WEIGHT) * _throughput
+            )
+
+
+class TransferResult(object):
+    '''Outcome of the transfer of a single component.'''
+
+    def __init__(self, component, status, message=None, size=0, digest=None):
+        '''Initialise result for *component* with *status* and *message*.
+
+        *size* is the number of bytes transferred, and *digest* the md5 hex
+        digest of the component data when known.
+
+        '''
+        self.component = component
+        self.status = status
+        self.message = message
+        self.size = size
+        self.digest = digest
+
+    def __repr__(self):
+        return '<TransferResult {} {}>'.format(
+            self.component['id'], self.status
+        )
+
+
+class _ComponentTask(object):
+    '''Files of a component being transferred.'''
+
+    def __init__(self, component, entries):
+        self.component = component
+        self.entries = entries
+        self.futures = []
+        self.finished = False
+        self.size = 0
+        # Members extracted from bundles, by source resource identifier.
+        self.bundled = {}
+        self.extracted = set()
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        '''Cancel files not transferred yet.'''
+        self.finished = True
+        for future in self.futures:
+            future.cancel()
+
+
+class Transfer(object):
+    '''Copy components from a source to a destination location.
+
+    Data is moved file by file by a bounded pool of worker threads, each one
+    using its own copy of the location accessors. Everything which requires
+    the session (resolving resource identifiers and registering the
+    components in the destination) runs in the calling thread, as the session
+    is not thread safe.
+
+    Progress is recorded in the transfer journal, so files copied by an
+    interrupted transfer are not copied again. Files of components finished,
+    whether registered or failed, are forgotten by the journal. Files failing with throttling
+    or network errors are retried with a backoff by their worker, while the
+    other files carry on.
+
+    Unless disabled, the number of files copied at the same time is adjusted
+    to the throughput achieved by a
+    :class:`~ftrack_user_location.controller.ConcurrencyController` shared
+    by the transfers of the process copying the same number of files.
+
+    '''
+
+    def __init__(
+        self, session, source_location, destination_location, max_workers=None
+    ):
+        '''Initialise transfer from *source_location* to *destination_location*.
+
+        *max_workers* defines how many files are copied at the same time,
+        default to FTRACK_USER_SYNC_LOCATION_MAX_WORKERS. When adaptive, it
+        is the number of files initially copied at the same time, adjusted
+        between one and twice *max_workers* by the controller shared with the
+        other transfers using the same value.
+
+        '''
+        self.session = session
+        self.source_location = source_location
+        self.destination_location = destination_location
+        self.max_workers = max(1, int(max_workers or MAX_WORKERS))
+        self.controller = controller.get_controller('files', self.max_workers)
+        self.journal = journal.get_journal()
+        self._local = threading.local()
+
+    def run(
+        self, components, callback=None, cancelled=None,
+        resource_identifiers=None
+    ):
+        '''Transfer *components* and return a list of :class:`TransferResult`.
+
+        *callback* is called in the calling thread with each result as soon
+        as it is available.
+
+        *cancelled* is an optional callable polled in the calling thread,
+        returning True to stop the transfer. Files being copied are finished
+        while the others are left for a later transfer to resume.
+
+        Files are copied independently, so the members of a container are
+        transferred in parallel. A component is registered in the destination
+        once all its files are copied. A failure transferring one component
+        does not affect the others.
+
+        *resource_identifiers* is an optional dictionary of the resource
+        identifiers of *components* and their members in the source and
+        destination locations, keyed by (component_id, location_id), as
+        filled by :func:`~ftrack_user_location.query.get_availabilities`.
+        They are resolved at once for all the components when not given.
+
+        '''
+        results = []
+        failed = []
+        start = time.time()
+        components = list(components)
+
+        if resource_identifiers is None:
+            resource_identifiers = {}
+            query.get_availabilities(
+                self.session, components,
+                [self.source_location, self.destination_location],
+                resource_identifiers
+            )
+
+        def _report(result):
+            results.append(result)
+            if callback:
+                callback(result)
+
+        executor = futures.ThreadPoolExecutor(
+            max_workers=(
+                self.controller.maximum if self.controller
+                else self.max_workers
+            )
+        )
+        tasks = {}
+        try:
+            for component in components:
+                if cancelled and cancelled():
+                    break
+
+                try:
+                    entries = self._plan(component, resource_identifiers)
+                except ftrack_api.exception.ComponentInLocationError as error:
+                    logger.warning(error)
+                    _report(TransferResult(component, SKIPPED, str(error)))
+                    continue
+                except Exception as error:
+                    logger.debug(traceback.format_exc())
+                    _report(self._failure(component, error))
+                    continue
+
+                task = _ComponentTask(component, entries)
+
+                for future in self._submit(
+                    executor, task, resource_identifiers
+                ):
+                    task.futures.append(future)
+                    tasks[future] = task
+
+                if not task.futures:
+                    _report(self._complete(task))
+
+            remaining = set(tasks)
+            while remaining:
+                if cancelled and cancelled():
+                    logger.info('Transfer cancelled.')
+                    for task in tasks.values():
+                        task.cancel()
+                    break
+
+                done, remaining = futures.wait(
+                    remaining, timeout=POLL_INTERVAL,
+                    return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    task = tasks[future]
+                    if task.finished:
+                        continue
+
+                    try:
+                        future.result()
+                    except Exception as error:
+                        logger.debug(traceback.format_exc())
+                        task.cancel()
+                        failed.append(task)
+                        _report(self._failure(task.component, error))
+                        continue
+
+                    if all(item.done() for item in task.futures):
+                        _report(self._complete(task))
+
+        finally:
+            executor.shutdown(wait=True)
+
+            # files of failed components still being copied are done by now.
+            for task in failed:
+                self._forget(task)
+
+        record_throughput(
+            sum(result.size for result in results), time.time() - start
+        )
+        return results
+
+    def _submit(self, executor, task, resource_identifiers):
+        '''Submit transfer of *task* files to *executor*, return the futures.
+
+        *resource_identifiers* are the ones given to :meth:`_plan`.
+
+        '''
+        submitted = []
+        files = []
+
+        for entity, source_identifier, target_identifier in task.entries:
+            if query.is_container(entity):
+                # Sequences have no data of their own.
+                if entity.entity_type != 'SequenceComponent':
+                    submitted.append(
+                        executor.submit(
+                            retry.call, self._make_container,
+                            target_identifier
+                        )
+                    )
+                continue
+
+            state = self._get_file_state(target_identifier)
+            if state == journal.DONE:
+                logger.debug(
+                    'Skipping {}, already copied.'.format(target_identifier)
+                )
+                continue
+
+            files.append((entity, source_identifier, target_identifier, state))
+
+        if task.component.entity_type == 'SequenceComponent' and files:
+            files, bundled = self._submit_bundles(
+                executor, task, files, resource_identifiers
+            )
+            submitted.extend(bundled)
+
+        for entity, source_identifier, target_identifier, state in files:
+            submitted.append(
+                executor.submit(
+                    self._copy, source_identifier, target_identifier,
+                    resume=(state == journal.STARTED),
+                    size=entity['size'] or 0
+                )
+            )
+            task.size += entity['size'] or 0
+
+        return submitted
+
+    def _get_sequence_identifiers(self, task, resource_identifiers):
+        '''Return source and target resource identifiers of *task* sequence.
+
+        The source resource identifier is looked up in *resource_identifiers*
+        when the sequence itself is not transferred.
+
+        '''
+        for entity, source_identifier, target_identifier in task.entries:
+            if entity is task.component:
+                return source_identifier, target_identifier
+
+        source_identifier = self._get_source_identifier(
+            task.component, resource_identifiers
+        )
+        target_identifier = (
+            self.destination_location.structure.get_resource_identifier(
+                task.component,
+                {'source_resource_identifier': source_identifier}
+            )
+        )
+        return source_identifier, target_identifier
+
+    def _submit_bundles(self, executor, task, files, resource_identifiers):
+        '''Submit transfer of sequence *files* through bundles.
+
+        Small members are bundled when staged to a location supporting it,
+        and extracted from their bundles when coming from one.
+
+        Identifiers of the sequence are looked up in *resource_identifiers*
+        when the sequence itself is not transferred.
+
+        Return the files left to transfer one by one and the futures.
+
+        '''
+        source_accessor = self.source_location.accessor
+        target_accessor = self.destination_location.accessor
+        bundle_size = getattr(target_accessor, 'bundle_size', 0)
+
+        if bundle_size and getattr(target_accessor, 'upload_bundle', None):
+            _, target_sequence = self._get_sequence_identifiers(
+                task, resource_identifiers
+            )
+            return self._submit_bundle_upload(
+                executor, task, files, target_sequence, bundle_size
+            )
+
+        if getattr(source_accessor, 'get_sequence_objects', None):
+            source_sequence, _ = self._get_sequence_identifiers(
+                task, resource_identifiers
+            )
+            return self._submit_bundle_download(
+                executor, task, files, source_sequence
+            )
+
+        return files, []
+
+    def _submit_bundle_upload(
+        self, executor, task, files, target_sequence, bundle_size
+    ):
+        '''Submit upload of small sequence *files* in bundles.'''
+        source_accessor = self.source_location.accessor
+
+        remaining = []
+        bundles = []
+        bundle = []
+        current_size = 0
+        for item in files:
+            entity, source_identifier, target_identifier, _ = item
+            size = entity['size'] or 0
+            path = get_filesystem_path(source_accessor, source_identifier)
+            if not path or size >= bundle_size:
+                remaining.append(item)
+                continue
+
+            if bundle and current_size + size > bundle_size:
+                bundles.append(bundle)
+                bundle = []
+                current_size = 0
+
+            bundle.append((path, target_identifier))
+            current_size += size
+            task.size += size
+
+        if bundle:
+            bundles.append(bundle)
+
+        submitted = [
+            executor.submit(self._upload_bundle, target_sequence, bundle)
+            for bundle in bundles
+        ]
+        return remaining, submitted
+
+    def _submit_bundle_download(self, executor, task, files, source_sequence):
+        '''Submit extraction of sequence *files* from their bundles.'''
+        bundles, objects = self.source_location.accessor.get_sequence_objects(
+            source_sequence
+        )
+        if not bundles:
+            return files, []
+
+        objects = set(objects)
+        remaining = []
+        for item in files:
+            entity, source_identifier, target_identifier, _ = item
+            if source_identifier in objects:
+                remaining.append(item)
+                continue
+
+            task.bundled[source_identifier] = target_identifier
+            task.size += entity['size'] or 0
+
+        if not task.bundled:
+            return remaining, []
+
+        submitted = [
+            executor.submit(retry.call, self._extract_bundle, task, key)
+            for key in bundles
+        ]
+        return remaining, submitted
+
+    def _upload_bundle(self, target_sequence, files):
+        '''Upload *files* of *target_sequence* as a bundle.'''
+        _, target_accessor = self._accessors()
+        for _, target_identifier in files:
+            self._set_file_state(target_identifier, journal.STARTED)
+
+        def _upload():
+            with self._slot():
+                target_accessor.upload_bundle(target_sequence, files)
+                self._record(sum(os.path.getsize(path) for path, _ in files))
+
+        retry.call(_upload)
+
+        for _, target_identifier in files:
+            self._set_file_state(target_identifier, journal.DONE)
+
+    def _extract_bundle(self, task, key):
+        '''Extract members of *task* from bundle *key* to the destination.
+
+        Bundles recorded as holding none of the members of *task* are not
+        downloaded.
+
+        '''
+        source_accessor, target_accessor = self._accessors()
+        members = source_accessor.get_bundle_members(key)
+        if members is not None and task.bundled.keys().isdisjoint(members):
+            logger.debug('Skipping bundle {}.'.format(key))
+            return
+
+        # Bundles are streamed outside of the managed transfers.
+        limiter = controller.get_limiter()
+        for source_identifier, data in source_accessor.iter_bundle(key):
+            target_identifier = task.bundled.get(source_identifier)
+            if target_identifier is None:
+                continue
+
+            self._set_file_state(target_identifier, journal.STARTED)
+            try:
+                container = target_accessor.get_container(target_identifier)
+            except ftrack_api.exception.AccessorParentResourceNotFoundError:
+                pass
+            else:
+                target_accessor.make_container(container)
+
+            size = 0
+            target_data = target_accessor.open(target_identifier, 'wb')
+            chunked_read = functools.partial(
+                data.read, ftrack_api.symbol.CHUNK_SIZE
+            )
+            for chunk in iter(chunked_read, b''):
+                if limiter is not None:
+                    limiter.consume(len(chunk))
+                target_data.write(chunk)
+                size += len(chunk)
+            target_data.close()
+            self._record(size)
+
+            with task.lock:
+                task.extracted.add(source_identifier)
+            self._set_file_state(target_identifier, journal.DONE)
+
+    def _complete(self, task):
+        '''Register copied *task* and return its result.
+
+        The files of *task* are forgotten by the journal whatever the outcome.
+
+        '''
+        task.finished = True
+
+        try:
+            missing = set(task.bundled) - task.extracted
+            if missing:
+                return self._failure(
+                    task.component,
+                    'members not found in bundles: {}'.format(
+                        ', '.join(sorted(missing))
+                    )
+                )
+
+            try:
+                self._register(task.entries)
+            except Exception as error:
+                self.session.rollback()
+                logger.debug(traceback.format_exc())
+                return self._failure(task.component, error)
+
+        finally:
+            self._forget(task)
+
+        return TransferResult(
+            task.component, DONE, size=task.size,
+            digest=self._get_digest(task.component, task.entries)
+        )
+
+    def _get_digest(self, component, entries):
+        '''Return digest of single file *component* if already known.
+
+        Digests are only looked up in the digest cache, where uploads to the
+        sync location record them, files are not hashed again. Containers have
+        no digest of their own.
+
+        '''
+        if query.is_container(component) or len(entries) != 1:
+            return None
+
+        path = get_filesystem_path(self.source_location.accessor, entries[0][1])
+        if not path:
+            return None
+
+        return digest.get_cache().find(path)
+
+    def _forget(self, task):
+        '''Forget about the files of finished *task* in the journal.'''
+        if self.journal:
+            self.journal.clear_files(
+                self.destination_location['id'],
+                [target_identifier for _, _, target_identifier in task.entries]
+            )
+
+    def _get_file_state(self, target_identifier):
+        '''Return journaled state of *target_identifier*.'''
+        if not self.journal:
+            return None
+
+        return self.journal.get_file_state(
+            self.destination_location['id'], target_identifier
+        )
+
+    def _set_file_state(self, target_identifier, state):
+        '''Record *state* of *target_identifier* in the journal.'''
+        if self.journal:
+            self.journal.set_file_state(
+                self.destination_location['id'], target_identifier, state
+            )
+
+    def _failure(self, component, error):
+        '''Return failed result for *component* caused by *error*.'''
+        message = 'Component "{}" with ID {} failed: {}'.format(
+            component['name'], component['id'], error
+        )
+        logger.error(message)
+        return TransferResult(component, FAILED, message)
+
+    def _plan(self, component, resource_identifiers):
+        '''Return list of entries to transfer for *component*.
+
+        Each entry is a tuple of (component, source resource identifier,
+        target resource identifier), with container members listed before
+        their container. Source resource identifiers are looked up in
+        *resource_identifiers*, keyed by (component_id, location_id).
+
+        Members of a container already present in the destination location
+        are left out, so only the missing ones are transferred.
+
+        Raise :exc:`ftrack_api.exception.ComponentInLocationError` if
+        *component* is already fully present in the destination location, and
+        :exc:`ftrack_api.exception.ComponentNotInLocationError` if any of the
+        missing ones is not present in the source location.
+
+        '''
+        members = []
+        if query.is_container(component):
+            members = list(component['members'])
+
+        entities = [
+            entity for entity in members + [component]
+            if (entity['id'], self.destination_location['id'])
+            not in resource_identifiers
+        ]
+        if not entities:
+            raise ftrack_api.exception.ComponentInLocationError(
+                [component], self.destination_location
+            )
+
+        if members and len(entities) < len(members) + 1:
+            logger.info(
+                'Component "{}" partially in {}, transferring {} of {} '
+                'members.'.format(
+                    component['name'], self.destination_location['name'],
+                    len([entity for entity in entities if entity is not component]),
+                    len(members)
+                )
+            )
+
+        unavailable = [
+            entity for entity in entities
+            if (entity['id'], self.source_location['id'])
+            not in resource_identifiers
+        ]
+        if unavailable:
+            raise ftrack_api.exception.ComponentNotInLocationError(
+                unavailable, self.source_location
+            )
+
+        entries = []
+        for entity in entities:
+            source_identifier = self._get_source_identifier(
+                entity, resource_identifiers
+            )
+            target_identifier = (
+                self.destination_location.structure.get_resource_identifier(
+                    entity, {'source_resource_identifier': source_identifier}
+                )
+            )
+            entries.append((entity, source_identifier, target_identifier))
+
+        return entries
+
+    def _get_source_identifier(self, entity, resource_identifiers):
+        '''Return source resource identifier of *entity*.
+
+        It is looked up in *resource_identifiers* and decoded as
+        :meth:`ftrack_api.entity.location.Location.get_resource_identifiers`
+        does.
+
+        Raise :exc:`ftrack_api.exception.ComponentNotInLocationError` if
+        *entity* is not present in the source location.
+
+        '''
+        key = (entity['id'], self.source_location['id'])
+        if key not in resource_identifiers:
+            raise ftrack_api.exception.ComponentNotInLocationError(
+                [entity], self.source_location
+            )
+
+        resource_identifier = resource_identifiers[key]
+        transformer = self.source_location.resource_identifier_transformer
+        if transformer:
+            resource_identifier = transformer.decode(
+                resource_identifier, context={'component': entity}
+            )
+
+        return resource_identifier
+
+    def _accessors(self):
+        '''Return source and destination accessors for the current thread.'''
+        accessors = getattr(self._local, 'accessors', None)
+        if accessors is None:
+            accessors = (
+                copy.deepcopy(self.source_location.accessor),
+                copy.deepcopy(self.destination_location.accessor)
+            )
+            self._local.accessors = accessors
+
+        return accessors
+
+    def _slot(self):
+        '''Return context holding a transfer slot of the controller.'''
+        if self.controller is None:
+            return contextlib.nullcontext()
+
+        return self.controller.slot()
+
+    def _record(self, size):
+        '''Record *size* bytes transferred with the controller.'''
+        if self.controller is not None:
+            self.controller.record(size)
+
+    def _copy(
+        self, source_identifier, target_identifier, resume=False, size=0
+    ):
+        '''Copy *size* bytes of *source_identifier* to *target_identifier*.
+
+        If *resume* is True, data left at *target_identifier* by an
+        interrupted transfer is overwritten, as it is when retrying.
+
+        '''
+        source_accessor, target_accessor = self._accessors()
+        self._set_file_state(target_identifier, journal.STARTED)
+        overwrite = [resume]
+
+        def _attempt():
+            try:
+                with self._slot():
+                    copy_data(
+                        source_accessor, target_accessor,
+                        source_identifier, target_identifier,
+                        overwrite=overwrite[0]
+                    )
+                    self._record(size)
+            finally:
+                # Data may have been partially written.
+                overwrite[0] = True
+
+        retry.call(_attempt)
+        self._set_file_state(target_identifier, journal.DONE)
+
+    def _make_container(self, target_identifier):
+        '''Make container *target_identifier* in the destination.'''
+        _, target_accessor = self._accessors()
+        target_accessor.make_container(target_identifier)
+
+    def _register(self, entries):
+        '''Register *entries* in the destination location and commit.'''
+        location = self.destination_location
+        transformer = location.resource_identifier_transformer
+
+        for entity, _, target_identifier in entries:
+            if transformer:
+                target_identifier = transformer.encode(
+                    target_identifier, context={'component': entity}
+                )
+
+            self.session.create('ComponentLocation', {
+                'component': entity,
+                'location': location,
+                'resource_identifier': target_identifier
+            })
+
+        self.session.commit()
+
+        for entity, _, _ in entries:
+            self.session.event_hub.publish(
+                ftrack_api.event.base.Event(
+                    topic=ftrack_api.symbol.COMPONENT_ADDED_TO_LOCATION_TOPIC,
+                    data={
+                        'component_id': entity['id'],
+                        'location_id': location['id']
+                    }
+                ),
+                on_error='ignore'
+            )
+
+
+def get_filesystem_path(accessor, resource_identifier):
+    '''Return filesystem path of *resource_identifier* or None if unsupported.'''
+    try:
+        return accessor.get_filesystem_path(resource_identifier)
+    except ftrack_api.exception.AccessorUnsupportedOperationError:
+        return None
+
+
+def copy_data(
+    source_accessor, target_accessor, source_identifier, target_identifier,
+    overwrite=False
+):
+    '''Copy *source_identifier* data to *target_identifier*.
+
+    Raise :exc:`ftrack_api.exception.LocationError` if data already exists at
+    *target_identifier*, unless *overwrite* is True.
+
+    Data streamed between accessors is kept within the bandwidth limit,
+    unless one of them already limits its own transfers.
+
+    '''
+    try:
+        container = target_accessor.get_container(target_identifier)
+    except ftrack_api.exception.AccessorParentResourceNotFoundError:
+        pass
+    else:
+        target_accessor.make_container(container)
+
+    if not overwrite and target_accessor.exists(target_identifier):
+        raise ftrack_api.exception.LocationError(
+            'Cannot add component as data already exists and '
+            'overwriting could result in data loss. Computed '
+            'target resource identifier was: {0}'.format(target_identifier)
+        )
+
+    # Let accessors able to transfer straight from or to disk do so.
+    upload = getattr(target_accessor, 'upload', None)
+    if upload:
+        source_path = get_filesystem_path(source_accessor, source_identifier)
+        if source_path:
+            upload(source_path, target_identifier)
+            return
+
+    download = getattr(source_accessor, 'download', None)
+    if download:
+        target_path = get_filesystem_path(target_accessor, target_identifier)
+        if target_path:
+            download(source_identifier, target_path)
+            return
+
+    limiter = controller.get_limiter()
+    if any(
+        getattr(accessor, 'limits_bandwidth', False)
+        for accessor in (source_accessor, target_accessor)
+    ):
+        limiter = None
+
+    source_data = source_accessor.open(source_identifier, 'rb')
+    target_data = target_accessor.open(target_identifier, 'wb')
+
+    chunked_read = functools.partial(
+        source_data.read, ftrack_api.symbol.CHUNK_SIZE
+    )
+    for chunk in iter(chunked_read, b''):
+        if limiter is not None:
+            limiter.consume(len(chunk))
+        target_data.write(chunk)
+
+    target_data.close()
+    source_data.close()
@@ -0,0 +1,159 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import copy
+import logging
+import threading
+import traceback
+
+import ftrack_api
+import ftrack_api.symbol
+
+from ftrack_user_location import registry
+from ftrack_user_location.scheduler import FairScheduler, QueueFullError
+
+
+logger = logging.getLogger(__name__)
+
+# Number of syncs running at the same time.
+MAX_SYNCS = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MAX_SYNCS', 2
+))
+
+# Number of syncs waiting for a worker before new ones are refused.
+MAX_QUEUED_SYNCS = int(os.getenv(
+    'FTRACK_USER_SYNC_LOCATION_MAX_QUEUED_SYNCS', 32
+))
+
+
+def get_location_settings(session):
+    '''Return settings of the locations configured in *session*.
+
+    Return a mapping of location ids to (accessor, structure, priority).
+
+    '''
+    settings = {}
+    for location in registry.get_registry(session).get_locations():
+        if location.accessor is ftrack_api.symbol.NOT_SET:
+            continue
+
+        settings[location['id']] = (
+            location.accessor, location.structure, location.priority
+        )
+
+    return settings
+
+
+def create_session(session, location_settings):
+    '''Return a new session for the user of *session*.
+
+    Plugins are not discovered again, the locations are configured from
+    *location_settings* as returned by :func:`get_location_settings` instead.
+
+    '''
+    worker_session = ftrack_api.Session(
+        server_url=session.server_url,
+        api_key=session.api_key,
+        api_user=session.api_user,
+        plugin_paths=[],
+        auto_connect_event_hub=True
+    )
+
+    for location in registry.get_registry(worker_session).get_locations():
+        settings = location_settings.get(location['id'])
+        # Built in locations are configured by the session itself.
+        if not settings or location.accessor is not ftrack_api.symbol.NOT_SET:
+            continue
+
+        accessor, structure, priority = settings
+        location.accessor = copy.deepcopy(accessor)
+        location.structure = copy.deepcopy(structure)
+        location.priority = priority
+
+    return worker_session
+
+
+class SyncQueue(object):
+    '''Run syncs in the background.
+
+    Syncs are queued and run by a pool of worker threads, so the event hub
+    is not blocked while the data is transferred. Each worker uses its own
+    session, as sessions are not thread safe. Queued syncs are run in the
+    order of a :class:`~ftrack_user_location.scheduler.FairScheduler`.
+
+    '''
+
+    def __init__(
+        self, session, max_syncs=None, max_queued=None, max_user_syncs=None
+    ):
+        '''Initialise queue running syncs for the user of *session*.
+
+        *max_syncs* is the number of syncs running at the same time, default
+        to FTRACK_USER_SYNC_LOCATION_MAX_SYNCS.
+
+        *max_queued* is the number of syncs waiting for a worker, default to
+        FTRACK_USER_SYNC_LOCATION_MAX_QUEUED_SYNCS.
+
+        *max_user_syncs* is the number of syncs of a single user running at
+        the same time, default to FTRACK_USER_SYNC_LOCATION_MAX_USER_SYNCS.
+
+        '''
+        self.session = session
+        self.max_syncs = max(1, int(max_syncs or MAX_SYNCS))
+        self.max_queued = max(1, int(max_queued or MAX_QUEUED_SYNCS))
+        self.location_settings = get_location_settings(session)
+
+        self._scheduler = FairScheduler(
+            self.max_queued, max_user_running=max_user_syncs
+        )
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def submit(self, function, args=(), user_id=None, size=None):
+        '''Queue call of *function* with a worker session and *args*.
+
+        The session is passed as the first argument of *function*. *user_id*
+        is the user who requested the sync and *size* the estimated number of
+        bytes to transfer, used to schedule it.
+
+        Raise :exc:`~ftrack_user_location.scheduler.QueueFullError` if too
+        many syncs are already waiting.
+
+        '''
+        self._scheduler.put((function, args), user_id=user_id, size=size)
+        self._start_workers()
+
+    def _start_workers(self):
+        '''Start missing worker threads.'''
+        with self._lock:
+            while len(self._workers) < self.max_syncs:
+                worker = threading.Thread(
+                    target=self._run,
+                    name='ftrack-sync-{}'.format(len(self._workers))
+                )
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def _run(self):
+        '''Run queued syncs forever.'''
+        session = None
+
+        while True:
+            user_id, (function, args) = self._scheduler.get()
+            try:
+                if session is None:
+                    session = create_session(
+                        self.session, self.location_settings
+                    )
+
+                function(session, *args)
+
+            except Exception:
+                logger.error(traceback.format_exc())
+                if session is not None:
+                    session.rollback()
+
+            finally:
+                self._scheduler.done(user_id)
@@ -0,0 +1,118 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import time
+import uuid
+import collections
+
+import ftrack_api
+
+
+class StubEventHub(object):
+    '''Event hub recording subscriptions, without connecting to a server.'''
+
+    def __init__(self):
+        self.subscribers = collections.defaultdict(list)
+        self.published = []
+
+    def subscribe(self, subscription, callback, priority=100):
+        '''Subscribe *callback* to *subscription*.'''
+        self.subscribers[subscription].append(callback)
+
+    def publish(self, event, synchronous=False):
+        '''Record published *event*.'''
+        self.published.append(event)
+
+    def get_callbacks(self, topic):
+        '''Return callbacks subscribed to *topic*.'''
+        return [
+            callback
+            for subscription, callbacks in self.subscribers.items()
+            if 'topic={}'.format(topic) in subscription
+            for callback in callbacks
+        ]
+
+
+class StubEntity(dict):
+    '''Entity holding its data, attributes such as accessors can be set.'''
+
+    def __init__(self, entity_type, data, session=None):
+        super(StubEntity, self).__init__(data)
+        self.entity_type = entity_type
+        self.session = session
+        self.accessor = None
+        self.structure = None
+        self.priority = 0
+
+
+class StubQueryResult(list):
+    '''Result of a query.'''
+
+    def first(self):
+        return self[0] if self else None
+
+    def all(self):
+        return list(self)
+
+
+class StubSession(ftrack_api.Session):
+    '''Session answering queries from memory, without a server.
+
+    Every query takes *latency* seconds, to account for the round trip to
+    the server.
+
+    '''
+
+    def __init__(self, locations=(), latency=0.0):
+        self._server_url = 'https://stub.ftrackapp.com'
+        self._api_user = 'stub.user'
+        self._event_hub = StubEventHub()
+        self.latency = latency
+        self.queries = []
+        self.locations = [
+            StubEntity('Location', {'id': str(uuid.uuid4()), 'name': name}, self)
+            for name in locations
+        ]
+
+    def __del__(self):
+        pass
+
+    def close(self):
+        pass
+
+    def query(self, expression, page_size=None):
+        '''Return locations, whatever the *expression*.'''
+        self.queries.append(expression)
+        time.sleep(self.latency)
+        if 'name is' in expression:
+            name = expression.split('"')[1]
+            return StubQueryResult(
+                location for location in self.locations
+                if location['name'] == name
+            )
+
+        return StubQueryResult(self.locations)
+
+    def ensure(self, entity_type, data, identifying_keys=None):
+        '''Return entity matching *data*, created if needed.'''
+        location = self.query(
+            'Location where name is "{}"'.format(data['name'])
+        ).first()
+        if location is not None:
+            return location
+
+        return self.create(entity_type, data)
+
+    def create(self, entity_type, data=None, reconstructing=False):
+        '''Return new entity of *entity_type* with *data*.'''
+        data = dict(data or {})
+        data.setdefault('id', str(uuid.uuid4()))
+        entity = StubEntity(entity_type, data, self)
+        if not reconstructing:
+            self.locations.append(entity)
+
+        return entity
+
+    def pick_location(self, component=None):
+        '''Return location with the highest priority.'''
+        return sorted(self.locations, key=lambda location: location.priority)[0]
@@ -0,0 +1,132 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+
+from ftrack_user_location import location_ids, timing
+
+from stub import StubSession
+
+LOCATION_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'resource', 'location')
+)
+
+SOURCE_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'source')
+)
+
+# Round trip to the server of each query, in seconds.
+LATENCY = 0.05
+
+# Measure import of a location plugin in a fresh interpreter, where the API is
+# already imported by the host application.
+IMPORT_SCRIPT = '''
+import sys
+import json
+import time
+import importlib.util
+
+import ftrack_api
+
+start = time.time()
+spec = importlib.util.spec_from_file_location('plugin', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({
+    'elapsed': (time.time() - start) * 1000,
+    'boto3': 'boto3' in sys.modules
+}))
+'''
+
+
+@pytest.fixture()
+def environment(monkeypatch, temporary_directory):
+    '''Set environment of the location plugins.'''
+    monkeypatch.setenv('FTRACK_USER_SYNC_LOCATION_AWS_ID', 'testing')
+    monkeypatch.setenv('FTRACK_USER_SYNC_LOCATION_AWS_KEY', 'testing')
+    monkeypatch.setenv('FTRACK_USER_SYNC_LOCATION_BUCKET_NAME', 'bucket')
+    monkeypatch.setenv('FTRACK_USER_LOCTION_PATH', temporary_directory)
+    monkeypatch.setattr(
+        location_ids, '_get_location_cache_path',
+        lambda: os.path.join(temporary_directory, 'locations.json')
+    )
+
+
+def _load(name):
+    '''Return location plugin *name*, imported from scratch.'''
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(LOCATION_DIRECTORY, '{}.py'.format(name))
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _register_and_configure(name, session):
+    '''Register plugin *name* with *session* and configure the locations.
+
+    Return the number of milliseconds taken.
+
+    '''
+    start = time.time()
+    module = _load(name)
+    module.register(session)
+    for callback in session.event_hub.get_callbacks(
+        'ftrack.api.session.configure-location'
+    ):
+        callback({})
+
+    return (time.time() - start) * 1000
+
+
+@pytest.mark.parametrize('name', ['cloud_location', 'user_location'])
+def test_import(name, environment):
+    '''Import location plugins within the startup budget, without boto3.'''
+    environment = dict(os.environ, PYTHONPATH=SOURCE_DIRECTORY)
+    result = json.loads(subprocess.check_output(
+        [
+            sys.executable, '-c', IMPORT_SCRIPT,
+            os.path.join(LOCATION_DIRECTORY, '{}.py'.format(name))
+        ],
+        env=environment
+    ).decode('utf-8').splitlines()[-1])
+
+    print('{} imported in {:.1f}ms'.format(name, result['elapsed']))
+    assert not result['boto3']
+    assert result['elapsed'] < timing.STARTUP_BUDGET
+
+
+def test_register_cloud_location(environment):
+    '''Register the sync location without querying it once cached.'''
+    session = StubSession(['ftrack.sync'], latency=LATENCY)
+    _register_and_configure('cloud_location', session)
+    assert session.queries
+
+    session = StubSession(['ftrack.sync'], latency=LATENCY)
+    elapsed = _register_and_configure('cloud_location', session)
+
+    print('cloud_location registered in {:.1f}ms'.format(elapsed))
+    assert not session.queries
+    assert elapsed < timing.STARTUP_BUDGET
+
+
+def test_register_user_location(environment):
+    '''Register the user location without querying it once cached.'''
+    session = StubSession(latency=LATENCY)
+    _register_and_configure('user_location', session)
+    assert session.queries
+
+    session = StubSession(latency=LATENCY)
+    elapsed = _register_and_configure('user_location', session)
+
+    print('user_location registered in {:.1f}ms'.format(elapsed))
+    assert not session.queries
+    assert elapsed < timing.STARTUP_BUDGET
@@ -0,0 +1,121 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import importlib.util
+
+import pytest
+
+from ftrack_user_location import timing
+
+from stub import StubSession
+
+HOOK_PATH = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '..', '..', 'resource', 'hook',
+        'sync_action.py'
+    )
+)
+
+# Round trip to the server of each query, in seconds.
+LATENCY = 0.05
+
+# Number of times the action is discovered.
+DISCOVERIES = 100
+
+
+@pytest.fixture()
+def action():
+    '''Return sync action of a stubbed session with a few locations.'''
+    spec = importlib.util.spec_from_file_location('sync_action', HOOK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    session = StubSession(
+        ['ftrack.unmanaged', 'ftrack.sync', 'studio', 'stub.user.host'],
+        latency=LATENCY
+    )
+    session.schemas = [{'id': 'AssetVersion'}, {'id': 'Component'}]
+    for location in session.locations:
+        location.priority = len(location['name'])
+
+    return module.SyncAction(session)
+
+
+def _get_event(**data):
+    '''Return event for an asset version selected in the web interface.'''
+    data.setdefault(
+        'selection', [{'entityId': 'version-id', 'entityType': 'assetversion'}]
+    )
+    return {
+        'topic': 'ftrack.action.launch',
+        'data': data,
+        'source': {'id': 'source-id', 'user': {'id': 'user-id'}}
+    }
+
+
+def test_discover(action):
+    '''Discover the action within the budget, without querying again.'''
+    action._discover(_get_event())
+    queries = len(action.session.queries)
+
+    start = time.time()
+    for _ in range(DISCOVERIES):
+        result = action._discover(_get_event())
+    elapsed = (time.time() - start) * 1000 / DISCOVERIES
+
+    print('Discovered in {:.2f}ms'.format(elapsed))
+    assert result['items'][0]['actionIdentifier'] == action.identifier
+    assert len(action.session.queries) == queries
+    assert elapsed < timing.DISCOVER_BUDGET
+
+
+def test_launch(action):
+    '''Show the sync form within the budget.'''
+    start = time.time()
+    result = action.launch(
+        action.session, [('AssetVersion', 'version-id')],
+        _get_event(actionIdentifier=action.identifier)
+    )
+    elapsed = (time.time() - start) * 1000
+
+    print('Launched in {:.2f}ms'.format(elapsed))
+    assert result['type'] == 'form'
+    assert elapsed < timing.LAUNCH_BUDGET
+
+
+class StubQueue(object):
+    '''Queue recording the syncs submitted.'''
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, args=(), user_id=None, size=None):
+        self.submitted.append((user_id, size))
+
+
+def test_queue_syncs(action):
+    '''Queue syncs with the size carried by their events, without querying.'''
+    action._queue = StubQueue()
+    queries = len(action.session.queries)
+
+    action.sync_here({
+        'data': {
+            'components': [{'id': 'component-id', 'name': 'main'}],
+            'locations': {'sync': 'sync-id', 'destination': 'studio-id'},
+            'size': 1024
+        },
+        'source': {'user': 'user-id'}
+    })
+    action.sync_there(
+        _get_event(
+            values={
+                'source_location': 'stub.user.host',
+                'dest_location': 'studio', 'size': '2048'
+            }
+        )
+    )
+
+    assert action._queue.submitted == [('user-id', 1024), ('user-id', 2048.0)]
+    assert len(action.session.queries) == queries
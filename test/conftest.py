@@ -0,0 +1,45 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+import pytest
+
+# Keep the logs and the local state of the sync out of the user directory.
+os.environ['XDG_DATA_HOME'] = tempfile.mkdtemp()
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'source'))
+)
+
+
+@pytest.fixture()
+def bucket():
+    '''Return name of an empty S3 bucket mocked with moto.'''
+    moto = pytest.importorskip('moto')
+
+    from ftrack_user_location import accessor
+
+    with moto.mock_aws():
+        # do not reuse clients and resources across mocked accounts.
+        accessor._clients.clear()
+        accessor._local = threading.local()
+
+        accessor.get_client().create_bucket(Bucket='ftrack-sync-test')
+        yield 'ftrack-sync-test'
+
+
+@pytest.fixture()
+def temporary_directory():
+    '''Return path of a temporary directory.'''
+    directory = tempfile.mkdtemp()
+    yield directory
+
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,506 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import copy
+import threading
+
+import pytest
+
+
+@pytest.fixture()
+def accessor(bucket):
+    '''Return accessor of the mocked *bucket*.'''
+    from ftrack_user_location.accessor import SyncS3Accessor
+
+    return SyncS3Accessor(bucket, compression_codec=False)
+
+
+def test_write_and_read(accessor):
+    '''Write an object through open and read it back.'''
+    data = accessor.open('folder/file.txt', 'wb')
+    data.write(b'content')
+    data.close()
+
+    data = accessor.open('folder/file.txt', 'rb')
+    assert data.read() == b'content'
+    data.close()
+
+
+def test_upload_and_download(accessor, temporary_directory):
+    '''Upload a file and download it back.'''
+    path = os.path.join(temporary_directory, 'source.bin')
+    with open(path, 'wb') as file_object:
+        file_object.write(os.urandom(1024))
+
+    accessor.upload(path, 'folder/file.bin')
+
+    target = os.path.join(temporary_directory, 'target.bin')
+    accessor.download('folder/file.bin', target)
+
+    with open(path, 'rb') as source, open(target, 'rb') as downloaded:
+        assert source.read() == downloaded.read()
+
+
+def test_remove(accessor):
+    '''Remove an object.'''
+    data = accessor.open('folder/file.txt', 'wb')
+    data.write(b'content')
+    data.close()
+
+    accessor.remove('folder/file.txt')
+
+    response = accessor.client.list_objects_v2(Bucket=accessor.bucket_name)
+    assert response['KeyCount'] == 0
+
+
+@pytest.fixture()
+def deduplicating_accessor(bucket):
+    '''Return deduplicating accessor of the mocked *bucket*.'''
+    from ftrack_user_location.accessor import SyncS3Accessor
+
+    return SyncS3Accessor(bucket, deduplicate=True, compression_codec=False)
+
+
+def _write_file(directory, name, content):
+    '''Write *content* to file *name* in *directory* and return its path.'''
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as file_object:
+        file_object.write(content)
+
+    return path
+
+
+def _read_object(accessor, resource_identifier):
+    '''Return content of *resource_identifier*.'''
+    return accessor.client.get_object(
+        Bucket=accessor.bucket_name, Key=resource_identifier
+    )['Body'].read()
+
+
+def test_deduplicated_upload_after_remove(
+    deduplicating_accessor, temporary_directory
+):
+    '''Upload content again to an object removed since.'''
+    accessor = deduplicating_accessor
+    path = _write_file(temporary_directory, 'a.bin', b'a' * 64)
+
+    accessor.upload(path, 'key')
+    accessor.remove('key')
+    accessor.upload(path, 'key')
+
+    assert _read_object(accessor, 'key') == b'a' * 64
+
+
+def test_deduplicated_upload_after_replace(
+    deduplicating_accessor, temporary_directory
+):
+    '''Do not copy content from an object replaced since.'''
+    accessor = deduplicating_accessor
+    path_a = _write_file(temporary_directory, 'a.bin', b'a' * 64)
+    path_b = _write_file(temporary_directory, 'b.bin', b'b' * 64)
+
+    accessor.upload(path_a, 'key')
+    accessor.remove('key')
+    accessor.upload(path_b, 'key')
+    accessor.upload(path_a, 'other')
+
+    assert _read_object(accessor, 'key') == b'b' * 64
+    assert _read_object(accessor, 'other') == b'a' * 64
+
+
+def test_deduplicated_upload_copies_content(
+    deduplicating_accessor, temporary_directory
+):
+    '''Copy content already in the bucket instead of uploading it.'''
+    accessor = deduplicating_accessor
+    path = _write_file(temporary_directory, 'a.bin', b'a' * 64)
+
+    accessor.upload(path, 'key')
+    accessor.upload(path, 'other')
+
+    assert _read_object(accessor, 'other') == b'a' * 64
+
+
+def test_threads_share_client(accessor):
+    '''Send requests of all threads through the shared client.'''
+    clients = []
+
+    def get_clients():
+        copied = copy.deepcopy(accessor)
+        clients.append(copied.client)
+        clients.append(copied.bucket.Object('key').meta.client)
+
+    threads = [threading.Thread(target=get_clients) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(clients) == 8
+    assert all(client is accessor.client for client in clients)
+
+
+def test_multipart_upload_and_download(bucket, temporary_directory):
+    '''Upload and download a file in multiple parts.'''
+    from ftrack_user_location.accessor import (
+        MB, SyncS3Accessor, get_transfer_config
+    )
+
+    accessor = SyncS3Accessor(
+        bucket, compression_codec=False, config=get_transfer_config(
+            multipart_threshold=5 * MB, multipart_chunksize=5 * MB
+        )
+    )
+    content = os.urandom(11 * MB)
+    path = _write_file(temporary_directory, 'big.bin', content)
+
+    accessor.upload(path, 'folder/big.bin')
+
+    target = os.path.join(temporary_directory, 'target.bin')
+    accessor.download('folder/big.bin', target)
+
+    with open(target, 'rb') as file_object:
+        assert file_object.read() == content
+
+
+def test_upload_aborts_upload_of_other_file(bucket, temporary_directory):
+    '''Abort upload in progress of a file which changed since.'''
+    from ftrack_user_location.accessor import (
+        MB, SyncS3Accessor, get_transfer_config
+    )
+    from ftrack_user_location.journal import get_journal
+
+    accessor = SyncS3Accessor(
+        bucket, compression_codec=False, config=get_transfer_config(
+            multipart_threshold=5 * MB, multipart_chunksize=5 * MB
+        )
+    )
+    journal = get_journal()
+    upload_id = accessor.client.create_multipart_upload(
+        Bucket=bucket, Key='folder/big.bin'
+    )['UploadId']
+    journal.set_upload(
+        bucket, 'folder/big.bin', 'other.bin', 0, 0, 5 * MB, upload_id
+    )
+    journal.add_part(upload_id, 1, 'etag')
+
+    path = _write_file(temporary_directory, 'big.bin', os.urandom(11 * MB))
+    accessor.upload(path, 'folder/big.bin')
+
+    response = accessor.client.list_multipart_uploads(Bucket=bucket)
+    assert not response.get('Uploads')
+    assert journal.get_parts(upload_id) == {}
+
+
+def test_download_changed_object(bucket, temporary_directory):
+    '''Download again an object changed since its download started.'''
+    from ftrack_user_location.accessor import (
+        MB, SyncS3Accessor, get_transfer_config
+    )
+    from ftrack_user_location.journal import get_journal
+
+    accessor = SyncS3Accessor(
+        bucket, compression_codec=False, config=get_transfer_config(
+            multipart_threshold=5 * MB, multipart_chunksize=5 * MB
+        )
+    )
+    content = os.urandom(11 * MB)
+    path = _write_file(temporary_directory, 'big.bin', content)
+    accessor.upload(path, 'folder/big.bin')
+
+    # parts of a previous, bigger version of the object.
+    target = os.path.join(temporary_directory, 'target.bin')
+    _write_file(temporary_directory, 'target.bin.part', b'0' * 12 * MB)
+    transfer_id = 'download:{}/folder/big.bin:{}:{}:"previous"'.format(
+        bucket, target, 5 * MB
+    )
+    get_journal().add_part(transfer_id, 1)
+
+    accessor.download('folder/big.bin', target)
+
+    with open(target, 'rb') as file_object:
+        assert file_object.read() == content
+    assert get_journal().get_parts(transfer_id) == {}
+
+
+def test_upload_caches_digest(accessor, temporary_directory):
+    '''Record digest of uploaded files for the sync manifests.'''
+    from ftrack_user_location import digest
+
+    path = _write_file(temporary_directory, 'source.bin', b'content')
+    accessor.upload(path, 'folder/file.bin')
+
+    assert digest.get_cache().find(path) == digest.get_file_digest(path)
+
+
+def test_bundle_members(accessor, temporary_directory):
+    '''Record the members of bundles.'''
+    files = [
+        (
+            _write_file(temporary_directory, str(index), b'frame'),
+            'folder/sequence.{}.exr'.format(index)
+        )
+        for index in range(3)
+    ]
+    accessor.upload_bundle('folder/sequence.%d.exr', files)
+
+    bundles, members = accessor.get_sequence_objects('folder/sequence.%d.exr')
+    assert members == []
+    assert len(bundles) == 1
+    assert accessor.get_bundle_members(bundles[0]) == [
+        member_identifier for _, member_identifier in files
+    ]
+    assert sorted(
+        member_identifier
+        for member_identifier, _ in accessor.iter_bundle(bundles[0])
+    ) == [member_identifier for _, member_identifier in files]
+
+
+def test_remove_bundled_sequence(accessor, temporary_directory):
+    '''Remove bundled members, and their bundles once empty.'''
+    import ftrack_api.exception
+
+    files = [
+        (
+            _write_file(temporary_directory, str(index), b'frame'),
+            'folder/sequence.{}.exr'.format(index)
+        )
+        for index in range(4)
+    ]
+    accessor.upload_bundle('folder/sequence.%d.exr', files[:2])
+    accessor.upload_bundle('folder/sequence.%d.exr', files[2:])
+
+    accessor.remove('folder/sequence.0.exr')
+    bundles, _ = accessor.get_sequence_objects('folder/sequence.%d.exr')
+    assert len(bundles) == 2
+    assert sorted(
+        member
+        for bundle in bundles for member in accessor.get_bundle_members(bundle)
+    ) == ['folder/sequence.1.exr', 'folder/sequence.2.exr',
+          'folder/sequence.3.exr']
+
+    for index in range(1, 4):
+        accessor.remove('folder/sequence.{}.exr'.format(index))
+
+    response = accessor.client.list_objects_v2(Bucket=accessor.bucket_name)
+    assert response['KeyCount'] == 0
+
+    with pytest.raises(ftrack_api.exception.AccessorResourceNotFoundError):
+        accessor.remove('folder/sequence.0.exr')
+
+
+@pytest.fixture(params=['zlib', 'zstd'])
+def codec(request):
+    '''Return codec files are compressed with.'''
+    if request.param == 'zstd':
+        pytest.importorskip('zstandard')
+
+    return request.param
+
+
+def _get_compressing_accessor(bucket, codec):
+    '''Return accessor of *bucket* compressing with *codec* in 5MB parts.'''
+    from ftrack_user_location.accessor import (
+        MB, SyncS3Accessor, get_transfer_config
+    )
+
+    return SyncS3Accessor(
+        bucket, compression_codec=codec, config=get_transfer_config(
+            multipart_threshold=5 * MB, multipart_chunksize=5 * MB
+        )
+    )
+
+
+def test_compressed_upload_and_download(bucket, codec, temporary_directory):
+    '''Upload a file compressed and download it back.'''
+    content = b'frame' * 100000
+    path = _write_file(temporary_directory, 'frame.exr', content)
+    accessor = _get_compressing_accessor(bucket, codec)
+
+    accessor.upload(path, 'folder/frame.exr')
+
+    response = accessor.client.head_object(
+        Bucket=bucket, Key='folder/frame.exr'
+    )
+    assert response['Metadata']['encoding'] == codec
+    assert response['Metadata']['size'] == str(len(content))
+    assert response['ContentLength'] < len(content)
+
+    target = os.path.join(temporary_directory, 'target.exr')
+    accessor.download('folder/frame.exr', target)
+
+    with open(target, 'rb') as file_object:
+        assert file_object.read() == content
+
+    data = accessor.open('folder/frame.exr', 'rb')
+    assert data.read() == content
+    data.close()
+
+
+def test_uncompressed_extension(bucket, codec, temporary_directory):
+    '''Upload files of other extensions as they are.'''
+    path = _write_file(temporary_directory, 'movie.mov', b'frame' * 1000)
+    accessor = _get_compressing_accessor(bucket, codec)
+
+    accessor.upload(path, 'folder/movie.mov')
+
+    response = accessor.client.head_object(
+        Bucket=bucket, Key='folder/movie.mov'
+    )
+    assert 'encoding' not in response['Metadata']
+    assert response['ContentLength'] == 5000
+
+
+def test_compressed_multipart_upload_and_download(
+    bucket, codec, temporary_directory
+):
+    '''Upload and download a compressed file in multiple parts.'''
+    from ftrack_user_location.accessor import MB
+
+    content = os.urandom(11 * MB)
+    path = _write_file(temporary_directory, 'big.exr', content)
+    accessor = _get_compressing_accessor(bucket, codec)
+
+    accessor.upload(path, 'folder/big.exr')
+
+    response = accessor.client.head_object(Bucket=bucket, Key='folder/big.exr')
+    assert response['Metadata']['encoding'] == codec
+    assert response['ContentLength'] > 5 * MB
+
+    target = os.path.join(temporary_directory, 'target.exr')
+    accessor.download('folder/big.exr', target)
+
+    with open(target, 'rb') as file_object:
+        assert file_object.read() == content
+    assert not os.path.exists('{}.{}'.format(target, codec))
+
+
+def _fail_once(monkeypatch, client, name, part_number):
+    '''Make *client* method *name* fail once on part *part_number*.
+
+    Return list of the part numbers transferred by the method.
+
+    '''
+    method = getattr(client, name)
+    calls = []
+    failed = []
+
+    def _method(**kwargs):
+        if 'PartNumber' in kwargs:
+            number = kwargs['PartNumber']
+        else:
+            number = int(kwargs['Range'][6:].split('-')[0]) // (5 * 1024 ** 2) + 1
+
+        calls.append(number)
+        if number == part_number and not failed:
+            failed.append(number)
+            raise RuntimeError('Interrupted')
+
+        return method(**kwargs)
+
+    monkeypatch.setattr(client, name, _method)
+    return calls
+
+
+def test_resume_compressed_upload(
+    bucket, codec, temporary_directory, monkeypatch
+):
+    '''Resume interrupted upload of a compressed file from its parts.'''
+    from ftrack_user_location.accessor import MB
+
+    content = os.urandom(11 * MB)
+    path = _write_file(temporary_directory, 'big.exr', content)
+    accessor = _get_compressing_accessor(bucket, codec)
+    monkeypatch.setattr(accessor, '_get_part_workers', lambda: 1)
+    calls = _fail_once(monkeypatch, accessor.client, 'upload_part', 2)
+
+    with pytest.raises(RuntimeError):
+        accessor.upload(path, 'folder/big.exr')
+
+    del calls[:]
+    accessor.upload(path, 'folder/big.exr')
+    assert calls == [2]
+
+    target = os.path.join(temporary_directory, 'target.exr')
+    accessor.download('folder/big.exr', target)
+
+    with open(target, 'rb') as file_object:
+        assert file_object.read() == content
+
+
+def test_resume_compressed_download(
+    bucket, codec, temporary_directory, monkeypatch
+):
+    '''Resume interrupted download of a compressed file from its parts.'''
+    from ftrack_user_location.accessor import MB
+
+    content = os.urandom(11 * MB)
+    path = _write_file(temporary_directory, 'big.exr', content)
+    accessor = _get_compressing_accessor(bucket, codec)
+    accessor.upload(path, 'folder/big.exr')
+
+    monkeypatch.setattr(accessor, '_get_part_workers', lambda: 1)
+    calls = _fail_once(monkeypatch, accessor.client, 'get_object', 2)
+    target = os.path.join(temporary_directory, 'target.exr')
+
+    with pytest.raises(RuntimeError):
+        accessor.download('folder/big.exr', target)
+
+    del calls[:]
+    accessor.download('folder/big.exr', target)
+    assert calls == [2]
+
+    with open(target, 'rb') as file_object:
+        assert file_object.read() == content
+
+
+def test_download_size_mismatch(bucket, codec, temporary_directory):
+    '''Refuse downloaded content not matching the size of the original.'''
+    import ftrack_api.exception
+
+    path = _write_file(temporary_directory, 'frame.exr', b'frame' * 1000)
+    accessor = _get_compressing_accessor(bucket, codec)
+    accessor.upload(path, 'folder/frame.exr')
+
+    accessor.client.copy_object(
+        Bucket=bucket, Key='folder/frame.exr',
+        CopySource={'Bucket': bucket, 'Key': 'folder/frame.exr'},
+        Metadata={'encoding': codec, 'size': '10'},
+        MetadataDirective='REPLACE'
+    )
+
+    target = os.path.join(temporary_directory, 'target.exr')
+    with pytest.raises(ftrack_api.exception.AccessorOperationFailedError):
+        accessor.download('folder/frame.exr', target)
+    assert not os.path.exists(target)
+
+
+def test_bucket_region_after_failure(bucket, monkeypatch):
+    '''Look up again the region of a bucket once a failure expired.'''
+    from ftrack_user_location import accessor
+
+    monkeypatch.setattr(accessor, '_bucket_regions', {})
+    monkeypatch.setattr(accessor, '_bucket_failures', {})
+    client = accessor.get_client()
+    get_bucket_location = client.get_bucket_location
+    calls = []
+
+    def _get_bucket_location(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise RuntimeError('Access denied')
+
+        return get_bucket_location(**kwargs)
+
+    monkeypatch.setattr(client, 'get_bucket_location', _get_bucket_location)
+
+    assert accessor.get_bucket_region(bucket) is None
+    assert accessor.get_bucket_region(bucket) is None
+    assert len(calls) == 1
+
+    monkeypatch.setattr(accessor, 'REGION_RETRY_DELAY', 0)
+    assert accessor.get_bucket_region(bucket) == 'us-east-1'
+
+    assert accessor.get_bucket_region(bucket) == 'us-east-1'
+    assert len(calls) == 2
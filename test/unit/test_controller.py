@@ -0,0 +1,85 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import boto3.exceptions
+import botocore.exceptions
+import pytest
+
+from ftrack_user_location import controller
+
+
+def _client_error(code):
+    '''Return client error with *code*.'''
+    return botocore.exceptions.ClientError(
+        {'Error': {'Code': code, 'Message': code}}, 'PutObject'
+    )
+
+
+def _upload_failed_error(code):
+    '''Return upload error raised by boto3 from a client error with *code*.'''
+    try:
+        try:
+            raise _client_error(code)
+        except botocore.exceptions.ClientError as error:
+            raise boto3.exceptions.S3UploadFailedError(
+                'Failed to upload file: {}'.format(error)
+            )
+    except boto3.exceptions.S3UploadFailedError as error:
+        return error
+
+
+@pytest.mark.parametrize('error, expected', [
+    (_client_error('SlowDown'), True),
+    (_client_error('AccessDenied'), False),
+    (_upload_failed_error('SlowDown'), True),
+    (_upload_failed_error('AccessDenied'), False),
+    (
+        boto3.exceptions.S3UploadFailedError(
+            'Failed to upload file: An error occurred (SlowDown) when '
+            'calling the PutObject operation'
+        ),
+        True
+    ),
+    (
+        boto3.exceptions.RetriesExceededError(
+            botocore.exceptions.ReadTimeoutError(endpoint_url='url')
+        ),
+        True
+    ),
+    (botocore.exceptions.EndpointConnectionError(endpoint_url='url'), True),
+    (ValueError('error'), False)
+], ids=[
+    'slow down', 'access denied', 'wrapped slow down',
+    'wrapped access denied', 'wrapped message', 'retries exceeded',
+    'connection', 'other'
+])
+def test_is_throttling_error(error, expected):
+    '''Classify errors caused by throttling or network issues.'''
+    assert controller.is_throttling_error(error) is expected
+
+
+def test_controllers_by_initial_limit(monkeypatch):
+    '''Share controllers between transfers configured the same way only.'''
+    monkeypatch.setattr(controller, 'ADAPTIVE', True)
+    monkeypatch.setattr(controller, '_controllers', {})
+
+    small = controller.get_controller('files', 2)
+    large = controller.get_controller('files', 8)
+
+    assert controller.get_controller('files', 2) is small
+    assert (small.limit, small.maximum) == (2, 4)
+    assert (large.limit, large.maximum) == (8, 16)
+
+
+def test_transfer_workers(monkeypatch):
+    '''Keep the number of workers of each transfer.'''
+    from ftrack_user_location import transfer
+
+    monkeypatch.setattr(controller, 'ADAPTIVE', True)
+    monkeypatch.setattr(controller, '_controllers', {})
+
+    transfer.Transfer(None, None, None, max_workers=2)
+    later = transfer.Transfer(None, None, None, max_workers=8)
+
+    assert later.max_workers == 8
+    assert later.controller.maximum == 16
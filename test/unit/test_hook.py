@@ -0,0 +1,115 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import importlib.util
+
+import pytest
+
+from ftrack_user_location import sync, worker
+
+
+@pytest.fixture(scope='module')
+def sync_action():
+    '''Return module of the sync action hook.'''
+    pytest.importorskip('ftrack_action_handler')
+
+    path = os.path.join(
+        os.path.dirname(__file__), '..', '..', 'resource', 'hook',
+        'sync_action.py'
+    )
+    spec = importlib.util.spec_from_file_location('sync_action', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Session(object):
+    '''Session the action is registered with.'''
+
+
+class Queue(object):
+    '''Queue recording the syncs submitted, full after *max_queued*.'''
+
+    def __init__(self, max_queued=10):
+        self.max_queued = max_queued
+        self.submitted = []
+
+    def submit(self, function, args=(), user_id=None, size=None):
+        if len(self.submitted) >= self.max_queued:
+            raise worker.QueueFullError('Too many syncs queued')
+
+        self.submitted.append((function, args, user_id, size))
+
+
+@pytest.fixture()
+def action(sync_action):
+    '''Return sync action with a recording queue.'''
+    action = sync_action.SyncAction(Session())
+    action._queue = Queue()
+    return action
+
+
+def _get_sync_event(**data):
+    '''Return ftrack.sync event with *data*.'''
+    data.setdefault('locations', {'sync': 'sync-id', 'destination': 'home-id'})
+    return {'data': data, 'source': {'user': 'user-id'}}
+
+
+def test_sync_here(action):
+    '''Queue sync of the components, without replying to the event.'''
+    components = [{'id': 'component-id', 'name': 'main'}]
+
+    assert action.sync_here(_get_sync_event(components=components)) is None
+
+    assert action._queue.submitted == [
+        (
+            sync.on_sync_to_destination,
+            ('sync-id', 'home-id', components, 'user-id'),
+            'user-id', None
+        )
+    ]
+
+
+def test_sync_here_queue_full(action):
+    '''Reply with the error when too many syncs are queued.'''
+    action._queue.max_queued = 0
+
+    result = action.sync_here(_get_sync_event(components=[]))
+
+    assert result['success'] is False
+    assert result['message'] == 'Too many syncs queued'
+
+
+def test_sync_size_scheduled(action, monkeypatch):
+    '''Schedule syncs with the size carried by their events.'''
+    monkeypatch.setattr(worker, 'get_location_settings', lambda session: {})
+    monkeypatch.setattr(worker.SyncQueue, '_start_workers', lambda self: None)
+    action._queue = worker.SyncQueue(action.session)
+
+    for size in (4096, 1024, None):
+        components = [{'id': str(size), 'name': 'main'}]
+        action.sync_here(_get_sync_event(components=components, size=size))
+
+    scheduled = []
+    for _ in range(3):
+        user_id, (function, args) = action._queue._scheduler.get()
+        action._queue._scheduler.done(user_id)
+        scheduled.append(args[2][0]['id'])
+
+    assert scheduled == ['1024', '4096', 'None']
+
+
+def test_sync_here_manifest(action):
+    '''Queue sync of the components listed in the manifest of the event.'''
+    action.sync_here(
+        _get_sync_event(manifest='.manifests/manifest.jsonl.gz', size=1024)
+    )
+
+    [(function, args, user_id, size)] = action._queue.submitted
+    assert function.func is sync.on_sync_to_destination
+    assert function.keywords == {
+        'manifest_identifier': '.manifests/manifest.jsonl.gz'
+    }
+    assert args == ('sync-id', 'home-id', [], 'user-id')
+    assert (user_id, size) == ('user-id', 1024)
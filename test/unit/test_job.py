@@ -0,0 +1,166 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import json
+
+import pytest
+
+from ftrack_user_location import job, transfer
+
+
+class Query(object):
+    '''Query result.'''
+
+    def __init__(self, result):
+        self.result = result
+
+    def one(self):
+        return self.result
+
+
+class Session(object):
+    '''Session holding a single job, its status on the server and commits.'''
+
+    def __init__(self):
+        self.job = None
+        self.status = 'running'
+        self.commits = []
+        self.queries = 0
+
+    def create(self, entity_type, data):
+        self.job = dict(data, id='job-id')
+        return self.job
+
+    def commit(self):
+        self.commits.append(dict(self.job))
+
+    def query(self, expression):
+        self.queries += 1
+        assert self.job['id'] in expression
+        return Query({'status': self.status})
+
+
+@pytest.fixture()
+def session():
+    '''Return session.'''
+    return Session()
+
+
+def _get_data(session):
+    '''Return data of the job last committed with *session*.'''
+    return json.loads(session.commits[-1]['data'])
+
+
+def test_create_job(session):
+    '''Create a running job for the user.'''
+    job.JobReporter(session, 'user', 'Sync')
+
+    assert session.commits == [
+        {
+            'id': 'job-id', 'user': 'user', 'status': 'running',
+            'data': session.job['data']
+        }
+    ]
+    assert _get_data(session)['description'] == 'Sync'
+
+
+def test_counters(session):
+    '''Account for the results and write them to the job.'''
+    reporter = job.JobReporter(session, 'user', 'Sync', interval=0)
+    reporter.set_total(3)
+
+    reporter.add_result(transfer.TransferResult(
+        {'id': '1'}, transfer.DONE, size=2048
+    ))
+    reporter.add_result(transfer.TransferResult(
+        {'id': '2'}, transfer.SKIPPED, message='Already in location'
+    ))
+
+    assert reporter.counters == {
+        'total': 3, 'done': 1, 'skipped': 1, 'failed': 0, 'bytes': 2048
+    }
+    data = _get_data(session)
+    assert data['done'] == 1
+    assert data['bytes'] == 2048
+    assert data['description'] == (
+        'Sync: 1/3 done, 1 skipped, 0 failed (2.0 KB) - Already in location'
+    )
+    assert not reporter.failed
+
+
+def test_updates_within_interval(session):
+    '''Write progress to the job once per interval only.'''
+    reporter = job.JobReporter(session, 'user', 'Sync', interval=60)
+
+    reporter.set_total(2)
+    reporter.update(done=1)
+    assert len(session.commits) == 1
+
+    reporter.finish()
+    assert len(session.commits) == 2
+    assert _get_data(session)['done'] == 1
+    assert session.commits[-1]['status'] == 'done'
+
+
+def test_failed_outcome(session):
+    '''Mark the job as failed when a component failed.'''
+    reporter = job.JobReporter(session, 'user', 'Sync', interval=0)
+    reporter.set_total(1)
+    reporter.add_result(transfer.TransferResult(
+        {'id': '1'}, transfer.FAILED, message='Failed'
+    ))
+
+    reporter.finish('Finished')
+
+    assert reporter.failed
+    assert session.commits[-1]['status'] == 'failed'
+    assert _get_data(session)['description'].endswith(' - Finished')
+
+
+def test_fail(session):
+    '''Mark the job as failed with a message.'''
+    reporter = job.JobReporter(session, 'user', 'Sync')
+
+    reporter.fail('No route')
+
+    assert session.commits[-1]['status'] == 'failed'
+    assert _get_data(session)['description'] == 'Sync - No route'
+
+
+def test_cancelled_outcome(session):
+    '''Leave the status of killed jobs as it is.'''
+    reporter = job.JobReporter(session, 'user', 'Sync', interval=0)
+    session.status = job.KILLED
+
+    assert reporter.is_cancelled()
+
+    reporter.finish()
+    assert session.commits[-1]['status'] == 'running'
+    assert _get_data(session)['description'] == 'Sync - Cancelled'
+
+
+def test_is_cancelled_reads_job_status(session, monkeypatch):
+    '''Check the job status on the server once per interval.'''
+    now = [1000.0]
+    monkeypatch.setattr(job.time, 'time', lambda: now[0])
+    reporter = job.JobReporter(session, 'user', 'Sync', interval=10)
+
+    assert not reporter.is_cancelled()
+    assert session.queries == 0
+
+    now[0] += 10
+    assert not reporter.is_cancelled()
+    assert session.queries == 1
+
+    session.status = job.KILLED
+    now[0] += 5
+    assert not reporter.is_cancelled()
+    assert session.queries == 1
+
+    now[0] += 5
+    assert reporter.is_cancelled()
+    assert session.queries == 2
+
+    now[0] += 10
+    assert reporter.is_cancelled()
+    assert session.queries == 2
@@ -0,0 +1,66 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+
+import pytest
+
+from ftrack_user_location import location_ids
+
+SERVER_URL = 'https://test.ftrackapp.com'
+
+
+@pytest.fixture(autouse=True)
+def location_cache(monkeypatch, temporary_directory):
+    '''Cache location ids in a temporary directory.'''
+    monkeypatch.setattr(
+        location_ids, '_get_location_cache_path',
+        lambda: os.path.join(temporary_directory, 'locations.json')
+    )
+
+
+def test_cached_location_id():
+    '''Return cached location id.'''
+    location_ids.set_location_id(SERVER_URL, 'location', 'id')
+
+    assert location_ids.get_location_id(SERVER_URL, 'location') == 'id'
+    assert location_ids.get_location_id(SERVER_URL, 'other') is None
+    assert location_ids.get_location_id('https://other', 'location') is None
+
+
+def test_expired_location_id(monkeypatch):
+    '''Check cached location ids again once expired.'''
+    location_ids.set_location_id(SERVER_URL, 'location', 'id')
+
+    now = time.time() + location_ids.LOCATION_ID_TTL + 1
+    monkeypatch.setattr(location_ids.time, 'time', lambda: now)
+
+    assert location_ids.get_location_id(SERVER_URL, 'location') is None
+
+
+def test_check_location_ids():
+    '''Update cached ids of locations deleted or recreated.'''
+    location_ids.set_location_id(SERVER_URL, 'deleted', 'deleted-id')
+    location_ids.set_location_id(SERVER_URL, 'recreated', 'old-id')
+    location_ids.set_location_id(SERVER_URL, 'unchanged', 'unchanged-id')
+
+    location_ids.check_location_ids(SERVER_URL, {
+        'recreated': 'new-id',
+        'unchanged': 'unchanged-id'
+    })
+
+    assert location_ids.get_location_id(SERVER_URL, 'deleted') is None
+    assert location_ids.get_location_id(SERVER_URL, 'recreated') == 'new-id'
+    assert location_ids.get_location_id(SERVER_URL, 'unchanged') == 'unchanged-id'
+
+
+def test_check_unchanged_location_ids(monkeypatch):
+    '''Do not write the cache again when no location changed.'''
+    location_ids.set_location_id(SERVER_URL, 'location', 'id')
+    written = []
+    monkeypatch.setattr(location_ids, '_write_location_cache', written.append)
+
+    location_ids.check_location_ids(SERVER_URL, {'location': 'id'})
+
+    assert written == []
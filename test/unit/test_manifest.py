@@ -0,0 +1,203 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import pytest
+
+from ftrack_user_location import manifest, sync
+
+
+class Location(dict):
+    '''Location with an accessor.'''
+
+    def __init__(self, name, accessor=None, session=None):
+        super(Location, self).__init__(id='{}-id'.format(name), name=name)
+        self.accessor = accessor
+        self.session = session
+
+
+@pytest.fixture()
+def sync_location(bucket):
+    '''Return sync location storing its data in the mocked *bucket*.'''
+    from ftrack_user_location.accessor import SyncS3Accessor
+
+    return Location(
+        'ftrack.sync', SyncS3Accessor(bucket, compression_codec=False)
+    )
+
+
+def _get_components(count):
+    '''Return *count* components as listed in manifests.'''
+    return [
+        {
+            'id': 'component-{}'.format(index), 'name': 'main',
+            'size': index, 'digest': None
+        }
+        for index in range(count)
+    ]
+
+
+def _get_keys(location):
+    '''Return keys of the files in the bucket of *location*.'''
+    accessor = location.accessor
+    response = accessor.client.list_objects_v2(Bucket=accessor.bucket_name)
+    return [
+        entry['Key'] for entry in response.get('Contents', [])
+        if not entry['Key'].endswith('/')
+    ]
+
+
+def test_use_manifest(monkeypatch):
+    '''List components in a manifest from the threshold only.'''
+    monkeypatch.setattr(manifest, 'MANIFEST_THRESHOLD', 0)
+    assert not manifest.use_manifest(1000)
+
+    monkeypatch.setattr(manifest, 'MANIFEST_THRESHOLD', 10)
+    assert not manifest.use_manifest(9)
+    assert manifest.use_manifest(10)
+
+
+def test_write_and_read(sync_location):
+    '''Read components written to a manifest back in chunks.'''
+    components = _get_components(5)
+
+    resource_identifier = manifest.write(sync_location, components)
+
+    assert resource_identifier.startswith(manifest.MANIFEST_PREFIX)
+    assert _get_keys(sync_location) == [resource_identifier]
+    assert list(
+        manifest.read(sync_location, resource_identifier, chunk_size=2)
+    ) == [components[:2], components[2:4], components[4:]]
+
+    manifest.remove(sync_location, resource_identifier)
+    assert _get_keys(sync_location) == []
+
+
+class Registry(object):
+    '''Registry of locations by id.'''
+
+    def __init__(self, *locations):
+        self.locations = dict(
+            (location['id'], location) for location in locations
+        )
+
+    def get_by_id(self, location_id):
+        return self.locations.get(location_id)
+
+
+class Session(object):
+    '''Session of the user syncing.'''
+
+    def get(self, entity_type, entity_id):
+        return {'id': entity_id}
+
+
+@pytest.fixture()
+def destination_sync(sync_location, monkeypatch):
+    '''Stub queries of a sync from *sync_location* to a destination.
+
+    Return list of the chunks of component ids queried.
+
+    '''
+    destination = Location('studio', accessor=object())
+    registry = Registry(sync_location, destination)
+    monkeypatch.setattr(sync.registry, 'get_registry', lambda session: registry)
+
+    queried = []
+
+    def _get_components(session, component_ids):
+        queried.append(component_ids)
+        return [
+            {'id': component_id, 'name': 'main', 'size': 1}
+            for component_id in component_ids
+        ]
+
+    def _get_availabilities(
+        session, components, locations, resource_identifiers
+    ):
+        return dict(
+            (component['id'], {'ftrack.sync-id': 100.0, 'studio-id': 0.0})
+            for component in components
+        )
+
+    monkeypatch.setattr(sync.query, 'get_components', _get_components)
+    monkeypatch.setattr(sync.query, 'get_availabilities', _get_availabilities)
+    return queried
+
+
+def test_plan_from_manifest(sync_location, destination_sync):
+    '''Plan components listed in the manifest, chunk by chunk.'''
+    components = _get_components(manifest.CHUNK_SIZE + 1)
+    resource_identifier = manifest.write(sync_location, components)
+
+    sync_plan = sync.on_sync_to_destination(
+        Session(), 'ftrack.sync-id', 'studio-id', [], 'user-id',
+        dry_run=True, manifest_identifier=resource_identifier
+    )
+
+    component_ids = [component['id'] for component in components]
+    assert destination_sync == [
+        component_ids[:manifest.CHUNK_SIZE],
+        component_ids[manifest.CHUNK_SIZE:]
+    ]
+    assert [
+        component['id'] for component in sync_plan.pending
+    ] == component_ids
+    assert _get_keys(sync_location) == [resource_identifier]
+
+
+class JobReporter(object):
+    '''Reporter of a sync which can be cancelled.'''
+
+    cancelled = False
+
+    def __init__(self, session, user, description):
+        pass
+
+    def update(self, message=None, **counters):
+        pass
+
+    def is_cancelled(self):
+        return self.cancelled
+
+    def add_result(self, result):
+        pass
+
+    def finish(self, message=None):
+        pass
+
+
+class Transfer(object):
+    '''Transfer recording the components transferred.'''
+
+    transferred = []
+
+    def __init__(self, session, source, target, max_workers=None):
+        pass
+
+    def run(self, components, **kwargs):
+        self.transferred.extend(component['id'] for component in components)
+
+
+@pytest.mark.parametrize('cancelled', [False, True], ids=['done', 'cancelled'])
+def test_sync_from_manifest(
+    sync_location, destination_sync, monkeypatch, cancelled
+):
+    '''Remove the manifest once its components are synced.'''
+    monkeypatch.setattr(sync.job, 'JobReporter', JobReporter)
+    monkeypatch.setattr(JobReporter, 'cancelled', cancelled)
+    monkeypatch.setattr(sync.transfer, 'Transfer', Transfer)
+    monkeypatch.setattr(Transfer, 'transferred', [])
+    resource_identifier = manifest.write(sync_location, _get_components(3))
+
+    sync.on_sync_to_destination(
+        Session(), 'ftrack.sync-id', 'studio-id', [], 'user-id',
+        manifest_identifier=resource_identifier
+    )
+
+    assert Transfer.transferred == [
+        'component-0', 'component-1', 'component-2'
+    ]
+    if cancelled:
+        assert _get_keys(sync_location) == [resource_identifier]
+    else:
+        assert _get_keys(sync_location) == []
@@ -0,0 +1,198 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import pytest
+
+from ftrack_user_location import plan, sync
+
+
+def _get_component(name, size=0, members=None, version=None):
+    '''Return component named *name*.'''
+    component = {'id': '{}-id'.format(name), 'name': name, 'size': size}
+    if members is not None:
+        component['members'] = members
+    if version is not None:
+        component['version'] = version
+
+    return component
+
+
+@pytest.fixture()
+def sync_plan():
+    '''Return plan with a component planned for each action.'''
+    sync_plan = plan.SyncPlan('studio', 'home', throughput=1024)
+    sync_plan.add(_get_component('transfer'), plan.TRANSFER, 4096)
+    sync_plan.add(_get_component('top-up'), plan.TOP_UP, 1024)
+    sync_plan.add(_get_component('skip'), plan.SKIP, message='Synced')
+    sync_plan.add(_get_component('unavailable'), plan.UNAVAILABLE, None)
+    return sync_plan
+
+
+def test_entries(sync_plan):
+    '''Record the action, size and message planned for each component.'''
+    assert [
+        (component['name'], action, size, message)
+        for component, action, size, message in sync_plan.entries
+    ] == [
+        ('transfer', plan.TRANSFER, 4096, None),
+        ('top-up', plan.TOP_UP, 1024, None),
+        ('skip', plan.SKIP, 0, 'Synced'),
+        ('unavailable', plan.UNAVAILABLE, 0, None)
+    ]
+    assert [
+        component['name']
+        for component in sync_plan.get_components(plan.SKIP, plan.UNAVAILABLE)
+    ] == ['skip', 'unavailable']
+
+
+def test_pending_and_size(sync_plan):
+    '''Count components transferred fully or partially only.'''
+    assert [component['name'] for component in sync_plan.pending] == [
+        'transfer', 'top-up'
+    ]
+    assert sync_plan.size == 5120
+
+
+def test_eta(sync_plan):
+    '''Estimate duration from the throughput, unknown without one.'''
+    assert sync_plan.eta == 5.0
+
+    sync_plan.throughput = None
+    assert sync_plan.eta is None
+
+
+def test_format(sync_plan):
+    '''Summarise the plan by action.'''
+    assert sync_plan.format().split('<br/>') == [
+        '**studio to home**: 5.0 KB (about 5s).',
+        'To transfer (1): transfer',
+        'To top up (1): top-up',
+        'Skipped (1): skip',
+        'Unavailable (1): unavailable'
+    ]
+
+
+def test_format_many_components(monkeypatch):
+    '''List a limited number of components, with their version.'''
+    monkeypatch.setattr(plan, 'MAX_LISTED', 2)
+    version = {'asset': {'name': 'asset'}, 'version': 3}
+    sync_plan = plan.SyncPlan('studio', 'home')
+    for index in range(3):
+        sync_plan.add(
+            _get_component(str(index), version=version), plan.TRANSFER, 1
+        )
+
+    assert sync_plan.format().split('<br/>') == [
+        '**studio to home**: 3.0 B (unknown duration).',
+        'To transfer (3): asset v003 0, asset v003 1 and 1 more'
+    ]
+
+
+def test_format_error(sync_plan):
+    '''Only show the error of plans which could not be worked out.'''
+    sync_plan.error = 'Locations are not accessible'
+
+    assert sync_plan.format() == '**Locations are not accessible**'
+
+
+def test_format_duration():
+    '''Format durations in seconds, minutes or hours.'''
+    assert plan.format_duration(5.4) == '5s'
+    assert plan.format_duration(65) == '1m 05s'
+    assert plan.format_duration(3 * 3600 + 7 * 60) == '3h 07m'
+
+
+def test_plan_top_up():
+    '''Plan missing members of partially available containers only.'''
+    members = [_get_component('0', 10), _get_component('1', 20)]
+    container = _get_component('sequence', 30, members=members)
+    availabilities = {
+        'sequence-id': {'home': 50.0},
+        '0-id': {'home': 100.0},
+        '1-id': {'home': 0.0}
+    }
+    sync_plan = plan.SyncPlan('studio', 'home')
+
+    sync.plan_component(sync_plan, container, availabilities, 'home')
+
+    assert sync_plan.entries == [(container, plan.TOP_UP, 20, None)]
+
+
+class Registry(object):
+    '''Registry of locations by name.'''
+
+    def __init__(self, *names):
+        self.locations = dict(
+            (name, {'id': '{}-id'.format(name), 'name': name})
+            for name in names
+        )
+
+    def get_by_name(self, name):
+        return self.locations.get(name)
+
+
+class Session(object):
+    '''Session of the user syncing.'''
+
+    def get(self, entity_type, entity_id):
+        return {'id': entity_id, 'username': 'user'}
+
+
+@pytest.fixture()
+def remote_sync(monkeypatch):
+    '''Stub queries of a sync of the components returned.'''
+    components = []
+    registry = Registry('ftrack.sync', 'studio', 'home')
+    monkeypatch.setattr(sync.registry, 'get_registry', lambda session: registry)
+    monkeypatch.setattr(
+        sync, 'get_route', lambda source, destination, sync_location: (
+            sync_location
+        )
+    )
+    monkeypatch.setattr(
+        sync.query, 'get_version_components',
+        lambda session, version_ids: components
+    )
+
+    def _get_availabilities(session, selected, locations, resource_identifiers):
+        return dict(
+            (component['id'], {'studio-id': 100.0, 'ftrack.sync-id': 0.0})
+            for component in selected
+        )
+
+    monkeypatch.setattr(sync.query, 'get_availabilities', _get_availabilities)
+    return components
+
+
+def test_dry_run(remote_sync):
+    '''Return plan of the sync, without syncing.'''
+    remote_sync.extend(
+        _get_component(str(index), 1024) for index in range(3)
+    )
+
+    sync_plan = sync.on_sync_to_remote(
+        Session(), 'studio', 'home', 'user-id', [{'entityId': 'version-id'}],
+        dry_run=True
+    )
+
+    assert sync_plan.error is None
+    assert sync_plan.target_name == 'ftrack.sync'
+    assert sync_plan.pending == remote_sync
+    assert sync_plan.size == 3072
+
+
+def test_dry_run_too_many_components(remote_sync, monkeypatch):
+    '''Do not plan more components than can be previewed.'''
+    monkeypatch.setattr(plan, 'PREVIEW_MAX_COMPONENTS', 2)
+    monkeypatch.setattr(sync.query, 'get_availabilities', None)
+    remote_sync.extend(
+        _get_component(str(index), 1024) for index in range(3)
+    )
+
+    sync_plan = sync.on_sync_to_remote(
+        Session(), 'studio', 'home', 'user-id', [{'entityId': 'version-id'}],
+        dry_run=True
+    )
+
+    assert sync_plan.error.startswith('Too many components to preview (3)')
+    assert sync_plan.entries == []
@@ -0,0 +1,231 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import re
+import contextlib
+
+import ftrack_api.symbol
+import pytest
+
+from ftrack_user_location import query
+
+
+class Entity(dict):
+    '''Entity of *entity_type* holding its data.'''
+
+    def __init__(self, entity_type, **data):
+        super(Entity, self).__init__(data)
+        self.entity_type = entity_type
+
+
+class QueryResult(list):
+    '''Result of a query.'''
+
+    def all(self):
+        return list(self)
+
+
+class Session(object):
+    '''Session answering queries by id from memory, recording them.'''
+
+    def __init__(self):
+        self.entities = {}
+        self.component_locations = []
+        self.queries = []
+        self.populated = []
+
+    def add(self, entity_type, **data):
+        '''Add and return entity of *entity_type* with *data*.'''
+        entity = self.entities[data['id']] = Entity(entity_type, **data)
+        return entity
+
+    def add_component_location(self, component, location_id):
+        '''Make *component* available in *location_id*.'''
+        self.component_locations.append(
+            Entity(
+                'ComponentLocation', component_id=component['id'],
+                location_id=location_id,
+                resource_identifier='{}/{}'.format(
+                    location_id, component['id']
+                )
+            )
+        )
+
+    def query(self, expression):
+        '''Return entities matching the ids of *expression*.'''
+        self.queries.append(expression)
+        ids = re.search(r'id in \(([^)]*)\)', expression).group(1).split(', ')
+
+        if 'from ComponentLocation' in expression:
+            location_ids = re.search(
+                r'location_id in \(([^)]*)\)', expression
+            ).group(1).split(', ')
+            return QueryResult(
+                component_location
+                for component_location in self.component_locations
+                if component_location['component_id'] in ids and
+                component_location['location_id'] in location_ids
+            )
+
+        return QueryResult(
+            self.entities[entity_id] for entity_id in ids
+            if entity_id in self.entities
+        )
+
+    @contextlib.contextmanager
+    def auto_populating(self, auto_populate):
+        yield
+
+    def populate(self, entities, projections):
+        '''Load members of container *entities*.'''
+        self.populated.append([entity['id'] for entity in entities])
+        for entity in entities:
+            entity['members'] = entity.pop('unloaded_members')
+
+    def get_queries(self, entity_type):
+        '''Return queries made on *entity_type*.'''
+        return [
+            expression for expression in self.queries
+            if 'from {} '.format(entity_type) in expression
+        ]
+
+
+@pytest.fixture(autouse=True)
+def chunk_size(monkeypatch):
+    '''Query ids two at a time.'''
+    monkeypatch.setattr(query, 'QUERY_CHUNK_SIZE', 2)
+
+
+@pytest.fixture()
+def session():
+    '''Return session holding two versions of a project.
+
+    The first version has a file and a sequence of two members, the second
+    version a single file.
+
+    '''
+    session = Session()
+    session.add('Project', id='project', name='project')
+
+    versions = []
+    for index in range(2):
+        versions.append(session.add(
+            'AssetVersion', id='version-{}'.format(index), components=[],
+            link=[{'id': 'project'}]
+        ))
+
+    members = [
+        session.add(
+            'FileComponent', id='frame-{}'.format(index), name=str(index)
+        )
+        for index in range(2)
+    ]
+    for component in (
+        session.add('FileComponent', id='file', version=versions[0]),
+        session.add(
+            'SequenceComponent', id='sequence', version=versions[0],
+            members=members
+        ),
+        session.add('FileComponent', id='other', version=versions[1])
+    ):
+        component['version']['components'].append(component)
+
+    return session
+
+
+def test_get_components(session):
+    '''Load components with a fixed number of queries per chunk of ids.'''
+    components = query.get_components(
+        session, ['other', 'missing', 'sequence', 'file']
+    )
+
+    assert [component['id'] for component in components] == [
+        'other', 'sequence', 'file'
+    ]
+    assert len(session.get_queries('Component')) == 2
+    assert session.get_queries('ContainerComponent') == [
+        'select {} from ContainerComponent where id in (sequence)'.format(
+            ', '.join(query.CONTAINER_PROJECTIONS)
+        )
+    ]
+    assert session.get_queries('SequenceComponent') == [
+        'select padding from SequenceComponent where id in (sequence)'
+    ]
+    assert session.get_queries('Project') == [
+        'select name from Project where id in (project)'
+    ]
+    assert len(session.queries) == 5
+
+
+def test_get_no_components(session):
+    '''Do not query anything without ids.'''
+    assert query.get_components(session, []) == []
+    assert session.queries == []
+
+
+def test_get_version_components(session):
+    '''Return components of the versions with batched queries.'''
+    components = query.get_version_components(
+        session, ['version-1', 'missing', 'version-0']
+    )
+
+    assert [component['id'] for component in components] == [
+        'other', 'file', 'sequence'
+    ]
+    assert session.get_queries('AssetVersion') == [
+        'select id, components.id from AssetVersion '
+        'where id in (version-1, missing)',
+        'select id, components.id from AssetVersion '
+        'where id in (version-0)'
+    ]
+    assert len(session.get_queries('Component')) == 2
+
+
+def test_get_availabilities(session):
+    '''Resolve availability of components and members in bulk.'''
+    sequence = session.entities['sequence']
+    sequence['unloaded_members'] = sequence['members']
+    sequence['members'] = ftrack_api.symbol.NOT_SET
+    components = [session.entities['file'], sequence]
+
+    for component_id, location_id in (
+        ('file', 'studio'), ('frame-0', 'studio'), ('frame-1', 'studio'),
+        ('frame-0', 'home')
+    ):
+        session.add_component_location(
+            session.entities[component_id], location_id
+        )
+
+    resource_identifiers = {}
+    availabilities = query.get_availabilities(
+        session, components, [{'id': 'studio'}, {'id': 'home'}],
+        resource_identifiers
+    )
+
+    assert availabilities == {
+        'file': {'studio': 100.0, 'home': 0.0},
+        'sequence': {'studio': 100.0, 'home': 50.0},
+        'frame-0': {'studio': 100.0, 'home': 100.0},
+        'frame-1': {'studio': 100.0, 'home': 0.0}
+    }
+    assert resource_identifiers == {
+        ('file', 'studio'): 'studio/file',
+        ('frame-0', 'studio'): 'studio/frame-0',
+        ('frame-1', 'studio'): 'studio/frame-1',
+        ('frame-0', 'home'): 'home/frame-0'
+    }
+    assert session.populated == [['sequence']]
+    assert len(session.get_queries('ComponentLocation')) == 2
+    assert len(session.queries) == 2
+
+
+def test_get_availabilities_of_empty_container(session):
+    '''Resolve availability of containers without members as components.'''
+    container = session.add('ContainerComponent', id='empty', members=[])
+    session.add_component_location(container, 'home')
+
+    availabilities = query.get_availabilities(
+        session, [container], [{'id': 'studio'}, {'id': 'home'}]
+    )
+
+    assert availabilities == {'empty': {'studio': 0.0, 'home': 100.0}}
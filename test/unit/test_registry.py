@@ -0,0 +1,143 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import gc
+import time
+import weakref
+
+import pytest
+
+from ftrack_user_location import registry
+
+
+class EventHub(object):
+    '''Event hub recording subscriptions.'''
+
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self, subscription, callback):
+        self.subscriptions.append((subscription, callback))
+
+
+class Query(object):
+    '''Query result.'''
+
+    def __init__(self, results):
+        self.results = results
+
+    def all(self):
+        return list(self.results)
+
+
+class Session(object):
+    '''Session holding locations and counting the queries.'''
+
+    server_url = 'https://test.ftrackapp.com'
+
+    def __init__(self, *names):
+        self.locations = [
+            {'id': '{}-id'.format(name), 'name': name} for name in names
+        ]
+        self.queries = 0
+        self.event_hub = EventHub()
+
+    def query(self, expression):
+        self.queries += 1
+        return Query(self.locations)
+
+
+@pytest.fixture()
+def session():
+    '''Return session with two locations.'''
+    return Session('studio', 'home')
+
+
+def test_cached_locations(session):
+    '''Query locations once until they expire.'''
+    locations = registry.LocationRegistry(session, ttl=60)
+
+    assert locations.get_by_name('studio')['id'] == 'studio-id'
+    assert locations.get_by_id('home-id')['name'] == 'home'
+    assert [location['name'] for location in locations.get_locations()] == [
+        'home', 'studio'
+    ]
+    assert locations.exists('home')
+    assert session.queries == 1
+
+
+def test_expired_locations(session, monkeypatch):
+    '''Query locations again once expired.'''
+    locations = registry.LocationRegistry(session, ttl=60)
+    generation = locations.get_generation()
+
+    now = time.time() + 61
+    monkeypatch.setattr(registry.time, 'time', lambda: now)
+
+    assert locations.get_by_name('studio')['id'] == 'studio-id'
+    assert session.queries == 2
+    assert locations.get_generation() == generation + 1
+
+
+def test_refresh_on_name_miss(session):
+    '''Query locations again when a location is not found.'''
+    locations = registry.LocationRegistry(session, ttl=60)
+    locations.get_locations()
+
+    session.locations.append({'id': 'new-id', 'name': 'new'})
+
+    assert locations.get_by_name('new')['id'] == 'new-id'
+    assert session.queries == 2
+
+    assert locations.get_by_name('missing') is None
+    assert session.queries == 3
+
+
+def test_invalidate_on_location_update(session):
+    '''Query locations again once a location changed on the server.'''
+    locations = registry.LocationRegistry(session, ttl=60)
+    locations.subscribe()
+    locations.get_locations()
+
+    [(subscription, callback)] = session.event_hub.subscriptions
+    assert subscription == 'topic=ftrack.update'
+
+    callback({'data': {'entities': [{'entityType': 'task'}]}})
+    locations.get_locations()
+    assert session.queries == 1
+
+    callback({'data': {'entities': [{'entityType': 'location'}]}})
+    locations.get_locations()
+    assert session.queries == 2
+
+
+def test_registry_released_with_session():
+    '''Forget about the registry of a destroyed session.'''
+    session = Session('studio')
+    locations = registry.get_registry(session)
+    locations.subscribe()
+    assert registry.get_registry(session) is locations
+
+    reference = weakref.ref(locations)
+    del session, locations
+    gc.collect()
+
+    assert reference() is None
+
+
+def test_check_cached_location_ids_on_change(session, monkeypatch):
+    '''Check ids cached by the location plugins when locations changed.'''
+    checked = []
+    monkeypatch.setattr(
+        registry.location_ids, 'check_location_ids',
+        lambda server_url, location_ids: checked.append(location_ids)
+    )
+    locations = registry.LocationRegistry(session, ttl=60)
+
+    locations.refresh()
+    locations.refresh()
+    assert checked == [{'studio': 'studio-id', 'home': 'home-id'}]
+
+    session.locations[0]['id'] = 'new-id'
+    locations.refresh()
+    assert checked[1:] == [{'studio': 'new-id', 'home': 'home-id'}]
@@ -0,0 +1,49 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import boto3.exceptions
+import botocore.exceptions
+import pytest
+
+from ftrack_user_location import retry
+
+
+@pytest.fixture(autouse=True)
+def no_delay(monkeypatch):
+    '''Retry without waiting.'''
+    monkeypatch.setattr(retry, 'RETRY_DELAY', 0)
+
+
+def test_retry_wrapped_throttling_error():
+    '''Retry managed uploads failing with a throttling error.'''
+    attempts = []
+
+    def upload():
+        attempts.append(None)
+        if len(attempts) < 3:
+            try:
+                raise botocore.exceptions.ClientError(
+                    {'Error': {'Code': 'SlowDown', 'Message': ''}},
+                    'PutObject'
+                )
+            except botocore.exceptions.ClientError as error:
+                raise boto3.exceptions.S3UploadFailedError(str(error))
+
+        return 'done'
+
+    assert retry.call(upload) == 'done'
+    assert len(attempts) == 3
+
+
+def test_do_not_retry_other_errors():
+    '''Raise other errors straight away.'''
+    attempts = []
+
+    def upload():
+        attempts.append(None)
+        raise ValueError('error')
+
+    with pytest.raises(ValueError):
+        retry.call(upload)
+
+    assert len(attempts) == 1
@@ -0,0 +1,88 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import threading
+
+import pytest
+
+from ftrack_user_location.scheduler import FairScheduler, QueueFullError
+
+
+def _run(scheduler, count):
+    '''Return the next *count* (user_id, item), marking them done.'''
+    items = []
+    for _ in range(count):
+        user_id, item = scheduler.get()
+        scheduler.done(user_id)
+        items.append((user_id, item))
+
+    return items
+
+
+def test_round_robin_between_users():
+    '''Alternate between users, whatever the order syncs were queued in.'''
+    scheduler = FairScheduler(10)
+    for index in range(3):
+        scheduler.put('a{}'.format(index), user_id='a', size=index)
+    scheduler.put('b0', user_id='b', size=0)
+    scheduler.put('c0', user_id='c', size=0)
+
+    assert _run(scheduler, 5) == [
+        ('a', 'a0'), ('b', 'b0'), ('c', 'c0'), ('a', 'a1'), ('a', 'a2')
+    ]
+
+
+def test_user_with_fewest_running_first():
+    '''Run next sync of the user with the fewest syncs running.'''
+    scheduler = FairScheduler(10)
+    scheduler.put('a0', user_id='a')
+    scheduler.put('a1', user_id='a')
+    assert scheduler.get() == ('a', 'a0')
+
+    scheduler.put('b0', user_id='b')
+    assert scheduler.get() == ('b', 'b0')
+    assert scheduler.get() == ('a', 'a1')
+
+
+def test_smallest_first():
+    '''Run syncs of a user smallest first, unknown sizes last.'''
+    scheduler = FairScheduler(10)
+    scheduler.put('unknown', user_id='a')
+    scheduler.put('big', user_id='a', size=1024 ** 3)
+    scheduler.put('small', user_id='a', size=1024)
+    scheduler.put('empty', user_id='a', size=0)
+
+    assert [item for _, item in _run(scheduler, 4)] == [
+        'empty', 'small', 'big', 'unknown'
+    ]
+
+
+def test_queue_full():
+    '''Refuse items once too many are waiting.'''
+    scheduler = FairScheduler(2)
+    scheduler.put('a0', user_id='a')
+    scheduler.put('b0', user_id='b')
+
+    with pytest.raises(QueueFullError):
+        scheduler.put('c0', user_id='c')
+
+    _run(scheduler, 1)
+    scheduler.put('c0', user_id='c')
+
+
+def test_max_user_running():
+    '''Wait for a sync of the user to finish once at the limit.'''
+    scheduler = FairScheduler(10, max_user_running=1)
+    scheduler.put('a0', user_id='a')
+    scheduler.put('a1', user_id='a')
+    assert scheduler.get() == ('a', 'a0')
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(scheduler.get()))
+    thread.start()
+    thread.join(0.1)
+    assert results == []
+
+    scheduler.done('a')
+    thread.join(5)
+    assert results == [('a', 'a1')]
@@ -0,0 +1,104 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import pytest
+
+from ftrack_user_location import sync
+
+
+class Accessor(object):
+    '''Accessor counting the checks of its storage.'''
+
+    def __init__(self, accessible=True):
+        self.accessible = accessible
+        self.checks = 0
+
+    def exists(self, resource_identifier):
+        self.checks += 1
+        if self.accessible is None:
+            raise IOError('Storage not mounted')
+
+        return self.accessible
+
+
+class Location(dict):
+    '''Location of *session* with an accessor.'''
+
+    def __init__(self, session, name, accessor=None):
+        super(Location, self).__init__(id='{}-id'.format(name), name=name)
+        self.session = session
+        self.accessor = accessor
+
+
+class Query(object):
+    '''Query result.'''
+
+    def __init__(self, results):
+        self.results = results
+
+    def all(self):
+        return list(self.results)
+
+
+class Session(object):
+    '''Session holding locations.'''
+
+    server_url = 'https://test.ftrackapp.com'
+
+    def __init__(self):
+        self.locations = []
+
+    def add(self, name, accessor=None):
+        self.locations.append(Location(self, name, accessor))
+        return self.locations[-1]
+
+    def query(self, expression):
+        return Query(self.locations)
+
+
+@pytest.fixture()
+def session():
+    '''Return session with a user location and the sync location.'''
+    session = Session()
+    session.add('user', Accessor())
+    session.add('ftrack.sync', Accessor())
+    return session
+
+
+def _get_route(session, source_name, destination_name):
+    '''Return name of location synced to from *source_name*.'''
+    locations = dict(
+        (location['name'], location) for location in session.locations
+    )
+    return sync.get_route(
+        locations[source_name], locations[destination_name],
+        locations['ftrack.sync']
+    )['name']
+
+
+def test_route_to_accessible_destination(session):
+    '''Copy straight to destinations accessible from here, checked once.'''
+    accessor = Accessor()
+    session.add('studio', accessor)
+
+    assert _get_route(session, 'user', 'studio') == 'studio'
+    assert _get_route(session, 'user', 'studio') == 'studio'
+    assert accessor.checks == 1
+
+
+@pytest.mark.parametrize(
+    'accessor', [None, Accessor(False), Accessor(None)],
+    ids=['no accessor', 'missing storage', 'failing storage']
+)
+def test_route_through_sync_location(session, accessor):
+    '''Stage through the sync location to destinations not accessible.'''
+    session.add('studio', accessor)
+
+    assert _get_route(session, 'user', 'studio') == 'ftrack.sync'
+
+
+def test_route_to_sync_location(session):
+    '''Stage through the sync location to the sync location or the source.'''
+    assert _get_route(session, 'user', 'ftrack.sync') == 'ftrack.sync'
+    assert _get_route(session, 'user', 'user') == 'ftrack.sync'
+    assert session.locations[0].accessor.checks == 0
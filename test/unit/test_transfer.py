@@ -0,0 +1,344 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import os
+import time
+import uuid
+import threading
+
+import ftrack_api.accessor.disk
+import ftrack_api.exception
+import ftrack_api.symbol
+import pytest
+
+from ftrack_user_location import transfer
+
+
+class Structure(object):
+    '''Structure prefixing source resource identifiers.'''
+
+    def get_resource_identifier(self, entity, context=None):
+        return 'target/{}'.format(context['source_resource_identifier'])
+
+
+class Location(dict):
+    '''Location holding a structure.'''
+
+    def __init__(self, location_id):
+        super(Location, self).__init__(id=location_id, name=location_id)
+        self.structure = Structure()
+        self.resource_identifier_transformer = ftrack_api.symbol.NOT_SET
+
+
+class EventHub(object):
+    '''Event hub recording published events.'''
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, event, on_error=None):
+        self.published.append(event)
+
+
+class Session(object):
+    '''Session recording the entities created and committed.'''
+
+    def __init__(self):
+        self.event_hub = EventHub()
+        self.created = []
+        self.committed = []
+
+    def create(self, entity_type, data):
+        self.created.append((entity_type, data))
+
+    def commit(self):
+        self.committed.extend(self.created)
+        self.created = []
+
+    def rollback(self):
+        self.created = []
+
+
+class Component(dict):
+    '''File component.'''
+
+    entity_type = 'FileComponent'
+
+
+class DiskAccessor(ftrack_api.accessor.disk.DiskAccessor):
+    '''Disk accessor recording how many files are opened at the same time.'''
+
+    lock = threading.Lock()
+    running = 0
+    maximum = 0
+
+    def open(self, resource_identifier, mode='rb'):
+        if 'w' in mode:
+            with self.lock:
+                DiskAccessor.running += 1
+                DiskAccessor.maximum = max(
+                    DiskAccessor.maximum, DiskAccessor.running
+                )
+            time.sleep(0.05)
+            with self.lock:
+                DiskAccessor.running -= 1
+
+        return super(DiskAccessor, self).open(resource_identifier, mode)
+
+
+@pytest.fixture()
+def disk_transfer(temporary_directory):
+    '''Return transfer between two disk locations, with a stubbed session.'''
+    source = Location(uuid.uuid4().hex)
+    source.accessor = DiskAccessor(os.path.join(temporary_directory, 'source'))
+    destination = Location(uuid.uuid4().hex)
+    destination.accessor = DiskAccessor(
+        os.path.join(temporary_directory, 'destination')
+    )
+    os.makedirs(source.accessor.prefix)
+    DiskAccessor.maximum = 0
+
+    return transfer.Transfer(Session(), source, destination, max_workers=2)
+
+
+def _add_components(disk_transfer, count):
+    '''Return *count* components written to the source of *disk_transfer*.
+
+    Return the components and their resource identifiers.
+
+    '''
+    components = []
+    resource_identifiers = {}
+    for index in range(count):
+        component = Component(
+            id='component-{}'.format(index), name=str(index), size=4
+        )
+        name = '{}.bin'.format(index)
+        with open(
+            os.path.join(disk_transfer.source_location.accessor.prefix, name),
+            'wb'
+        ) as file_object:
+            file_object.write(b'data')
+
+        components.append(component)
+        resource_identifiers[
+            (component['id'], disk_transfer.source_location['id'])
+        ] = name
+
+    return components, resource_identifiers
+
+
+def _read_target(disk_transfer, name):
+    '''Return content copied to *name*, or None.'''
+    path = os.path.join(
+        disk_transfer.destination_location.accessor.prefix, 'target', name
+    )
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as file_object:
+        return file_object.read()
+
+
+@pytest.fixture()
+def component_transfer():
+    return transfer.Transfer(None, Location('source'), Location('destination'))
+
+
+def test_plan_component(component_transfer):
+    '''Plan transfer from the given resource identifiers.'''
+    component = {'id': 'c', 'name': 'main'}
+
+    assert component_transfer._plan(
+        component, {('c', 'source'): 'main.exr'}
+    ) == [(component, 'main.exr', 'target/main.exr')]
+
+    with pytest.raises(ftrack_api.exception.ComponentInLocationError):
+        component_transfer._plan(
+            component,
+            {('c', 'source'): 'main.exr', ('c', 'destination'): 'main.exr'}
+        )
+
+    with pytest.raises(ftrack_api.exception.ComponentNotInLocationError):
+        component_transfer._plan(component, {})
+
+
+def test_plan_missing_members(component_transfer):
+    '''Plan transfer of the members missing in the destination only.'''
+    members = [
+        {'id': 'm{}'.format(index), 'name': str(index)} for index in range(3)
+    ]
+    component = {'id': 'c', 'name': 'sequence', 'members': members}
+    resource_identifiers = dict(
+        ((entity['id'], 'source'), entity['name'])
+        for entity in members + [component]
+    )
+    resource_identifiers[('m1', 'destination')] = '1'
+
+    assert component_transfer._plan(component, resource_identifiers) == [
+        (members[0], '0', 'target/0'),
+        (members[2], '2', 'target/2'),
+        (component, 'sequence', 'target/sequence')
+    ]
+
+
+class BundleAccessor(object):
+    '''Accessor holding bundles of known members.'''
+
+    bundles = {'a.tar': ['a'], 'b.tar': ['b']}
+    read = []
+
+    def get_bundle_members(self, key):
+        return self.bundles[key]
+
+    def iter_bundle(self, key):
+        self.read.append(key)
+        return iter([])
+
+
+def test_extract_needed_bundles_only(component_transfer):
+    '''Download only the bundles holding missing members.'''
+    component_transfer.source_location.accessor = BundleAccessor()
+    component_transfer.destination_location.accessor = BundleAccessor()
+
+    task = transfer._ComponentTask({'id': 'c', 'name': 'sequence'}, [])
+    task.bundled['b'] = 'target/b'
+    for key in BundleAccessor.bundles:
+        component_transfer._extract_bundle(task, key)
+
+    assert BundleAccessor.read == ['b.tar']
+
+
+class Limiter(object):
+    '''Limiter recording the bytes consumed.'''
+
+    def __init__(self):
+        self.consumed = 0
+
+    def consume(self, amount):
+        self.consumed += amount
+
+
+def test_copy_data_within_bandwidth_limit(monkeypatch, temporary_directory):
+    '''Keep copies between disks within the bandwidth limit.'''
+    from ftrack_api.accessor.disk import DiskAccessor
+
+    limiter = Limiter()
+    monkeypatch.setattr(transfer.controller, 'get_limiter', lambda: limiter)
+
+    accessor = DiskAccessor(temporary_directory)
+    data = accessor.open('source.bin', 'wb')
+    data.write(b'0' * 1024)
+    data.close()
+
+    transfer.copy_data(accessor, accessor, 'source.bin', 'folder/target.bin')
+
+    assert limiter.consumed == 1024
+    assert accessor.open('folder/target.bin', 'rb').read() == b'0' * 1024
+
+
+def test_sequence_identifiers_of_top_up(component_transfer):
+    '''Look identifiers of a sequence topped up in the resolved ones.'''
+    member = {'id': 'm', 'name': '1'}
+    component = {
+        'id': 'c', 'name': 'sequence.%d.exr', 'members': [member]
+    }
+    resource_identifiers = {
+        ('m', 'source'): 'sequence.1.exr',
+        ('c', 'source'): 'sequence.%d.exr',
+        ('c', 'destination'): 'target/sequence.%d.exr'
+    }
+    task = transfer._ComponentTask(
+        component, component_transfer._plan(component, resource_identifiers)
+    )
+
+    assert component_transfer._get_sequence_identifiers(
+        task, resource_identifiers
+    ) == ('sequence.%d.exr', 'target/sequence.%d.exr')
+
+
+def test_run(disk_transfer):
+    '''Copy and register components, carrying on after failures.'''
+    components, resource_identifiers = _add_components(disk_transfer, 6)
+    destination_id = disk_transfer.destination_location['id']
+
+    # already in the destination.
+    resource_identifiers[(components[1]['id'], destination_id)] = '1.bin'
+    # missing from the source.
+    os.remove(
+        os.path.join(disk_transfer.source_location.accessor.prefix, '2.bin')
+    )
+
+    reported = []
+    results = disk_transfer.run(
+        components, callback=reported.append,
+        resource_identifiers=resource_identifiers
+    )
+
+    assert reported == results
+    statuses = dict(
+        (result.component['name'], result.status) for result in results
+    )
+    assert statuses == {
+        '0': transfer.DONE, '1': transfer.SKIPPED, '2': transfer.FAILED,
+        '3': transfer.DONE, '4': transfer.DONE, '5': transfer.DONE
+    }
+    assert [
+        result.size for result in results if result.status == transfer.DONE
+    ] == [4, 4, 4, 4]
+
+    for name in ('0', '3', '4', '5'):
+        assert _read_target(disk_transfer, name + '.bin') == b'data'
+    assert _read_target(disk_transfer, '1.bin') is None
+
+    registered = sorted(
+        data['component']['name']
+        for _, data in disk_transfer.session.committed
+    )
+    assert registered == ['0', '3', '4', '5']
+    assert len(disk_transfer.session.event_hub.published) == 4
+
+    # files are copied in parallel, within the number of workers.
+    workers = disk_transfer.max_workers
+    if disk_transfer.controller:
+        workers = disk_transfer.controller.maximum
+    assert 1 < DiskAccessor.maximum <= workers
+
+
+def test_run_cancelled(disk_transfer):
+    '''Stop transferring components once cancelled.'''
+    components, resource_identifiers = _add_components(disk_transfer, 3)
+    resource_identifiers[
+        (components[0]['id'], disk_transfer.destination_location['id'])
+    ] = '0.bin'
+
+    reported = []
+    results = disk_transfer.run(
+        components, callback=reported.append,
+        cancelled=lambda: bool(reported),
+        resource_identifiers=resource_identifiers
+    )
+
+    assert [result.status for result in results] == [transfer.SKIPPED]
+    assert _read_target(disk_transfer, '1.bin') is None
+    assert disk_transfer.session.committed == []
+
+
+def test_run_forgets_finished_components(disk_transfer):
+    '''Forget about the files of components done or failed.'''
+    components, resource_identifiers = _add_components(disk_transfer, 2)
+    os.remove(
+        os.path.join(disk_transfer.source_location.accessor.prefix, '1.bin')
+    )
+
+    results = disk_transfer.run(
+        components, resource_identifiers=resource_identifiers
+    )
+
+    assert sorted(
+        (result.component['name'], result.status) for result in results
+    ) == [('0', transfer.DONE), ('1', transfer.FAILED)]
+    for name in ('0.bin', '1.bin'):
+        assert disk_transfer.journal.get_file_state(
+            disk_transfer.destination_location['id'], 'target/' + name
+        ) is None
@@ -0,0 +1,76 @@
+# :coding: utf-8
+# :copyright: Copyright (c) 2021 ftrack
+
+import threading
+
+import pytest
+
+from ftrack_user_location import worker
+
+
+class Session(object):
+    '''Session of a worker, recording rollbacks.'''
+
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture()
+def sessions(monkeypatch):
+    '''Create fake worker sessions, return list of the sessions created.'''
+    sessions = []
+
+    def _create_session(session, location_settings):
+        sessions.append(Session())
+        return sessions[-1]
+
+    monkeypatch.setattr(worker, 'create_session', _create_session)
+    monkeypatch.setattr(worker, 'get_location_settings', lambda session: {})
+    return sessions
+
+
+def test_run_in_worker_sessions(sessions):
+    '''Run syncs with the sessions of the workers, after failures too.'''
+    queue = worker.SyncQueue(object(), max_syncs=1)
+    calls = []
+    finished = threading.Event()
+
+    def _fail(session, name):
+        calls.append((session, name))
+        raise RuntimeError('Failed')
+
+    def _sync(session, name):
+        calls.append((session, name))
+        finished.set()
+
+    queue.submit(_fail, ('first',), user_id='user')
+    queue.submit(_sync, ('second',), user_id='user')
+
+    assert finished.wait(5)
+    assert len(sessions) == 1
+    assert calls == [(sessions[0], 'first'), (sessions[0], 'second')]
+    assert sessions[0].rollbacks == 1
+
+
+def test_queue_full(sessions):
+    '''Refuse syncs once too many are waiting.'''
+    queue = worker.SyncQueue(object(), max_syncs=1, max_queued=2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def _sync(session):
+        started.set()
+        release.wait(5)
+
+    queue.submit(_sync, user_id='user')
+    assert started.wait(5)
+
+    queue.submit(_sync, user_id='user')
+    queue.submit(_sync, user_id='user')
+    with pytest.raises(worker.QueueFullError):
+        queue.submit(_sync, user_id='user')
+
+    release.set()